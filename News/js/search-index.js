@@ -0,0 +1,163 @@
+(() => {
+    // Client for the sharded index written by `python -m sitetools.search`.
+    // Only index.json, the term shards of the query's prefixes and the doc
+    // shards of the hits shown are downloaded.
+    const INDEX_URL = '/search/index.json';
+    const MAX_RESULTS = 30;
+
+    const list = document.querySelector('.archive-list');
+    const count = document.getElementById('search-results-count');
+    const empty = document.getElementById('search-empty');
+    const params = new URLSearchParams(window.location.search);
+    const query = (params.get('q') || '').trim();
+    const categories = new Set(params.getAll('category').map(c => c.toLowerCase()));
+
+    const input = document.getElementById('search-input');
+    if (input) input.value = query;
+    document.querySelectorAll('.search-filter input[type="checkbox"]').forEach(box => {
+        box.checked = categories.has(box.value);
+    });
+
+    // Without a query or a category the recent articles stay as they are
+    if (!list || (!query && !categories.size)) return;
+
+    const cache = new Map();
+    const fetchJson = (name) => {
+        if (!cache.has(name)) {
+            cache.set(name, fetch(name.startsWith('/') ? name : `/search/${name}`)
+                .then(response => response.ok ? response.json() : null)
+                .catch(() => null));
+        }
+        return cache.get(name);
+    };
+
+    // Must match sitetools.search.tokenize
+    const tokenize = (text) => text
+        .normalize('NFKD')
+        .replace(/[^\x00-\x7f]/g, '')
+        .toLowerCase()
+        .match(/[a-z0-9]+/g) || [];
+
+    const escapeHtml = (value) => String(value).replace(/[&<>"']/g, ch => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[ch]);
+
+    const idf = (total, postings) => Math.log(1 + (total - postings + 0.5) / (postings + 0.5));
+
+    // Shards a term can be in: the longest key it starts with (sitetools.search.shard_key)
+    // and, for a prefix, every longer key starting with it
+    const shardKeys = (index, term, prefix) => {
+        const keys = [];
+        for (let length = term.length; length >= index.prefixLength; length--) {
+            if (index.terms[term.slice(0, length)]) {
+                keys.push(term.slice(0, length));
+                break;
+            }
+        }
+        if (prefix) {
+            Object.keys(index.terms).forEach(key => {
+                if (key.length > term.length && key.startsWith(term)) keys.push(key);
+            });
+        }
+        return keys;
+    };
+
+    // Doc id -> score for one query term; the last term also matches as a prefix
+    const scoreTerm = async (index, term, prefix) => {
+        const scores = new Map();
+        const shards = await Promise.all(shardKeys(index, term, prefix).map(key => fetchJson(index.terms[key])));
+        const postings = Object.assign({}, ...shards.filter(Boolean).map(shard => shard.terms));
+
+        const matches = prefix
+            ? Object.keys(postings).filter(t => t.startsWith(term))
+            : (postings[term] ? [term] : []);
+        matches.forEach(match => {
+            const [gaps, tfs] = postings[match];
+            const weight = idf(index.count, gaps.length) / index.scoreScale;
+            let id = 0;
+            gaps.forEach((gap, i) => {
+                id += gap;
+                const score = tfs[i] * weight;
+                if (score > (scores.get(id) || 0)) scores.set(id, score);
+            });
+        });
+        return scores;
+    };
+
+    const render = (docs) => docs.map(([url, title, date, category, excerpt]) => `
+        <article class="post-card-large">
+            <div class="post-content">
+                <span class="post-cat">${escapeHtml(category || 'News')}</span>
+                <h3><a href="${escapeHtml(url)}">${escapeHtml(title)}</a></h3>
+                <div class="meta">${escapeHtml(date)}</div>
+                <p>${escapeHtml(excerpt)}</p>
+            </div>
+        </article>`).join('');
+
+    const loadDoc = async (index, id) => {
+        const shardName = index.docs[Math.floor(id / index.docsPerShard)];
+        const shard = shardName && await fetchJson(shardName);
+        return shard && shard.docs[id];
+    };
+
+    const inCategory = (doc) => !categories.size || categories.has((doc[3] || '').toLowerCase());
+
+    // Docs matching the query, best first
+    const queryMatches = async (index, stopwords) => {
+        const terms = [...new Set(tokenize(query).filter(t => t.length > 1 && !stopwords.has(t)))];
+        if (!terms.length) return [];
+
+        const perTerm = await Promise.all(terms.map((term, i) =>
+            scoreTerm(index, term, i === terms.length - 1 && term.length >= index.prefixLength)));
+
+        // Every term must match; fall back to any term when nothing does
+        const totals = new Map();
+        const hits = new Map();
+        perTerm.forEach(scores => scores.forEach((score, id) => {
+            totals.set(id, (totals.get(id) || 0) + score);
+            hits.set(id, (hits.get(id) || 0) + 1);
+        }));
+        let ranked = [...totals.keys()].filter(id => hits.get(id) === terms.length);
+        if (!ranked.length) ranked = [...totals.keys()];
+        ranked.sort((a, b) => totals.get(b) - totals.get(a));
+
+        const results = [];
+        for (const id of ranked) {
+            if (results.length >= MAX_RESULTS) break;
+            const doc = await loadDoc(index, id);
+            if (doc && inCategory(doc)) results.push(doc);
+        }
+        return results;
+    };
+
+    // Docs in the selected categories, newest first. The category is an
+    // indexed field, so its terms' postings hold every doc filed under it.
+    const categoryMatches = async (index, stopwords) => {
+        const terms = [...new Set([...categories].flatMap(tokenize).filter(t => t.length > 1 && !stopwords.has(t)))];
+        const perTerm = await Promise.all(terms.map(term => scoreTerm(index, term, false)));
+        const ids = [...new Set(perTerm.flatMap(scores => [...scores.keys()]))];
+        const docs = await Promise.all(ids.map(id => loadDoc(index, id)));
+        return docs
+            .filter(doc => doc && inCategory(doc))
+            .sort((a, b) => (b[2] || '').localeCompare(a[2] || ''))
+            .slice(0, MAX_RESULTS);
+    };
+
+    const search = async () => {
+        const index = await fetchJson(INDEX_URL);
+        if (!index) return;
+
+        const stopwords = new Set(index.stopwords);
+        const results = query ? await queryMatches(index, stopwords) : await categoryMatches(index, stopwords);
+
+        list.innerHTML = render(results);
+        if (empty) empty.hidden = results.length !== 0;
+        if (count) {
+            const scope = categories.size ? ` in ${[...categories].join(', ')}` : '';
+            const terms = query ? ` for “${query}”` : '';
+            count.textContent = `Showing ${results.length} result${results.length === 1 ? '' : 's'}${terms}${scope}`;
+        }
+    };
+
+    search();
+})();
@@ -9,6 +9,7 @@ const crypto = require('crypto');
 
 const BANNER_DATA_PATH = path.join(__dirname, '../data/banners.json');
 const ANALYTICS_DATA_PATH = path.join(__dirname, '../data/analytics.json');
+const ROLLUP_DATA_PATH = path.join(__dirname, '../data/analytics-rollup.json');
 
 /**
  * Get banner data
@@ -63,6 +64,32 @@ async function saveAnalyticsData(data) {
     await fs.writeFile(ANALYTICS_DATA_PATH, JSON.stringify(data, null, 2));
 }
 
+/**
+ * Get analytics data for reports: our own dailyStats, with those of the
+ * event log (python -m sitetools.analytics export) for the days before the
+ * export. Only the export writes the rollup file, so it never races with
+ * the event recording below.
+ */
+async function getReportData() {
+    const analytics = await getAnalyticsData();
+    let rollup;
+    try {
+        rollup = JSON.parse(await fs.readFile(ROLLUP_DATA_PATH, 'utf-8'));
+    } catch (error) {
+        return analytics;
+    }
+
+    // The day of the export was still in progress; our count of it is newer
+    const exportDay = getDateKey(new Date(rollup.generatedAt));
+    const dailyStats = { ...analytics.dailyStats };
+    for (const [key, stats] of Object.entries(rollup.dailyStats || {})) {
+        if (key < exportDay) {
+            dailyStats[key] = stats;
+        }
+    }
+    return { ...analytics, dailyStats };
+}
+
 /**
  * Generate unique ID
  */
@@ -235,7 +262,7 @@ async function recordClick(data) {
  * Get dashboard summary
  */
 async function getDashboardSummary() {
-    const analytics = await getAnalyticsData();
+    const analytics = await getReportData();
     const bannerData = await getBannerData();
     const now = new Date();
     const today = getDateKey(now);
@@ -358,7 +385,7 @@ async function getDashboardSummary() {
  * Get banner report
  */
 async function getBannerReport(bannerId, startDate, endDate) {
-    const analytics = await getAnalyticsData();
+    const analytics = await getReportData();
     const bannerData = await getBannerData();
     const banner = (bannerData.banners || []).find(b => b.id === bannerId);
 
@@ -405,7 +432,7 @@ async function getBannerReport(bannerId, startDate, endDate) {
  * Get placement report
  */
 async function getPlacementReport(placementId, startDate, endDate) {
-    const analytics = await getAnalyticsData();
+    const analytics = await getReportData();
     const bannerData = await getBannerData();
     const placement = (bannerData.placements || []).find(p => p.id === placementId);
 
@@ -452,7 +479,7 @@ async function getPlacementReport(placementId, startDate, endDate) {
  * Get client report
  */
 async function getClientReport(clientId, startDate, endDate) {
-    const analytics = await getAnalyticsData();
+    const analytics = await getReportData();
     const bannerData = await getBannerData();
     const client = (bannerData.clients || []).find(c => c.id === clientId);
 
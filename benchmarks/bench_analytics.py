@@ -0,0 +1,112 @@
+"""
+Benchmark the columnar analytics event log over synthetic banner traffic
+
+For each log size, events are appended in batches, the log is compacted,
+and then the admin's reports are timed: dailyStats, a 30 day banner report
+and rollups by banner, placement, client and device. Results are printed
+as JSON.
+
+Usage: python -m benchmarks.bench_analytics [--events 100000,1000000] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sitetools.analytics import EventLog, daily_stats, format_timestamp, report
+
+DEVICES = ('desktop', 'mobile', 'tablet', 'unknown')
+PAGE_TYPES = ('home', 'article', 'category', 'search')
+START_MS = 1767225600000  # 2026-01-01
+DAYS = 90
+
+
+def synthetic_events(count, seed=0, banners=200, placements=12, clients=40):
+    """(kind, event) pairs spread over DAYS days, about 1 click per 100 impressions"""
+    rng = random.Random(seed)
+    step = DAYS * 86400 * 1000 // max(count, 1)
+    for n in range(count):
+        banner = rng.randrange(banners)
+        yield ('click' if rng.random() < 0.01 else 'impression'), {
+            'bannerId': f'banner_{banner}',
+            'placementId': f'placement_{rng.randrange(placements)}',
+            'clientId': f'client_{banner % clients}',
+            'campaignId': f'campaign_{banner % (clients * 2)}',
+            'timestamp': format_timestamp(START_MS + n * step),
+            'pageUrl': f'/article-{rng.randrange(5000)}.html',
+            'pageType': rng.choice(PAGE_TYPES),
+            'sessionId': f'sess_{rng.randrange(count // 20 + 1)}',
+            'device': rng.choice(DEVICES),
+        }
+
+
+def timed(func, repeat=5):
+    """Best of repeat runs, in milliseconds, and the last result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2), result
+
+
+def bench(count):
+    with tempfile.TemporaryDirectory(prefix='sitetools-analytics-') as tmp:
+        start = time.perf_counter()
+        with EventLog(tmp) as log:
+            for kind, event in synthetic_events(count):
+                log.append(kind, event)
+        ingest = time.perf_counter() - start
+        segments = len(log.segments)
+
+        start = time.perf_counter()
+        log.compact()
+        compact = time.perf_counter() - start
+        size = sum(p.stat().st_size for p in Path(tmp).rglob('*') if p.is_file())
+
+        load_ms, events = timed(log.events, repeat=1)
+        stats_ms, stats = timed(lambda: daily_stats(events))
+        report_ms, _ = timed(lambda: report(events, 'banner', 'banner_7', '2026-02-01', '2026-03-02'))
+        rollups = {dim: timed(lambda: events.rollup(('day', dim)))[0]
+                   for dim in ('banner', 'placement', 'client', 'device')}
+
+    return {
+        'events': count,
+        'ingest_s': round(ingest, 3),
+        'ingest_events_per_s': round(count / ingest),
+        'segments_before_compact': segments,
+        'compact_s': round(compact, 3),
+        'log_bytes': size,
+        'bytes_per_event': round(size / count, 1),
+        'load_ms': load_ms,
+        'daily_stats_ms': stats_ms,
+        'daily_stats_days': len(stats),
+        'banner_report_ms': report_ms,
+        'rollup_by_day_ms': rollups,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', default='100000,1000000',
+                        help='comma-separated log sizes (default: 100000,1000000)')
+    parser.add_argument('--output', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': [bench(int(n)) for n in args.events.split(',')],
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
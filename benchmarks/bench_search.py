@@ -0,0 +1,113 @@
+"""
+Benchmark building the sharded search index over synthetic articles
+
+For each corpus size the full index is built from scratch, then rebuilt
+after one article changes, so both the cold and the incremental cost are
+measured. Documents are generated in memory (no pages are parsed), so the
+timings cover tokenising, scoring, sharding and writing. Results are
+printed as JSON.
+
+Usage: python -m benchmarks.bench_search [--articles 10000,100000] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sitetools.search import SearchIndex
+
+CATEGORIES = ('Markets', 'Economy', 'Technology', 'Crypto', 'Forex', 'Commodities', 'Stocks & Indices')
+WORDS = (
+    'market stocks bonds yields inflation rates federal reserve central bank earnings revenue '
+    'guidance outlook equity credit spread liquidity volatility commodity oil gold copper dollar '
+    'euro yen bitcoin ethereum regulation policy fiscal deficit growth recession payrolls '
+    'consumer spending housing mortgage treasury auction investors traders analysts forecast '
+    'quarter margin dividend buyback merger acquisition valuation semiconductor energy banks'
+).split()
+
+
+def synthetic_documents(count, seed=0, body_words=600):
+    rng = random.Random(seed)
+    # A long tail of rarer terms, like real article vocabularies
+    vocabulary = WORDS + [f'{rng.choice(WORDS)}{n}' for n in range(20000)]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+
+    docs = []
+    for n in range(count):
+        words = rng.choices(vocabulary, weights, k=body_words + 24)
+        docs.append({
+            'key': f'article-{n}.html',
+            'url': f'article-{n}.html',
+            'title': ' '.join(words[:8]).title(),
+            'date': f'2026-{n % 12 + 1:02d}-{n % 28 + 1:02d}',
+            'category': CATEGORIES[n % len(CATEGORIES)],
+            'author': 'FNPulse Staff',
+            'excerpt': ' '.join(words[8:24]),
+            'body': ' '.join(words[24:]),
+        })
+    return docs
+
+
+def directory_stats(directory):
+    sizes = [p.stat().st_size for p in Path(directory).glob('*.json')]
+    return {'files': len(sizes), 'bytes': sum(sizes), 'largest_bytes': max(sizes, default=0)}
+
+
+def bench(count):
+    docs = synthetic_documents(count)
+    with tempfile.TemporaryDirectory(prefix='sitetools-search-') as tmp:
+        output = Path(tmp) / 'search'
+        cache_path = Path(tmp) / 'search.json'
+
+        start = time.perf_counter()
+        index = SearchIndex(cache_path)
+        index.update(docs)
+        index.write(output)
+        index.save()
+        full = time.perf_counter() - start
+        stats = directory_stats(output)
+
+        docs[count // 2] = dict(docs[count // 2], title='Breaking: central bank surprises markets')
+        start = time.perf_counter()
+        index = SearchIndex.load(cache_path)
+        indexed, reused, _ = index.update(docs)
+        written, _, _ = index.write(output)
+        index.save()
+        incremental = time.perf_counter() - start
+
+    return {
+        'articles': count,
+        'build_s': round(full, 3),
+        'index_files': stats['files'],
+        'index_bytes': stats['bytes'],
+        'largest_shard_bytes': stats['largest_bytes'],
+        'incremental_s': round(incremental, 3),
+        'incremental_indexed': indexed,
+        'incremental_reused': reused,
+        'incremental_shards_written': written,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', default='10000,100000',
+                        help='comma-separated corpus sizes (default: 10000,100000)')
+    parser.add_argument('--output', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': [bench(int(n)) for n in args.articles.split(',')],
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark each site maintenance transform over a synthetic corpus
+
+Every transform runs in a fresh process against its own copy of the corpus,
+so timings include the read/transform/write cycle and peak RSS is not
+inherited from an earlier case. The shared data the rules render from
+(assets, fragments, images) is taken from the copy and a cache directory
+next to it, never from News/ or .sitetools-cache. Results are printed as JSON.
+
+Usage: python -m benchmarks.bench_transforms [--files N] [--page-kb 20-66] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, get_start_method
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, parse_mix
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RULE_TRANSFORMS = ('main-tags', 'stylesheets', 'header-footer', 'theme-script')
+# fix-main-tags.py, fix-main-tags-v2.py, fix-ui-scripts.py, update_headers_footers.py
+# all run through the rules above; "all" is the single-pass engine with every rule.
+TRANSFORMS = RULE_TRANSFORMS + ('all', 'replace-section')
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def use_corpus(corpus_dir, cache_dir):
+    """Load the rules' shared data from corpus_dir and cache_dir instead of News/
+
+    Engine workers are forked after this, so they inherit the same data.
+    """
+    from sitetools import assets, fragments, images
+    from sitetools.articles import ArticleCache
+
+    corpus_dir, cache_dir = Path(corpus_dir), Path(cache_dir)
+    data_dir = corpus_dir / 'data'
+    # Fingerprinted assets are published into the case directory
+    assets._current = assets.Assets(corpus_dir)
+    fragments._current = fragments.Fragments(fragments.fragment_inputs(
+        corpus_dir, data_dir / 'content.json', data_dir / 'navigation.json',
+        ArticleCache(cache_dir / 'articles.json')))
+    images._current = images.ImageIndex(cache_dir / 'images.json')
+
+
+def run_case(transform, corpus_dir, cache_dir, jobs):
+    """Run one transform over every page of corpus_dir (in a child process)"""
+    from sitetools import engine
+
+    use_corpus(corpus_dir, cache_dir)
+    paths = engine.html_files(corpus_dir)
+    bytes_in = sum(p.stat().st_size for p in paths)
+
+    start = time.perf_counter()
+    if transform == 'replace-section':
+        from replace_section import NEW_HTML
+        from sitetools.splice import section, splice_files
+
+        sections = [section('<!-- NEW HEADER REDESIGN -->', '</section>', NEW_HTML)]
+        results = splice_files(paths, sections, jobs=jobs)
+    else:
+        rule_names = None if transform == 'all' else [transform]
+        results = engine.run(paths, rule_names, jobs=jobs)
+    changed = sum(1 for r in results if r.changed)
+    errors = sum(1 for r in results if r.error)
+    seconds = time.perf_counter() - start
+
+    return {
+        'transform': transform,
+        'files': len(paths),
+        'changed': changed,
+        'errors': errors,
+        'bytes': bytes_in,
+        'seconds': round(seconds, 6),
+        'files_per_sec': round(len(paths) / seconds, 2) if seconds else None,
+        'mb_per_sec': round(bytes_in / (1024 * 1024) / seconds, 3) if seconds else None,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def benchmark(transforms, files, page_kb, mix, seed, jobs, workdir):
+    workdir = Path(workdir)
+    template = workdir / 'corpus'
+    corpus = generate_corpus(template, files, page_kb, mix, seed)
+
+    results = []
+    for transform in transforms:
+        case_dir = workdir / transform
+        cache_dir = workdir / f'{transform}-cache'
+        for directory in (case_dir, cache_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+        shutil.copytree(template, case_dir)
+
+        # A fresh interpreter per case keeps peak RSS figures independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(run_case, transform, str(case_dir), str(cache_dir), jobs).result()
+        results.append(result)
+        for directory in (case_dir, cache_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+
+        print(f"✓ {transform:<16} {result['files_per_sec']:>10} files/s "
+              f"{result['mb_per_sec']:>8} MB/s  peak {result['peak_rss_kb']} KB", file=sys.stderr)
+
+    return {
+        'benchmark': 'transforms',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'jobs': jobs,
+        'corpus': corpus,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000, help='number of synthetic pages (default: 1000)')
+    parser.add_argument('--page-kb', default='20-66', help='page size in KB, or a MIN-MAX range (default: 20-66)')
+    parser.add_argument('--mix', help='page kinds and weights, e.g. archive=0.2,article=0.5,legacy=0.2,current=0.1')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('--transforms', default=','.join(TRANSFORMS),
+                        help=f'comma-separated transforms to time (default: {",".join(TRANSFORMS)})')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='worker processes for the engine (default: 1)')
+    parser.add_argument('--workdir', help='directory for the corpus (default: a temporary directory)')
+    parser.add_argument('-o', '--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    transforms = args.transforms.split(',')
+    unknown = [t for t in transforms if t not in TRANSFORMS]
+    if unknown:
+        parser.error(f'unknown transforms: {", ".join(unknown)}')
+
+    if args.jobs != 1 and get_start_method() != 'fork':
+        # Spawned engine workers would load the shared data from News/ again
+        parser.error('--jobs needs a platform that forks worker processes')
+
+    mix = parse_mix(args.mix)
+    if args.workdir:
+        report = benchmark(transforms, args.files, args.page_kb, mix, args.seed, args.jobs, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix='fnpulse-bench-') as workdir:
+            report = benchmark(transforms, args.files, args.page_kb, mix, args.seed, args.jobs, workdir)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
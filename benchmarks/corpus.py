@@ -0,0 +1,186 @@
+"""
+Generate synthetic News/-style corpora for the benchmarks
+
+Pages are modelled on the real templates: archive pages carrying the broken
+main-archive tag, article pages with JSON-LD, legacy pages still using the
+old header and footer, and current pages already using the new design.
+
+Usage: python -m benchmarks.corpus DEST [--files N] [--page-kb 20-66] [--mix ...]
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+
+from sitetools.rules import ARCHIVE_SECTION, STANDARD_FOOTER, STANDARD_HEADER, THEME_SCRIPT
+
+KINDS = ('archive', 'article', 'legacy', 'current')
+DEFAULT_MIX = {'archive': 0.2, 'article': 0.5, 'legacy': 0.2, 'current': 0.1}
+
+CATEGORIES = ['Markets', 'Economy', 'Technology', 'Commodities', 'Forex', 'Crypto', 'Analysis']
+WORDS = (
+    'market rally bond yield inflation credit default spread earnings guidance equity '
+    'volatility liquidity central bank rate cut dollar oil reserve takeover distressed '
+    'solvency investor portfolio growth recession outlook revenue margin'
+).split()
+
+HEAD = '''<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1"><title>{title} — FNPulse</title><meta name="description" content="{description}"><link rel="canonical" href="https://www.FNPulse.com/{filename}"><meta property="og:image" content="/img/news-350x223-{image}.jpg"><link rel="stylesheet" href="/css/fnpulse.min.css">{extra_head}</head>'''
+
+LEGACY_HEADER = '''<div class="top-bar"><div class="container"><span class="date">Monday, January 19, 2026</span><a href="index.html">Home</a></div></div><header class="site-header-old"><div class="container"><a class="brand" href="index.html"><img src="/img/logo.svg" alt="FNPulse"></a><nav class="main-nav"><a href="markets.html">Markets</a> <a href="economy.html">Economy</a> <a href="technology.html">Technology</a></nav></div></header>'''
+LEGACY_FOOTER = '''<footer class="site-footer"><div class="container"><div class="footer-grid"><div class="footer-col"><h4>FNPulse</h4><p>Financial news.</p></div><div class="footer-col"><h4>Recent Post</h4><a href="article-sp500-record.html">S&P 500 Closes at Record High on Tech Rally</a></div></div></div></footer><nav class="bottom-nav" aria-label="Mobile"><a href="index.html" class="bottom-link">Home</a> <a href="markets.html" class="bottom-link">Markets</a></nav>'''
+
+SCRIPTS = '<script src="/js/main.min.js"></script>'
+
+
+def _sentence(rng, words=14):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _paragraphs(rng, target_bytes):
+    parts = []
+    size = 0
+    while size < target_bytes:
+        paragraph = '<p>' + ' '.join(_sentence(rng) for _ in range(rng.randint(3, 8))) + '</p>'
+        parts.append(paragraph)
+        size += len(paragraph)
+    return ''.join(parts)
+
+
+def _json_ld(title, filename, category, date):
+    return '<script type="application/ld+json">' + json.dumps({
+        '@context': 'https://schema.org',
+        '@type': 'Article',
+        'headline': title,
+        'image': ['/img/news-825x525.jpg'],
+        'mainEntityOfPage': {'@type': 'WebPage', '@id': f'https://www.FNPulse.com/{filename}'},
+        'datePublished': f'{date}T09:00:00.000Z',
+        'dateModified': f'{date}T10:30:00.000Z',
+        'author': [{'@type': 'Person', 'name': 'Jesus Guzman'}],
+        'articleSection': category,
+    }, indent=2) + '</script>'
+
+
+def render_page(kind, index, rng, page_bytes):
+    """Render one synthetic page of the given kind, padded to about page_bytes"""
+    category = rng.choice(CATEGORIES)
+    title = _sentence(rng, 9).rstrip('.')
+    date = f'2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+    filename = f'{kind}-{index:06d}.html' if kind != 'article' else f'article-{index:06d}.html'
+    fields = {
+        'title': title,
+        'description': _sentence(rng),
+        'filename': filename,
+        'image': rng.randint(1, 5),
+        'extra_head': '',
+    }
+
+    if kind == 'archive':
+        fields['extra_head'] = '<link rel="stylesheet" href="/css/hero-redesign.css">'
+        listing = ''.join(
+            f'<article class="archive-item"><h3><a href="article-{rng.randint(0, 999999):06d}.html">'
+            f'{_sentence(rng, 8)}</a></h3><p>{_sentence(rng)}</p></article>'
+            for _ in range(10)
+        )
+        body = (
+            f'<body>\n{STANDARD_HEADER}\n<div class="container"><div class="archive-head"><h1>{category}</h1></div></div>'
+            f' id="main-archive" class="container article-container"&gt;<div class="archive-list">{listing}'
+            f'{_paragraphs(rng, page_bytes // 2)}</div>'
+            f'</div>{ARCHIVE_SECTION}<div class="ad">Advertisement</div></section>'
+            f'{STANDARD_FOOTER}{SCRIPTS}{THEME_SCRIPT}</body></html>'
+        )
+    elif kind == 'article':
+        fields['extra_head'] = '<link rel="stylesheet" href="/css/hero-redesign.css">' + _json_ld(title, filename, category, date)
+        body = (
+            f'<body class="" data-content-type="article"><a class="skip-link" href="#main-article">Skip to content</a>\n'
+            f'{STANDARD_HEADER}\n<main id="main-article" class="container article-container">'
+            f'<article class="article-main"><header class="article-header"><span class="post-cat-large">{category}</span>'
+            f'<h1 class="article-title">{title}</h1></header>'
+            f'<div class="article-body">{_paragraphs(rng, page_bytes)}</div></article></main>'
+            f'{STANDARD_FOOTER}{SCRIPTS}</body></html>'
+        )
+    elif kind == 'legacy':
+        body = (
+            f'<body>{LEGACY_HEADER}<main id="content" class="container"><h1>{title}</h1>'
+            f'{_paragraphs(rng, page_bytes)}</main>{LEGACY_FOOTER}{SCRIPTS}</body></html>'
+        )
+    elif kind == 'current':
+        fields['extra_head'] = '<link rel="stylesheet" href="/css/hero-redesign.css">'
+        body = (
+            f'<body><a class="skip-link" href="#content">Skip to content</a>\n{STANDARD_HEADER}\n'
+            f'<!-- NEW HEADER REDESIGN --><section class="hero-wrapper container"><h2>{title}</h2></section>'
+            f'<main id="content"><h1>{title}</h1>{_paragraphs(rng, page_bytes)}</main>'
+            f'{STANDARD_FOOTER}{SCRIPTS}{THEME_SCRIPT}</body></html>'
+        )
+    else:
+        raise ValueError(f'Unknown page kind {kind!r}')
+
+    return filename, HEAD.format(**fields) + body
+
+
+def parse_mix(text):
+    """Parse 'archive=0.2,article=0.5' into normalised weights"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind not in KINDS:
+            raise ValueError(f'Unknown page kind {kind!r}, expected one of {", ".join(KINDS)}')
+        mix[kind] = float(weight)
+    total = sum(mix.values())
+    return {kind: weight / total for kind, weight in mix.items()}
+
+
+def parse_size_range(text):
+    """Parse '30' or '20-66' (KB) into a (min, max) byte range"""
+    low, _, high = str(text).partition('-')
+    low_kb = float(low)
+    high_kb = float(high) if high else low_kb
+    return int(low_kb * 1024), int(high_kb * 1024)
+
+
+def generate_corpus(dest, files=100, page_kb='20-66', mix=None, seed=1):
+    """Write a synthetic corpus into dest and return its description"""
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    mix = mix or dict(DEFAULT_MIX)
+    kinds, weights = zip(*mix.items())
+    low, high = parse_size_range(page_kb)
+
+    counts = dict.fromkeys(kinds, 0)
+    total_bytes = 0
+    for index in range(files):
+        kind = rng.choices(kinds, weights)[0]
+        filename, html = render_page(kind, index, rng, rng.randint(low, high))
+        data = html.encode('utf-8')
+        (dest / filename).write_bytes(data)
+        counts[kind] += 1
+        total_bytes += len(data)
+
+    return {
+        'path': str(dest),
+        'files': files,
+        'bytes': total_bytes,
+        'page_kb': page_kb,
+        'seed': seed,
+        'kinds': counts,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('dest', help='directory to write the pages into')
+    parser.add_argument('--files', type=int, default=100, help='number of pages (default: 100)')
+    parser.add_argument('--page-kb', default='20-66', help='page size in KB, or a MIN-MAX range (default: 20-66)')
+    parser.add_argument('--mix', help='page kinds and weights, e.g. archive=0.2,article=0.5,legacy=0.2,current=0.1')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    args = parser.parse_args(argv)
+
+    info = generate_corpus(args.dest, args.files, args.page_kb, parse_mix(args.mix), args.seed)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == '__main__':
+    main()
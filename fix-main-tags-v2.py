@@ -2,41 +2,24 @@
 """
 Fix broken <main> tags - v2
 """
-import glob
-import re
+from sitetools import engine
+from sitetools.cli import build_parser, run_rules
 
 files_to_fix = [
-    'News/analysis.html', 'News/bonds.html', 'News/category.html', 
-    'News/commodities.html', 'News/crypto.html', 'News/cryptocurrency.html',
-    'News/economic-policy.html', 'News/economy.html', 'News/finance.html',
-    'News/forex.html', 'News/global-business.html', 'News/investing.html',
-    'News/markets.html', 'News/stocks-indices.html', 'News/stocks.html',
-    'News/tag-economy.html', 'News/technology.html', 'News/trading.html'
+    'analysis.html', 'bonds.html', 'category.html',
+    'commodities.html', 'crypto.html', 'cryptocurrency.html',
+    'economic-policy.html', 'economy.html', 'finance.html',
+    'forex.html', 'global-business.html', 'investing.html',
+    'markets.html', 'stocks-indices.html', 'stocks.html',
+    'tag-economy.html', 'technology.html', 'trading.html'
 ]
 
-for filepath in files_to_fix:
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Replace the pattern with proper main tag opening
-        content = re.sub(
-            r'</div></div>\s+id="main-archive" class="container article-container"&gt;',
-            '</div></div><main id="main-archive" class="container article-container">',
-            content
-        )
-        
-        # Add closing main tag before the footer-adjacent section
-        content = content.replace(
-            '</div><section class="container" style="position:relative;z-index:10;margin-bottom:50px;margin-top:50px">',
-            '</div></main><section class="container" style="position:relative;z-index:10;margin-bottom:50px;margin-top:50px">'
-        )
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print(f"✓ Fixed {filepath}")
-    except Exception as e:
-        print(f"✗ Error in {filepath}: {e}")
 
-print("\nDone!")
+def main():
+    args = build_parser(__doc__).parse_args()
+
+    paths = [engine.NEWS_DIR / name for name in files_to_fix]
+    run_rules(args, paths, ['main-tags'])
+
+if __name__ == '__main__':
+    main()
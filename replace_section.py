@@ -1,25 +1,30 @@
-import os
+"""
+Replace marker-delimited sections of HTML pages, by default the header of index.html
 
-file_path = "c:/FNPulse/News/index.html"
-with open(file_path, "r", encoding="utf-8") as f:
-    content = f.read()
+Every --section START END HTML_FILE replaces the text from START up to and
+including the first END after it with the contents of HTML_FILE. All
+sections are applied to each file in one pass over a memory-mapped copy,
+so large generated pages are never loaded whole.
 
-start_marker = "<!-- NEW HEADER REDESIGN -->"
-end_marker = "</section>"
+Exits non-zero when a file cannot be spliced or lacks a start marker; pages
+whose sections are already up to date are not an error.
 
-# Find start
-start_idx = content.find(start_marker)
-if start_idx == -1:
-    print("Start marker not found")
-    exit(1)
+Usage: python replace_section.py [-s START END HTML_FILE ...] [-j N] [-n] [FILE_OR_GLOB ...]
+"""
+import argparse
+import glob
+import sys
 
-# Find end (first section close after start)
-end_idx = content.find(end_marker, start_idx)
-if end_idx == -1:
-    print("End marker not found")
-    exit(1)
+from sitetools import engine
+from sitetools.engine import NEWS_DIR
+from sitetools.splice import section, splice_files
 
-new_html = """<!-- HEADER REDESIGN -->
+file_path = NEWS_DIR / "index.html"
+
+start_marker = "<!-- NEW HEADER REDESIGN -->"
+end_marker = "</section>"
+
+NEW_HTML = """<!-- HEADER REDESIGN -->
 <header class="site-header container">
     <div class="header-logo">
         <a href="index.html"><img src="/img/logo.png" alt="FNPulse"></a>
@@ -40,7 +45,7 @@ new_html = """<!-- HEADER REDESIGN -->
         <!-- Dark Mode Toggle Mock -->
         <div class="toggle-switch" title="Dark Mode">
              <div class="toggle-thumb" style="transform: translateX(2px);"></div>
-             <span style="position: absolute; right: 6px; font-size: 12px;"></span>
+             <span style="position: absolute; right: 6px; font-size: 12px;">🌙</span>
         </div>
         <button class="icon-btn primary" aria-label="Menu">☰</button>
     </div>
@@ -104,10 +109,51 @@ new_html = """<!-- HEADER REDESIGN -->
             </div>
         </div>"""
 
-# Replace the content
-final_content = content[:start_idx] + new_html + content[end_idx + len(end_marker):]
 
-with open(file_path, "w", encoding="utf-8") as f:
-    f.write(final_content)
+def expand(patterns):
+    """Files named by the arguments, expanding glob patterns"""
+    files = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True)
+        if not matches:
+            print(f"⚠ {pattern} - no matching files")
+        files.extend(matches)
+    return sorted(set(files))
+
+
+def load_sections(specs):
+    sections = []
+    for start, end, html_file in specs:
+        with open(html_file, "r", encoding="utf-8") as f:
+            sections.append(section(start, end, f.read()))
+    return sections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", help="files or glob patterns to splice (default: News/index.html)")
+    parser.add_argument("-s", "--section", nargs=3, action="append", metavar=("START", "END", "HTML_FILE"),
+                        help="replace START..END with the contents of HTML_FILE (repeatable, "
+                             "default: the header redesign section)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="report what would be replaced without writing files")
+    args = parser.parse_args(argv)
+
+    if args.section:
+        sections = load_sections(args.section)
+    else:
+        sections = [section(start_marker, end_marker, NEW_HTML)]
+    files = expand(args.files) if args.files else [file_path]
+
+    results = splice_files(files, sections, jobs=args.jobs, dry_run=args.dry_run)
+    engine.report(results)
+    # Pages already up to date are fine; missing markers are not
+    missing = any(note.endswith(" not found") for r in results for note in r.notes)
+    if not results or missing or any(r.error for r in results):
+        sys.exit(1)
+
 
-print("Successfully updated index.html")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Maintenance tooling for the static News/ site
+"""
+from sitetools.engine import NEWS_DIR, RULES, html_files, process_file, rule, run
+
+__all__ = ['NEWS_DIR', 'RULES', 'html_files', 'process_file', 'rule', 'run']
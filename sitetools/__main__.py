@@ -0,0 +1,46 @@
+"""
+Run every maintenance rule over the site in a single pass
+
+Usage: python -m sitetools [--rules main-tags,theme-script] [--minify] [--jobs N] [--plan] [FILE ...]
+"""
+import os
+
+from sitetools import engine
+from sitetools.cli import add_rule_options, build_parser, load_manifest, rule_names, run_rules
+
+
+def main(argv=None):
+    parser = build_parser(__doc__, files=True)
+    parser.prog = 'python -m sitetools'
+    add_rule_options(parser)
+    parser.add_argument('--list', action='store_true', help='list the registered rules and exit')
+    parser.add_argument('--plan', action='store_true',
+                        help='show which pages need which rules, from the manifest, without opening them')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        engine.select_rules()
+        for r in engine.RULES:
+            print(f"{r.order:>4}  {r.name} (v{r.version}){'' if r.default else ', opt-in'}")
+        return
+
+    names = rule_names(args)
+    files = args.files or engine.html_files()
+
+    if args.plan:
+        print_plan(engine.plan(files, names, load_manifest(args)))
+        return
+
+    print(f"Found {len(files)} HTML files\n")
+    run_rules(args, files, names)
+
+
+def print_plan(jobs):
+    todo = [job for job in jobs if job.rules]
+    for job in todo:
+        print(f"• {os.path.basename(job.path)} - {', '.join(job.rules)} ({job.reason})")
+    print(f"\n{len(todo)} of {len(jobs)} pages need work, {len(jobs) - len(todo)} up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,532 @@
+"""
+Columnar event log and vectorised rollups for banner analytics
+
+Impressions and clicks are appended in batches to an event log under
+admin/data/events/. Every flushed batch becomes a segment directory holding
+one .npy file per column: the event kind, the timestamp and day, the event
+id, and each string field dictionary-encoded as int32 codes next to a JSON
+vocabulary. Events keep the admin's id (imp_<ms>_<hex>), or get one in the
+same form, so importing analytics.json twice does not count them twice.
+Segments are never rewritten; segments.json lists the live ones and is the
+only file replaced on append. Reports memory-map just the columns they need
+and count events with numpy.bincount, so rolling up millions of events by
+day, banner, placement, client or device takes milliseconds, and no event
+is ever dropped the way the 10,000 event cap in analytics.json did.
+
+The raw events the admin keeps in admin/data/analytics.json can be imported
+into the log, and the log's dailyStats exported to analytics-rollup.json
+next to it, which the admin's dashboard, reports and CSV export read in
+place of their own for the days it covers. The admin remains the only
+writer of analytics.json.
+
+Usage: python -m sitetools.analytics ingest [FILE] | import | export | report | compact
+"""
+import argparse
+import json
+import os
+import secrets
+import shutil
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from sitetools.output import atomic_write
+
+ADMIN_DATA_DIR = Path(__file__).resolve().parent.parent / 'admin' / 'data'
+EVENTS_DIR = ADMIN_DATA_DIR / 'events'
+ANALYTICS_JSON = ADMIN_DATA_DIR / 'analytics.json'
+ROLLUP_JSON = ADMIN_DATA_DIR / 'analytics-rollup.json'
+
+FORMAT_VERSION = 1
+
+IMPRESSION, CLICK = 0, 1
+KINDS = {'impression': IMPRESSION, 'click': CLICK}
+# Event ids are <prefix>_<ms>_<8 hex digits>, as the admin's generateId makes them
+ID_PREFIXES = {IMPRESSION: 'imp', CLICK: 'clk'}
+
+# String columns, by event field; all are dictionary-encoded
+STRING_FIELDS = (
+    'bannerId', 'placementId', 'clientId', 'campaignId', 'pageUrl', 'pageType', 'referrer',
+    'sessionId', 'userAgent', 'device', 'viewport', 'country', 'region', 'targetUrl',
+)
+DEFAULTS = {'device': 'unknown'}
+
+# Rollup dimensions, by name
+DIMENSIONS = {
+    'banner': 'bannerId', 'placement': 'placementId', 'client': 'clientId', 'campaign': 'campaignId',
+    'device': 'device', 'page-type': 'pageType', 'country': 'country',
+}
+
+BATCH_SIZE = 10000
+# Appends compact the log once it has more segments than this
+MAX_SEGMENTS = 64
+
+MS_PER_DAY = 86400 * 1000
+EPOCH_DAY = np.datetime64('1970-01-01', 'D')
+
+Rollup = namedtuple('Rollup', 'by keys impressions clicks')
+
+
+def parse_timestamp(value):
+    """Milliseconds since the epoch of an ISO 8601 string or a number of ms; now if empty"""
+    if value in (None, ''):
+        return int(time.time() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def format_timestamp(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def day_number(date):
+    """Days since the epoch of a YYYY-MM-DD date"""
+    return int((np.datetime64(date[:10], 'D') - EPOCH_DAY).astype(np.int64))
+
+
+def day_labels(days):
+    """YYYY-MM-DD strings of an array of day numbers"""
+    return (EPOCH_DAY + np.asarray(days, dtype='timedelta64[D]')).astype(str)
+
+
+def ctr(impressions, clicks):
+    """Click-through rate in percent as the admin formats it: two decimals, or 0"""
+    return f'{clicks / impressions * 100:.2f}' if impressions > 0 else 0
+
+
+def new_id(kind, ts):
+    """An event id made the way the admin's generateId makes them"""
+    return f'{ID_PREFIXES[kind]}_{ts}_{secrets.token_hex(4)}'
+
+
+def _encode(values):
+    """int32 codes and vocabulary of a list of strings"""
+    vocab = {}
+    codes = np.fromiter((vocab.setdefault(v, len(vocab)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(vocab)
+
+
+class EventLog:
+    """The segments of the event log, and a buffer of events not yet flushed"""
+
+    def __init__(self, directory=EVENTS_DIR, batch_size=BATCH_SIZE):
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.segments = []
+        self.next_segment = 0
+        self.buffer = []
+        self._load_manifest()
+
+    def _manifest_path(self):
+        return self.directory / 'segments.json'
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FORMAT_VERSION:
+                self.segments = data['segments']
+                self.next_segment = data['next']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save_manifest(self):
+        data = {'version': FORMAT_VERSION, 'segments': self.segments, 'next': self.next_segment}
+        atomic_write(self._manifest_path(), json.dumps(data, indent=1).encode('utf-8'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def append(self, kind, event):
+        """Buffer one event ('impression' or 'click', a dict of admin fields)"""
+        self.buffer.append((KINDS[kind], event))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events as a new segment; returns the number written"""
+        if not self.buffer:
+            return 0
+        events = self.buffer
+        self.buffer = []
+        columns = {
+            'kind': np.fromiter((kind for kind, _ in events), dtype=np.uint8, count=len(events)),
+            'ts': np.fromiter((parse_timestamp(e.get('timestamp')) for _, e in events),
+                              dtype=np.int64, count=len(events)),
+        }
+        columns['id'] = np.array([str(e.get('id') or new_id(kind, ts)).encode('utf-8')
+                                  for (kind, e), ts in zip(events, columns['ts'].tolist())])
+        strings = {
+            field: _encode([str(e.get(field) or DEFAULTS.get(field, '')) for _, e in events])
+            for field in STRING_FIELDS
+        }
+        self._write_segment(columns, strings)
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+        return len(events)
+
+    def _write_segment(self, columns, strings):
+        """Write one segment directory and list it in the manifest"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f'seg-{self.next_segment:06d}'
+        tmp = self.directory / f'.{name}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        columns = dict(columns, day=(columns['ts'] // MS_PER_DAY).astype(np.int32))
+        for column, values in columns.items():
+            np.save(tmp / f'{column}.npy', values)
+        vocabularies = {}
+        for field, (codes, vocab) in strings.items():
+            np.save(tmp / f'{field}.npy', codes)
+            vocabularies[field] = vocab
+        with open(tmp / 'vocab.json', 'w', encoding='utf-8') as f:
+            json.dump(vocabularies, f, ensure_ascii=False)
+        os.replace(tmp, self.directory / name)
+
+        self.segments.append({'name': name, 'rows': len(columns['kind'])})
+        self.next_segment += 1
+        self._save_manifest()
+
+    def compact(self):
+        """Merge every segment into one; returns the number of events"""
+        self.flush()
+        if len(self.segments) <= 1:
+            return sum(s['rows'] for s in self.segments)
+        events = self.events()
+        old = [s['name'] for s in self.segments]
+        strings = {field: events.column(field) for field in STRING_FIELDS}
+        self.segments = []
+        self._write_segment({'kind': np.array(events.kind), 'ts': np.array(events.ts),
+                             'id': np.array(events.id)}, strings)
+        for name in old:
+            shutil.rmtree(self.directory / name, ignore_errors=True)
+        return len(events)
+
+    def events(self):
+        """The flushed events, as columns"""
+        return Events([self.directory / s['name'] for s in self.segments])
+
+
+class Events:
+    """Columns of the events of a list of segments, loaded on first use
+
+    Fixed-width columns are memory-mapped and concatenated; string columns
+    come back as (codes, vocabulary) with the codes remapped onto one
+    vocabulary for all segments.
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.kind)
+
+    def _numeric(self, name):
+        if name not in self._columns:
+            parts = [np.load(segment / f'{name}.npy', mmap_mode='r') for segment in self.segments]
+            if not parts:
+                dtype = {'kind': np.uint8, 'ts': np.int64}.get(name, np.int32)
+                self._columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self._columns[name] = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return self._columns[name]
+
+    @property
+    def kind(self):
+        return self._numeric('kind')
+
+    @property
+    def ts(self):
+        return self._numeric('ts')
+
+    @property
+    def day(self):
+        return self._numeric('day')
+
+    @property
+    def id(self):
+        """Event ids as bytes; b'' for events of segments written before ids were kept"""
+        if 'id' not in self._columns:
+            parts = []
+            for segment in self.segments:
+                path = segment / 'id.npy'
+                if path.exists():
+                    parts.append(np.load(path, mmap_mode='r'))
+                else:
+                    parts.append(np.zeros(len(np.load(segment / 'kind.npy', mmap_mode='r')), dtype='S1'))
+            if not parts:
+                self._columns['id'] = np.empty(0, dtype='S1')
+            else:
+                self._columns['id'] = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return self._columns['id']
+
+    def _vocabularies(self):
+        if '_vocab' not in self._columns:
+            vocabularies = []
+            for segment in self.segments:
+                with open(segment / 'vocab.json', 'r', encoding='utf-8') as f:
+                    vocabularies.append(json.load(f))
+            self._columns['_vocab'] = vocabularies
+        return self._columns['_vocab']
+
+    def column(self, field):
+        """(int32 codes, vocabulary) of a string field"""
+        if field not in self._columns:
+            vocabularies = [v[field] for v in self._vocabularies()]
+            codes = [np.load(segment / f'{field}.npy', mmap_mode='r') for segment in self.segments]
+            if len(codes) == 1:
+                self._columns[field] = (codes[0], vocabularies[0])
+            else:
+                merged = {}
+                remapped = []
+                for part, vocab in zip(codes, vocabularies):
+                    lookup = np.fromiter((merged.setdefault(v, len(merged)) for v in vocab),
+                                         dtype=np.int32, count=len(vocab))
+                    remapped.append(lookup[part])
+                joined = np.concatenate(remapped) if remapped else np.empty(0, dtype=np.int32)
+                self._columns[field] = (joined, list(merged))
+        return self._columns[field]
+
+    def code(self, field, value):
+        """The code of value in a string field, or -1 when no event has it"""
+        _, vocab = self.column(field)
+        try:
+            return vocab.index(value)
+        except ValueError:
+            return -1
+
+    def day_mask(self, start=None, end=None):
+        """Boolean mask of the events from start to end (YYYY-MM-DD, inclusive), or None"""
+        if start is None and end is None:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.day >= day_number(start)
+        if end is not None:
+            mask &= self.day <= day_number(end)
+        return mask
+
+    def rollup(self, by=('day',), mask=None):
+        """Impression and click counts per combination of the dimensions in by
+
+        by holds 'day' and names from DIMENSIONS. Events whose value for a
+        dimension is empty are left out. Returns a Rollup whose keys are one
+        label array per dimension, with only the combinations that occur.
+        """
+        kind = self.kind
+        selected = np.ones(len(kind), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        codes, sizes, labels = [], [], []
+        for dim in by:
+            if dim == 'day':
+                day = self.day
+                first = int(day.min()) if len(day) else 0
+                codes.append(day - first)
+                sizes.append(int(day.max()) - first + 1 if len(day) else 1)
+                labels.append(lambda keys, first=first: day_labels(keys + first))
+            else:
+                values, vocab = self.column(DIMENSIONS[dim])
+                empty = vocab.index('') if '' in vocab else -1
+                if empty >= 0:
+                    selected = selected & (values != empty)
+                codes.append(values)
+                sizes.append(max(len(vocab), 1))
+                labels.append(lambda keys, vocab=np.array(vocab, dtype=object): vocab[keys])
+
+        if not selected.all():
+            codes = [np.asarray(c)[selected] for c in codes]
+            kind = kind[selected]
+        flat = np.ravel_multi_index(codes, sizes) if codes else np.zeros(len(kind), dtype=np.intp)
+        total = int(np.prod(sizes, dtype=np.int64))
+        if total * 2 > 4 * max(len(kind), 1024):
+            # Sparse combinations: count over the ones that occur
+            occurring, flat = np.unique(flat, return_inverse=True)
+        else:
+            occurring = None
+        width = len(occurring) if occurring is not None else total
+        counts = np.bincount(flat * 2 + kind, minlength=width * 2).reshape(-1, 2)
+        present = np.flatnonzero(counts.any(axis=1))
+        index = occurring[present] if occurring is not None else present
+        keys = [label(key) for label, key in zip(labels, np.unravel_index(index, sizes))]
+        return Rollup(tuple(by), keys, counts[present, 0], counts[present, 1])
+
+
+def rollup_rows(rollup):
+    """The rows of a Rollup as dicts"""
+    for n in range(len(rollup.impressions)):
+        row = {dim: str(keys[n]) for dim, keys in zip(rollup.by, rollup.keys)}
+        impressions, clicks = int(rollup.impressions[n]), int(rollup.clicks[n])
+        yield dict(row, impressions=impressions, clicks=clicks, ctr=ctr(impressions, clicks))
+
+
+def daily_stats(events, start=None, end=None):
+    """The admin's dailyStats: per-day totals and per banner, placement and client"""
+    mask = events.day_mask(start, end)
+    totals = events.rollup(('day',), mask)
+    stats = {
+        day: {'impressions': i, 'clicks': c, 'banners': {}, 'placements': {}, 'clients': {}}
+        for day, i, c in zip(totals.keys[0].tolist(), totals.impressions.tolist(), totals.clicks.tolist())
+    }
+    for dim, key in (('banner', 'banners'), ('placement', 'placements'), ('client', 'clients')):
+        rollup = events.rollup(('day', dim), mask)
+        for day, value, i, c in zip(*(k.tolist() for k in rollup.keys),
+                                    rollup.impressions.tolist(), rollup.clicks.tolist()):
+            stats[day][key][value] = {'impressions': i, 'clicks': c}
+    return stats
+
+
+def report(events, dimension, entity_id, start, end):
+    """Daily impressions, clicks and CTR of one banner, placement or client
+
+    Every day from start to end is listed, as the admin's getBannerReport,
+    getPlacementReport and getClientReport do.
+    """
+    first, last = day_number(start), day_number(end)
+    days = max(last - first + 1, 0)
+    impressions = np.zeros(days, dtype=np.int64)
+    clicks = np.zeros(days, dtype=np.int64)
+    code = events.code(DIMENSIONS[dimension], entity_id)
+    if code >= 0 and days:
+        values, _ = events.column(DIMENSIONS[dimension])
+        day = events.day
+        mask = (values == code) & (day >= first) & (day <= last)
+        offsets = day[mask] - first
+        kind = events.kind[mask]
+        impressions = np.bincount(offsets[kind == IMPRESSION], minlength=days)
+        clicks = np.bincount(offsets[kind == CLICK], minlength=days)
+
+    daily = [
+        {'date': str(date), 'impressions': int(i), 'clicks': int(c), 'ctr': ctr(int(i), int(c))}
+        for date, i, c in zip(day_labels(np.arange(first, first + days)), impressions, clicks)
+    ]
+    total_impressions, total_clicks = int(impressions.sum()), int(clicks.sum())
+    return {
+        'period': {'start': start, 'end': end},
+        'totals': {'impressions': total_impressions, 'clicks': total_clicks,
+                   'ctr': ctr(total_impressions, total_clicks)},
+        'daily': daily,
+    }
+
+
+def report_csv(result):
+    """A report as the admin's exportToCSV writes it"""
+    lines = ['Date,Impressions,Clicks,CTR (%)']
+    lines.extend(f"{d['date']},{d['impressions']},{d['clicks']},{d['ctr']}" for d in result['daily'])
+    return '\n'.join(lines)
+
+
+def export_analytics(events, path=ROLLUP_JSON):
+    """Write the log's dailyStats to their own file for the admin to read
+
+    The admin keeps recording events into analytics.json, so the export
+    never writes that file. Its reports use these dailyStats for the days
+    before the export (see getReportData in admin/utils/analyticsManager.js)
+    and their own for the rest.
+    """
+    data = {
+        'generatedAt': format_timestamp(int(time.time() * 1000)),
+        'dailyStats': daily_stats(events),
+    }
+    atomic_write(path, json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
+    return data
+
+
+def import_analytics(log, path=ANALYTICS_JSON):
+    """Append the raw events kept in analytics.json that the log does not have yet
+
+    Events are matched by id, so importing the same file again, or a file
+    exported from the log, adds nothing. Returns (imported, skipped) counts
+    by kind name.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    log.flush()
+    known = log.events().id
+    imported, skipped = {}, {}
+    # Oldest first, so the log stays in arrival order
+    for kind, key in (('impression', 'impressions'), ('click', 'clicks')):
+        events = list(reversed(data.get(key, [])))
+        ids = np.array([str(e.get('id') or '').encode('utf-8') for e in events], dtype='S')
+        present = np.isin(ids, known) & (ids != b'') if len(ids) else np.zeros(0, dtype=bool)
+        seen = set()
+        imported[kind] = skipped[kind] = 0
+        for event, event_id, in_log in zip(events, ids.tolist(), present.tolist()):
+            if in_log or (event_id and event_id in seen):
+                skipped[kind] += 1
+                continue
+            seen.add(event_id)
+            log.append(kind, event)
+            imported[kind] += 1
+    log.flush()
+    return imported, skipped
+
+
+def read_events(lines):
+    """(kind, event) of each JSON line; the kind is the event's "type" field"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        event = json.loads(line)
+        kind = event.pop('type', 'impression')
+        if kind not in KINDS:
+            raise ValueError(f"line {number}: unknown event type {kind!r}")
+        yield kind, event
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', default=str(EVENTS_DIR), help='event log directory (default: admin/data/events)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='append JSON-lines events ({"type": "impression", ...})')
+    ingest.add_argument('file', nargs='?', help='file to read (default: stdin)')
+    commands.add_parser('import', help='append the raw events kept in admin/data/analytics.json')
+    commands.add_parser('export', help='write the dailyStats of the event log to admin/data/analytics-rollup.json')
+    rollup = commands.add_parser('report', help='print impressions, clicks and CTR rolled up by dimensions')
+    rollup.add_argument('--by', default='day', help=f"comma-separated: day,{','.join(DIMENSIONS)} (default: day)")
+    rollup.add_argument('--start', help='first day, YYYY-MM-DD')
+    rollup.add_argument('--end', help='last day, YYYY-MM-DD')
+    commands.add_parser('compact', help='merge the segments of the event log into one')
+    args = parser.parse_args(argv)
+
+    log = EventLog(args.events)
+    if args.command == 'ingest':
+        with log, (open(args.file, 'r', encoding='utf-8') if args.file else sys.stdin) as f:
+            count = 0
+            for kind, event in read_events(f):
+                log.append(kind, event)
+                count += 1
+        print(f"✓ {count} events appended, {len(log.segments)} segments")
+    elif args.command == 'import':
+        imported, skipped = import_analytics(log)
+        print(f"✓ {imported['impression']} impressions and {imported['click']} clicks imported, "
+              f"{sum(skipped.values())} already in the log")
+    elif args.command == 'export':
+        data = export_analytics(log.events())
+        print(f"✓ {ROLLUP_JSON.name}: {len(data['dailyStats'])} days")
+    elif args.command == 'report':
+        start = time.perf_counter()
+        events = log.events()
+        rows = list(rollup_rows(events.rollup(args.by.split(','), events.day_mask(args.start, args.end))))
+        elapsed = time.perf_counter() - start
+        print(json.dumps(rows, indent=1))
+        print(f"{len(rows)} rows from {len(events)} events in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    elif args.command == 'compact':
+        count = log.compact()
+        print(f"✓ {count} events in {len(log.segments)} segment(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Article metadata extracted from the published pages
+
+Mirrors admin/utils/htmlParser.js: the title, JSON-LD dates and author,
+category, lead, featured image and body text of every article page. Parsed
+metadata is cached per file in .sitetools-cache/articles.json and reused
+while the file's size, mtime and content hash are unchanged.
+"""
+import json
+import os
+from html.parser import HTMLParser
+from pathlib import Path
+
+from sitetools.engine import NEWS_DIR
+from sitetools.manifest import CACHE_DIR, content_hash
+from sitetools.output import atomic_write
+
+ARTICLES_CACHE_PATH = CACHE_DIR / 'articles.json'
+
+# Bump when the extracted fields change so cached entries are re-parsed
+PARSER_VERSION = 1
+
+# Template/dummy files to always exclude (same list as the admin)
+EXCLUDED_FILES = {
+    'single-article.html', 'press-release.html', 'category.html', 'index.html',
+    'about.html', 'contact.html', 'search.html', 'newsletter.html', 'privacy.html',
+    'terms.html', 'editorial-standards.html', 'media-kit.html', 'advertisement.html',
+}
+
+# Elements whose text we collect, keyed by class
+TEXT_CLASSES = {
+    'post-cat-large': 'category',
+    'article-lead': 'lead',
+    'article-title': 'headline',
+    'article-body': 'body',
+}
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+}
+
+
+class _ArticleParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = []
+        self.meta = {}
+        self.canonical = ''
+        self.json_ld = []
+        self.texts = {key: [] for key in TEXT_CLASSES.values()}
+        self.featured_image = ''
+        self._stack = []
+        self._in_title = False
+        self._in_json_ld = False
+        self._in_featured = 0
+        self._capture = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'title':
+            self._in_title = True
+        elif tag == 'meta':
+            key = attrs.get('name') or attrs.get('property')
+            if key and key not in self.meta:
+                self.meta[key] = attrs.get('content') or ''
+        elif tag == 'link' and attrs.get('rel') == 'canonical':
+            self.canonical = attrs.get('href') or ''
+        elif tag == 'script' and attrs.get('type') == 'application/ld+json':
+            self._in_json_ld = True
+            self.json_ld.append([])
+        elif tag == 'img' and self._in_featured and not self.featured_image:
+            self.featured_image = attrs.get('src') or ''
+
+        if tag in VOID_TAGS:
+            return
+        classes = (attrs.get('class') or '').split()
+        captured = [TEXT_CLASSES[c] for c in classes if c in TEXT_CLASSES]
+        featured = 'article-featured-image' in classes
+        self._stack.append((tag, captured, featured))
+        self._capture.extend(captured)
+        self._in_featured += featured
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        elif tag == 'script':
+            self._in_json_ld = False
+        if tag in VOID_TAGS:
+            return
+        # Pop up to the matching open tag, tolerating unclosed children
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                for _, captured, featured in self._stack[depth:]:
+                    for key in captured:
+                        self._capture.remove(key)
+                    self._in_featured -= featured
+                del self._stack[depth:]
+                break
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title.append(data)
+        if self._in_json_ld:
+            self.json_ld[-1].append(data)
+            return
+        for key in set(self._capture):
+            self.texts[key].append(data)
+
+
+def _schema(json_ld_blocks):
+    """The first JSON-LD block describing the page itself (not a @graph)"""
+    for block in json_ld_blocks:
+        try:
+            data = json.loads(''.join(block))
+        except ValueError:
+            continue
+        if isinstance(data, dict) and '@graph' not in data:
+            return data
+    return {}
+
+
+def _text(parts):
+    return ' '.join(''.join(parts).split())
+
+
+def parse_article(html, filename=''):
+    """Extract article metadata from page HTML"""
+    parser = _ArticleParser()
+    parser.feed(html)
+    parser.close()
+
+    schema = _schema(parser.json_ld)
+    author = schema.get('author') or ''
+    if isinstance(author, list):
+        author = author[0] if author else ''
+    if isinstance(author, dict):
+        author = author.get('name', '')
+
+    title = _text(parser.title).replace(' — FNPulse', '').strip()
+    lead = _text(parser.texts['lead'])
+    return {
+        'filename': filename,
+        'title': title,
+        'headline': _text(parser.texts['headline']) or schema.get('headline') or title,
+        'description': parser.meta.get('description', ''),
+        'canonicalUrl': parser.canonical,
+        'ogImage': parser.meta.get('og:image', ''),
+        'publishDate': schema.get('datePublished', ''),
+        'modifiedDate': schema.get('dateModified', ''),
+        'author': author,
+        'category': _text(parser.texts['category']) or schema.get('articleSection', ''),
+        'excerpt': lead or parser.meta.get('description', ''),
+        'featuredImage': parser.featured_image,
+        'contentType': (parser.meta.get('content_type') or '').lower() or 'article',
+        'body': _text(parser.texts['body']),
+    }
+
+
+def article_files(news_dir=NEWS_DIR):
+    """Article pages managed by the admin: article-*.html, news/*.html, multimedia/*.html"""
+    news_dir = Path(news_dir)
+    files = [p for p in news_dir.glob('article-*.html') if p.name not in EXCLUDED_FILES]
+    for sub in ('news', 'multimedia'):
+        files.extend(
+            p for p in (news_dir / sub).glob('*.html')
+            if not p.name.startswith('press-') and p.name not in EXCLUDED_FILES
+        )
+    return sorted(files)
+
+
+class ArticleCache:
+    """Parsed article metadata per file, reused while the file is unchanged"""
+
+    def __init__(self, path=ARTICLES_CACHE_PATH):
+        self.path = Path(path)
+        self.entries = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=ARTICLES_CACHE_PATH):
+        cache = cls(path)
+        try:
+            with open(cache.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == PARSER_VERSION:
+                cache.entries = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+        return cache
+
+    def get(self, path, filename):
+        """Metadata for one page, parsing it only if it changed since last time"""
+        key = str(Path(path).resolve())
+        stat = os.stat(path)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['meta']
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+        if entry and entry['sha256'] == digest:
+            meta = entry['meta']
+        else:
+            meta = parse_article(data.decode('utf-8'), filename)
+        self.entries[key] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest, 'meta': meta,
+        }
+        self.dirty = True
+        return meta
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({'version': PARSER_VERSION, 'files': self.entries}, sort_keys=True)
+        atomic_write(self.path, data.encode('utf-8'))
+        self.dirty = False
+
+
+def load_articles(news_dir=NEWS_DIR, cache=None):
+    """Metadata of every article page, using and refreshing the on-disk cache"""
+    news_dir = Path(news_dir)
+    own_cache = cache is None
+    if own_cache:
+        cache = ArticleCache.load()
+
+    articles = []
+    for path in article_files(news_dir):
+        try:
+            articles.append(cache.get(path, path.relative_to(news_dir).as_posix()))
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"✗ {path.name} - Error: {e}")
+
+    if own_cache:
+        cache.save()
+    return articles
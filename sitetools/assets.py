@@ -0,0 +1,194 @@
+"""
+Content-fingerprinted static assets
+
+Shared scripts and stylesheets are published under names carrying a hash of
+their content (/js/theme.3f2a9c1e0b.js, /css/fnpulse.min.5d41402abc.css) so
+they can be served with immutable, long-lived cache headers. Inline scripts
+shared by every page are registered here too and published as files of
+their own. The fingerprinted names are listed in News/_headers (the
+Cloudflare Pages headers file) with an immutable Cache-Control.
+
+Usage: python -m sitetools.assets [--prune] [--dry-run]
+"""
+import argparse
+import hashlib
+import re
+from collections import namedtuple
+from pathlib import Path, PurePosixPath
+
+from sitetools.engine import NEWS_DIR
+from sitetools.output import atomic_write
+
+HASH_LENGTH = 10
+
+# Shared files referenced by (nearly) every page, by URL
+SHARED_FILES = (
+    '/css/fnpulse.min.css',
+    '/css/hero-redesign.css',
+    '/css/dropdown-nav.css',
+    '/js/main.min.js',
+)
+
+HEADERS_FILE = '_headers'
+HEADERS_BEGIN = '# BEGIN sitetools fingerprinted assets'
+HEADERS_END = '# END sitetools fingerprinted assets'
+IMMUTABLE = 'Cache-Control: public, max-age=31536000, immutable'
+
+Asset = namedtuple('Asset', 'url fingerprinted hash data')
+
+# Inline sources registered by the rules, by URL
+_inline = {}
+_current = None
+
+
+def register_inline(url, text):
+    """Publish text as the asset url (e.g. an inline script shared by every page)"""
+    _inline[url] = text.encode('utf-8')
+
+
+def fingerprinted_url(url, digest):
+    path = PurePosixPath(url)
+    return str(path.with_name(f'{path.stem}.{digest}{path.suffix}'))
+
+
+def versions_pattern(url):
+    """Pattern for url and any fingerprinted version of it"""
+    path = PurePosixPath(url)
+    stem = re.escape(str(path.with_suffix('')))
+    return rf'{stem}(?:\.[0-9a-f]{{{HASH_LENGTH}}})?{re.escape(path.suffix)}'
+
+
+def reference_re(url):
+    """Match url, or any fingerprinted version of it, as a quoted attribute value"""
+    return re.compile(rf'(?<=["\']){versions_pattern(url)}(?=["\'?#])')
+
+
+def _is_fingerprint(url, original):
+    return url != original and re.fullmatch(versions_pattern(original), url) is not None
+
+
+def _asset(url, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return Asset(url, fingerprinted_url(url, digest), digest, data)
+
+
+def _local_path(url, news_dir=NEWS_DIR):
+    return Path(news_dir) / url.lstrip('/')
+
+
+class Assets:
+    """The current fingerprint of every shared asset"""
+
+    def __init__(self, news_dir=NEWS_DIR):
+        self.news_dir = Path(news_dir)
+        self.assets = {}
+        for url in SHARED_FILES:
+            path = _local_path(url, news_dir)
+            if path.exists():
+                self.assets[url] = _asset(url, path.read_bytes())
+        for url, data in _inline.items():
+            self.assets[url] = _asset(url, data)
+        self._patterns = {url: reference_re(url) for url in self.assets}
+
+    def __iter__(self):
+        return iter(self.assets.values())
+
+    def get(self, url):
+        return self.assets[url]
+
+    def pattern(self, url):
+        return self._patterns[url]
+
+    def hashes(self):
+        return {url: asset.hash for url, asset in self.assets.items()}
+
+    def publish(self, dry_run=False):
+        """Write every fingerprinted file that does not exist yet; returns their URLs"""
+        published = []
+        for asset in self:
+            target = _local_path(asset.fingerprinted, self.news_dir)
+            if target.exists():
+                continue
+            published.append(asset.fingerprinted)
+            if not dry_run:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(target, asset.data)
+        if not dry_run:
+            self.write_headers()
+        return published
+
+    def stale_files(self):
+        """Fingerprinted files of these assets other than the current ones"""
+        stale = []
+        for asset in self:
+            path = PurePosixPath(asset.url)
+            folder = _local_path(str(path.parent), self.news_dir)
+            for candidate in folder.glob(f'{path.stem}.*{path.suffix}'):
+                url = '/' + candidate.relative_to(self.news_dir).as_posix()
+                if url != asset.fingerprinted and _is_fingerprint(url, asset.url):
+                    stale.append(candidate)
+        return sorted(stale)
+
+    def write_headers(self):
+        """List the fingerprinted URLs with an immutable Cache-Control in News/_headers"""
+        path = self.news_dir / HEADERS_FILE
+        try:
+            text = path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            text = ''
+
+        lines = [HEADERS_BEGIN]
+        for asset in sorted(self, key=lambda a: a.url):
+            lines += [asset.fingerprinted, f'  {IMMUTABLE}']
+        block = '\n'.join(lines + [HEADERS_END]) + '\n'
+
+        start, end = text.find(HEADERS_BEGIN), text.find(HEADERS_END)
+        if start != -1 and end != -1:
+            new_text = text[:start] + block + text[end + len(HEADERS_END):].lstrip('\n')
+        else:
+            new_text = text + ('\n' if text and not text.endswith('\n') else '') + block
+        if new_text != text:
+            atomic_write(path, new_text.encode('utf-8'))
+
+
+def current(news_dir=NEWS_DIR):
+    """The assets for this run, hashed on first use"""
+    global _current
+    if _current is None:
+        _current = Assets(news_dir)
+    return _current
+
+
+def reset():
+    """Forget the current fingerprints so the next call to current() rehashes the files"""
+    global _current
+    _current = None
+
+
+def main(argv=None):
+    # Importing the rules registers the inline assets
+    from sitetools import rules  # noqa: F401
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--prune', action='store_true',
+                        help='delete fingerprinted files that are no longer the current version')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='only report what would be written or deleted')
+    args = parser.parse_args(argv)
+
+    assets = current()
+    published = assets.publish(args.dry_run)
+    for asset in sorted(assets, key=lambda a: a.url):
+        state = 'new' if asset.fingerprinted in published else 'current'
+        print(f"✓ {asset.url} -> {asset.fingerprinted} ({state})")
+
+    if args.prune:
+        for path in assets.stale_files():
+            print(f"{'Would delete' if args.dry_run else 'Deleted'} {path.relative_to(assets.news_dir)}")
+            if not args.dry_run:
+                path.unlink()
+
+
+if __name__ == '__main__':
+    # Run the importable module, whose registry the rules fill in, not __main__
+    from sitetools import assets
+    assets.main()
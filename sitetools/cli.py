@@ -0,0 +1,81 @@
+"""
+Command-line options shared by the maintenance scripts
+"""
+import argparse
+
+from sitetools import compress, engine, profiling
+from sitetools.manifest import Manifest
+
+
+def build_parser(doc, files=False):
+    """Create an argument parser described by the first line of a script docstring"""
+    description = doc.strip().splitlines()[0] if doc else None
+    parser = argparse.ArgumentParser(description=description)
+    if files:
+        parser.add_argument('files', nargs='*', help='HTML files to process (default: News/*.html)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (0 = one per CPU, default: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='reprocess every file, ignoring the manifest of up-to-date pages')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='print a unified diff of each change instead of writing files')
+    parser.add_argument('--profile', action='store_true',
+                        help='time read/search/substitution/write per rule and file and print a summary table')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='with --profile, also write the per-file trace to PATH (.json or .csv)')
+    parser.add_argument('--slowest', type=int, default=10, metavar='N',
+                        help='number of slowest files to highlight (default: 10)')
+    parser.add_argument('-z', '--compress', action='store_true',
+                        help='also write .gz/.br variants of every page written and report the savings')
+    return parser
+
+
+def add_rule_options(parser):
+    """--rules and --minify, for the entry points that can run any rule"""
+    parser.add_argument('--rules', help='comma-separated rule names to run (default: all but minify)')
+    parser.add_argument('--minify', action='store_true',
+                        help='also run the minify rule, which drops comments such as section markers')
+
+
+def rule_names(args):
+    """The rule names selected by --rules and --minify, or None for the default rules"""
+    names = args.rules.split(',') if args.rules else None
+    if args.minify:
+        names = (names or [r.name for r in engine.select_rules()]) + ['minify']
+    return names
+
+
+def load_manifest(args):
+    """The manifest to skip up-to-date files with, or None when --force is given"""
+    return None if args.force else Manifest.load()
+
+
+def report_profile(results, args):
+    """Print the profile table and write the trace when --profile was given"""
+    if not args.profile:
+        return
+    profiling.print_profile(results, args.slowest)
+    if args.trace:
+        profiling.write_trace(results, args.trace, args.slowest)
+        print(f"\nTrace written to {args.trace}")
+
+
+def run_rules(args, paths, rule_names=None):
+    """Run the rules over paths as the shared options ask, then print the report, profile and savings"""
+    results = engine.run(paths, rule_names, jobs=args.jobs, manifest=load_manifest(args),
+                         dry_run=args.dry_run, profile=args.profile, precompress=args.compress)
+    engine.report(results)
+    report_profile(results, args)
+    compress_output(args, results)
+    return results
+
+
+def compress_output(args, results):
+    """Report the precompressed variants the run wrote when --compress was given"""
+    if not args.compress:
+        return
+    if args.dry_run:
+        print("\nDry run: precompressed variants not updated")
+        return
+    print()
+    compress.report([r.compressed for r in results if r.compressed is not None], [])
@@ -0,0 +1,331 @@
+"""
+Precompressed .gz and .br variants of the site's text files
+
+Every HTML, CSS, JS, SVG and XML file under News/ gets a gzip (level 9) and,
+when the optional brotli package is installed, a Brotli (quality 11)
+variant next to it, so the server can send them without compressing on
+each request. Files are compressed in parallel and only when their content
+changed: the size, mtime and content hash each variant was made from are
+kept in .sitetools-cache/compressed.json. Variants of files that were
+deleted, or shrank below MIN_SIZE, are removed along with their entries.
+
+The maintenance scripts' --compress writes the variants of each page as the
+engine writes it (see compress_written); this module's own pass covers the
+rest of News/ (stylesheets, scripts, pages no rule touched) and pruning.
+
+Usage: python -m sitetools.compress [--jobs N] [--force]
+"""
+import argparse
+import gzip
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sitetools.engine import NEWS_DIR, chunk_size, resolve_jobs
+from sitetools.manifest import CACHE_DIR, content_hash, file_key
+from sitetools.output import atomic_write, format_bytes
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSED_CACHE_PATH = CACHE_DIR / 'compressed.json'
+
+COMPRESSIBLE = ('.html', '.css', '.js', '.svg', '.xml')
+
+# Every variant suffix this module writes, with or without brotli installed
+VARIANT_SUFFIXES = ('.gz', '.br')
+
+# Below this size the compressed variant saves too little to be worth serving
+MIN_SIZE = 256
+
+CompressResult = namedtuple('CompressResult', 'path size variants error entry', defaults=(None, None))
+
+
+def _gzip(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+
+
+def encoders():
+    """The available encodings, by variant suffix"""
+    available = {'.gz': _gzip}
+    if brotli is not None:
+        available['.br'] = _brotli
+    return available
+
+
+def site_files(directory=NEWS_DIR):
+    """Every compressible file under directory"""
+    return sorted(
+        p for p in Path(directory).rglob('*')
+        if p.suffix in COMPRESSIBLE and p.is_file() and 'node_modules' not in p.parts
+    )
+
+
+def variant_files(directory=NEWS_DIR):
+    """Every precompressed variant under directory"""
+    return sorted(
+        p for p in Path(directory).rglob('*')
+        if p.suffix in VARIANT_SUFFIXES and p.with_suffix('').suffix in COMPRESSIBLE
+        and 'node_modules' not in p.parts
+    )
+
+
+class CompressionCache:
+    """Source size/mtime/hash and variant sizes for each compressed file"""
+
+    def __init__(self, path=COMPRESSED_CACHE_PATH):
+        self.path = Path(path)
+        self.files = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=COMPRESSED_CACHE_PATH):
+        cache = cls(path)
+        try:
+            with open(cache.path, 'r', encoding='utf-8') as f:
+                cache.files = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            pass
+        return cache
+
+    def get(self, path):
+        return self.files.get(file_key(path))
+
+    def is_current(self, path, suffixes):
+        """True when every variant exists and was made from the file as it is now"""
+        entry = self.get(path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return False
+        return all(_variant_current(path, suffix, entry) for suffix in suffixes)
+
+    def record(self, path, entry):
+        self.files[file_key(path)] = entry
+        self.dirty = True
+
+    def forget(self, path):
+        if self.files.pop(file_key(path), None) is not None:
+            self.dirty = True
+
+    def retain(self, paths):
+        """Forget every file not in paths"""
+        keep = {file_key(path) for path in paths}
+        for key in set(self.files) - keep:
+            del self.files[key]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, json.dumps({'files': self.files}, indent=1, sort_keys=True).encode('utf-8'))
+        self.dirty = False
+
+
+def _variant_path(path, suffix):
+    return Path(str(path) + suffix)
+
+
+def _variant_current(path, suffix, entry):
+    size = entry['variants'].get(suffix)
+    if size is None:
+        # Skipped because compressing did not make the file smaller
+        return suffix in entry.get('skipped', [])
+    try:
+        return os.stat(_variant_path(path, suffix)).st_size == size
+    except OSError:
+        return False
+
+
+def compress_file(path, entry=None, data=None):
+    """Write the missing or outdated variants of one file
+
+    entry is the cache entry from the last run; variants made from the same
+    content hash are kept. data is the file's content when the caller has
+    it already. Returns a CompressResult whose entry is the new cache entry,
+    and whose variants maps each suffix to (size, written).
+    """
+    try:
+        stat = os.stat(path)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        digest = content_hash(data)
+        same_content = entry is not None and entry['sha256'] == digest
+
+        new_entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest,
+                     'variants': {}, 'skipped': []}
+        variants = {}
+        for suffix, encode in encoders().items():
+            variant = _variant_path(path, suffix)
+            if same_content and _variant_current(path, suffix, entry):
+                if suffix in entry.get('skipped', []):
+                    new_entry['skipped'].append(suffix)
+                else:
+                    new_entry['variants'][suffix] = entry['variants'][suffix]
+                    variants[suffix] = (entry['variants'][suffix], False)
+                continue
+
+            compressed = encode(data)
+            if len(compressed) >= len(data):
+                new_entry['skipped'].append(suffix)
+                if variant.exists():
+                    variant.unlink()
+                continue
+            atomic_write(variant, compressed)
+            new_entry['variants'][suffix] = len(compressed)
+            variants[suffix] = (len(compressed), True)
+
+        return CompressResult(str(path), len(data), variants, None, new_entry)
+
+    except Exception as e:
+        return CompressResult(str(path), None, {}, str(e))
+
+
+def compress_written(path, data):
+    """Write the variants of a file the engine just wrote with data
+
+    Runs in the worker that wrote the file. A file now below MIN_SIZE loses
+    its variants instead; its result has no cache entry.
+    """
+    if len(data) < MIN_SIZE:
+        for suffix in VARIANT_SUFFIXES:
+            _variant_path(path, suffix).unlink(missing_ok=True)
+        return CompressResult(str(path), len(data), {})
+    return compress_file(path, data=data)
+
+
+def record_written(results, cache=None):
+    """Keep the cache entries of the variants compress_written made"""
+    cache = cache if cache is not None else CompressionCache.load()
+    for result in results:
+        if result.error is not None:
+            continue
+        if result.entry is None:
+            cache.forget(result.path)
+        else:
+            cache.record(result.path, result.entry)
+    cache.save()
+
+
+def run(paths, jobs=1, cache=None):
+    """Compress every path whose variants are missing or outdated
+
+    Returns (results, up_to_date): results for the files that were looked
+    at, and CompressResults rebuilt from the cache for files skipped after
+    a stat.
+    """
+    paths = [p for p in sorted(paths, key=str) if os.path.getsize(p) >= MIN_SIZE]
+    suffixes = list(encoders())
+
+    pending, up_to_date = [], []
+    for path in paths:
+        entry = cache.get(path) if cache is not None else None
+        if cache is not None and cache.is_current(path, suffixes):
+            variants = {suffix: (size, False) for suffix, size in entry['variants'].items()}
+            up_to_date.append(CompressResult(str(path), entry['size'], variants))
+        else:
+            pending.append((path, entry))
+
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(pending) < 2:
+        results = [compress_file(path, entry) for path, entry in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            results = list(pool.map(compress_file, *zip(*pending),
+                                    chunksize=chunk_size(len(pending), jobs)))
+
+    if cache is not None:
+        for result in results:
+            if result.error is None:
+                cache.record(result.path, result.entry)
+        cache.save()
+    return results, up_to_date
+
+
+def prune(sources, directory=NEWS_DIR, cache=None):
+    """Delete the variants under directory of files that are not in sources
+
+    sources are the files compressed by this run; variants left over from
+    deleted files, or from files now below MIN_SIZE, would otherwise be
+    served stale. Their cache entries are dropped too. Returns the deleted
+    variant paths.
+    """
+    keep = {file_key(path) for path in sources}
+    stale = [p for p in variant_files(directory) if file_key(p.with_suffix('')) not in keep]
+    for variant in stale:
+        variant.unlink(missing_ok=True)
+    if cache is not None:
+        cache.retain(sources)
+        cache.save()
+    return stale
+
+
+def _saving(size, compressed):
+    return f"{format_bytes(compressed)} ({(compressed - size) / size:+.0%})" if size else format_bytes(compressed)
+
+
+def report(results, up_to_date, root=NEWS_DIR, removed=()):
+    """Print the savings of every newly written variant, then the totals for all files"""
+    written = [r for r in results if r.error is None and any(w for _, w in r.variants.values())]
+    for result in written:
+        try:
+            name = Path(result.path).relative_to(root).as_posix()
+        except ValueError:
+            name = os.path.basename(result.path)
+        detail = ', '.join(f"{suffix[1:]} {_saving(result.size, size)}"
+                           for suffix, (size, _) in sorted(result.variants.items()))
+        print(f"✓ {name} - {format_bytes(result.size)} -> {detail}")
+    for result in results:
+        if result.error:
+            print(f"✗ {os.path.basename(result.path)} - Error: {result.error}")
+
+    everything = [r for r in results + up_to_date if r.error is None]
+    print(f"\nCompressed: {len(written)} files written, {len(up_to_date)} up to date")
+    if removed:
+        print(f"  removed {len(removed)} variants of deleted or too small files")
+    for suffix in encoders():
+        pairs = [(r.size, r.variants[suffix][0]) for r in everything if suffix in r.variants]
+        if pairs:
+            before = sum(size for size, _ in pairs)
+            after = sum(size for _, size in pairs)
+            print(f"  {suffix[1:]}: {len(pairs)} files, {format_bytes(before)} -> "
+                  f"{_saving(before, after)}, saves {format_bytes(before - after)}")
+    if brotli is None:
+        print("  ⚠ brotli is not installed, only .gz variants were written (pip install brotli)")
+
+
+def compress_site(jobs=1, force=False, directory=NEWS_DIR):
+    """Bring the variants of every file under directory up to date and report"""
+    cache = CompressionCache() if force else CompressionCache.load()
+    results, up_to_date = run(site_files(directory), jobs, cache)
+    removed = prune([r.path for r in results + up_to_date], directory, cache)
+    report(results, up_to_date, directory, removed)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (0 = one per CPU, the default)')
+    parser.add_argument('--force', action='store_true', help='recompress every file, ignoring the cache')
+    args = parser.parse_args(argv)
+    compress_site(args.jobs, args.force)
+
+
+if __name__ == '__main__':
+    main()
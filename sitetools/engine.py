@@ -0,0 +1,383 @@
+"""
+Single-pass rule engine for the News/ maintenance scripts
+
+Every transform is registered as an ordered rule. Each HTML file is read
+once, passed through every applicable rule in memory and written at most
+once, so running several fixes costs one read and one write per page.
+
+Rules that render shared data record what each page was built from
+(ctx.depends), so when only that data changes a page is revisited by just
+those rules and the ones ordered after them (which may rewrite what was
+spliced, e.g. minify), and pages that do not use the changed data are not
+opened.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+
+from sitetools import output
+from sitetools.manifest import content_hash
+from sitetools.profiling import NULL_PHASE, PhaseTimer, new_file_profile, new_rule_stats
+
+NEWS_DIR = Path(__file__).resolve().parent.parent / 'News'
+
+# Registered rules, kept sorted by their order value
+RULES = []
+
+FileResult = namedtuple(
+    'FileResult', 'path changed applied notes error digest size mtime_ns old_size diff profile deps compressed',
+    defaults=(None, None, None, None, None, None, None, None),
+)
+
+# What a run has to do for one page: the rules to run and why
+Job = namedtuple('Job', 'path rules known_digest reason')
+
+
+class Rule:
+    """A named content transform applied by the engine"""
+
+    def __init__(self, name, func, order, version=1, exclude=(), inputs=None, prepare=None, default=True):
+        self.name = name
+        self.func = func
+        self.order = order
+        self.version = version
+        self.exclude = frozenset(exclude)
+        self.inputs = inputs
+        self.prepare = prepare
+        self.default = default
+
+    def applies_to(self, path):
+        return Path(path).name not in self.exclude
+
+    def state(self):
+        """Version recorded in the manifest"""
+        return self.version
+
+    def current_inputs(self):
+        """Hash of every piece of shared data the rule renders from, by key"""
+        return self.inputs() if self.inputs is not None else {}
+
+    def __repr__(self):
+        return f'<Rule {self.name} v{self.version}>'
+
+
+class FileContext:
+    """Per-file state handed to every rule"""
+
+    def __init__(self, path, profile=None):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.notes = []
+        self.profile = profile
+        self.rule = None
+        self.deps = {}
+
+    def note(self, message):
+        """Record a message to show next to the file in the report"""
+        self.notes.append(message)
+
+    def phase(self, name):
+        """Time a 'search' or 'sub' step of the current rule when profiling"""
+        if self.profile is None:
+            return NULL_PHASE
+        return PhaseTimer(self.profile['rules'][self.rule], name)
+
+    def matched(self, count=1):
+        """Count pattern matches of the current rule when profiling"""
+        if self.profile is not None:
+            self.profile['rules'][self.rule]['matches'] += count
+
+    def depends(self, key, digest):
+        """Record that the page now contains the shared data key at version digest"""
+        self.deps.setdefault(self.rule, {})[key] = digest
+
+
+def rule(name, order, version=1, exclude=(), inputs=None, prepare=None, default=True):
+    """Register the decorated function as a rule
+
+    inputs is an optional callable returning {key: hash} for the shared data
+    the rule renders from. A page that recorded key with ctx.depends is
+    revisited by the rule when that key's hash changes.
+
+    prepare is an optional callable run once in the main process before any
+    page is processed, with the dry_run flag, e.g. to publish files the
+    rewritten pages will reference.
+
+    A rule registered with default=False is opt-in: it only runs when it is
+    named, not when every rule is selected.
+    """
+    def decorator(func):
+        if get_rule(name, default=None) is not None:
+            raise ValueError(f'Rule {name!r} is already registered')
+        RULES.append(Rule(name, func, order, version, exclude, inputs, prepare, default))
+        RULES.sort(key=lambda r: r.order)
+        return func
+    return decorator
+
+
+def get_rule(name, default=KeyError):
+    for r in RULES:
+        if r.name == name:
+            return r
+    if default is KeyError:
+        raise KeyError(f'Unknown rule {name!r}')
+    return default
+
+
+def select_rules(names=None):
+    """Return the registered rules to run, always in registry order
+
+    Without names every rule except the opt-in ones is selected.
+    """
+    # Importing the rules module populates the registry
+    from sitetools import rules  # noqa: F401
+
+    if not names:
+        return [r for r in RULES if r.default]
+    wanted = {get_rule(name).name for name in names}
+    return [r for r in RULES if r.name in wanted]
+
+
+def apply_rules(content, path, selected, profile=None):
+    """Run the selected rules over content, returning (content, applied, ctx)"""
+    ctx = FileContext(path, profile)
+    applied = []
+    for r in selected:
+        if not r.applies_to(path):
+            continue
+        ctx.rule = r.name
+        if profile is None:
+            new_content = r.func(content, ctx)
+        else:
+            stats = profile['rules'][r.name] = new_rule_stats()
+            with PhaseTimer(stats, 'total'):
+                new_content = r.func(content, ctx)
+        if new_content != content:
+            applied.append(r.name)
+            content = new_content
+    return content, applied, ctx
+
+
+def process_file(path, rule_names=None, known_digest=None, dry_run=False, profile=False, precompress=False):
+    """Read a file once, apply every rule and write it back only if it changed
+
+    known_digest is the hash recorded after the rules last ran. When the file
+    still has that content (only its mtime moved) the rules are not rerun.
+    With dry_run nothing is written and the result carries a unified diff.
+    With profile the result carries read/search/sub/write timings per rule.
+    With precompress a written file gets its .gz/.br variants right away and
+    the result carries their CompressResult.
+    """
+    selected = select_rules(rule_names)
+    stats = new_file_profile() if profile else None
+    try:
+        started = perf_counter()
+        with open(path, 'rb') as f:
+            data = f.read()
+        if stats is not None:
+            stats['read'] = perf_counter() - started
+            stats['bytes_read'] = len(data)
+        digest = content_hash(data)
+        old_size = len(data)
+        diff = None
+        deps = None
+        compressed = None
+
+        if digest == known_digest:
+            applied, notes = [], ['unchanged since last run']
+        else:
+            content = data.decode('utf-8')
+            new_content, applied, ctx = apply_rules(content, path, selected, stats)
+            notes, deps = ctx.notes, ctx.deps
+
+            if applied:
+                new_data = new_content.encode('utf-8')
+                started = perf_counter()
+                written = output.write_if_changed(path, data, new_data, dry_run)
+                if stats is not None and written and not dry_run:
+                    stats['write'] = perf_counter() - started
+                    stats['bytes_written'] = len(new_data)
+                if dry_run:
+                    diff = output.unified_diff(path, content, new_content)
+                elif written and precompress:
+                    # Imported here: sitetools.compress builds on this module
+                    from sitetools import compress
+                    compressed = compress.compress_written(path, new_data)
+                data = new_data
+                digest = content_hash(data)
+
+        stat = os.stat(path)
+        return FileResult(str(path), bool(applied), applied, notes, None,
+                          digest, len(data), stat.st_mtime_ns, old_size, diff, stats, deps, compressed)
+
+    except Exception as e:
+        return FileResult(str(path), False, [], [], str(e))
+
+
+def _process_in_worker(dry_run, profile, precompress, path, rule_names, known_digest):
+    return process_file(path, rule_names, known_digest, dry_run, profile, precompress)
+
+
+def resolve_jobs(jobs):
+    """Turn a --jobs value into a worker count (0 means one per CPU)"""
+    if not jobs or jobs < 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def chunk_size(total, jobs):
+    """Batch files so each worker gets a few chunks instead of one file per task"""
+    return max(1, total // (jobs * 4))
+
+
+def plan(paths, rule_names=None, manifest=None):
+    """Work out what each page needs without opening it
+
+    Returns one Job per path, in sorted path order. Pages whose size and
+    mtime match the manifest and whose recorded rules and dependencies are
+    current get no rules. Pages that are unchanged but depend on shared data
+    whose hash moved get the rules that render that data and every selected
+    rule ordered after them. Everything else gets every selected rule.
+    """
+    paths = sorted(paths, key=str)
+    selected = select_rules(rule_names)
+    all_names = [r.name for r in selected]
+    inputs = {r.name: r.current_inputs() for r in selected if r.inputs is not None}
+
+    jobs = []
+    for path in paths:
+        entry = manifest.get(path) if manifest is not None else None
+        if entry is None:
+            jobs.append(Job(path, all_names, None, 'new'))
+            continue
+
+        outdated, stale_deps = manifest.outdated_rules(entry, selected, inputs)
+        unchanged = manifest.stat_matches(entry, path)
+        if not outdated:
+            if unchanged:
+                jobs.append(Job(path, [], entry['sha256'], 'up to date'))
+            else:
+                jobs.append(Job(path, all_names, entry['sha256'], 'touched'))
+        elif unchanged and all(r.name in stale_deps for r in outdated):
+            # Only the shared data moved: re-splice just what depends on it,
+            # then rerun the later rules, which may rewrite what was spliced
+            first = min(r.order for r in outdated)
+            names = [r.name for r in selected if r in outdated or r.order > first]
+            keys = sorted(set().union(*stale_deps.values()))
+            jobs.append(Job(path, names, None, 'depends on ' + ', '.join(keys)))
+        else:
+            jobs.append(Job(path, all_names, None, 'changed'))
+    return jobs
+
+
+def run(paths, rule_names=None, jobs=1, manifest=None, dry_run=False, profile=False, precompress=False):
+    """Process every path and return the results in sorted path order
+
+    With jobs > 1 the files are spread across a process pool in chunks.
+    Results still come back in sorted order, so reports stay diffable.
+    With a manifest, files unchanged since the rules last ran are skipped
+    after a stat, without being opened, and files that only need shared
+    data refreshed are run through just the rules rendering it (see plan).
+    A dry run leaves files and the manifest untouched. With profile each
+    processed result carries timings. With precompress every file written
+    also gets its precompressed variants (see sitetools.compress).
+    """
+    selected = select_rules(rule_names)
+    for r in selected:
+        if r.prepare is not None:
+            r.prepare(dry_run)
+    planned = plan(paths, rule_names, manifest)
+
+    results = {}
+    pending = []
+    for job in planned:
+        if job.rules:
+            pending.append(job)
+            continue
+        entry = manifest.get(job.path)
+        results[job.path] = FileResult(str(job.path), False, [], [job.reason], None,
+                                       entry['sha256'], entry['size'], entry['mtime_ns'])
+
+    workers = resolve_jobs(jobs)
+    if workers == 1 or len(pending) < 2:
+        processed = [process_file(j.path, j.rules, j.known_digest, dry_run, profile, precompress)
+                     for j in pending]
+    else:
+        worker = partial(_process_in_worker, dry_run, profile, precompress)
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            processed = list(pool.map(worker, [j.path for j in pending], [j.rules for j in pending],
+                                      [j.known_digest for j in pending],
+                                      chunksize=chunk_size(len(pending), workers)))
+
+    if dry_run:
+        manifest = None
+
+    for job, result in zip(pending, processed):
+        results[job.path] = result
+        if manifest is not None and not result.error:
+            ran = [r for r in selected if r.name in job.rules]
+            # A dependency refresh reruns every rule from the first stale one
+            # on, so the earlier rules still hold for the new content
+            refresh = len(ran) < len(selected)
+            manifest.record(job.path, result.size, result.mtime_ns, result.digest, ran,
+                            result.changed, result.deps, keep_rules=refresh)
+
+    if manifest is not None:
+        manifest.save()
+    compressed = [r.compressed for r in processed if r.compressed is not None]
+    if compressed:
+        from sitetools import compress
+        compress.record_written(compressed)
+    return [results[job.path] for job in planned]
+
+
+def html_files(directory=NEWS_DIR, pattern='*.html'):
+    """List the HTML pages of the site"""
+    return sorted(Path(directory).glob(pattern))
+
+
+def print_result(result):
+    name = os.path.basename(result.path)
+    if result.error:
+        print(f"✗ {name} - Error: {result.error}")
+    elif result.changed:
+        verb = 'would apply' if result.diff is not None else 'applied'
+        size = ''
+        if result.old_size is not None and result.size != result.old_size:
+            size = f", {output.format_saving(result.old_size, result.size)}"
+        print(f"✓ {name} - {verb} {', '.join(result.applied)}{size}")
+        if result.diff:
+            print(result.diff, end='' if result.diff.endswith('\n') else '\n')
+    else:
+        detail = '; '.join(result.notes) if result.notes else 'no changes'
+        print(f"✓ {name} - {detail}, skipping")
+
+
+def print_summary(results):
+    changed = sum(1 for r in results if r.changed)
+    errors = sum(1 for r in results if r.error)
+
+    print(f"\n{'='*60}")
+    print(f"Summary:")
+    print(f"  Fixed: {changed}")
+    print(f"  Skipped: {len(results) - changed - errors}")
+    if errors:
+        print(f"  Errors: {errors}")
+    print(f"  Total: {len(results)}")
+    if changed:
+        before = sum(r.old_size for r in results if r.changed)
+        after = sum(r.size for r in results if r.changed)
+        dry_run = any(r.diff is not None for r in results)
+        label = 'Would write' if dry_run else 'Written'
+        print(f"  {label}: {changed} files, {output.format_bytes(after)} "
+              f"({after - before:+d} bytes)")
+    print(f"{'='*60}")
+
+
+def report(results):
+    for result in results:
+        print_result(result)
+    print_summary(results)
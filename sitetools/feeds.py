@@ -0,0 +1,480 @@
+"""
+Sitemaps and per-category RSS/Atom feeds for the site
+
+Every page's canonical URL, JSON-LD datePublished/dateModified, og:image and
+category are read with the article parser, whose results are cached per
+file by content hash in .sitetools-cache/articles.json, so a rerun only
+parses the pages that changed. Published press releases in
+News/data/content.json are added to the feeds.
+
+URLs are spread over News/sitemap-1.xml, sitemap-2.xml, ... (up to
+SHARD_SIZE each), listed in the sitemap index News/sitemap.xml. A URL keeps
+the shard it was first given and new URLs fill the first shard with room,
+so publishing an article changes one shard and the index. The feeds carry
+the latest FEED_SIZE items: News/feeds/all.rss and all.atom, and an .rss and
+.atom per category (feeds/markets.rss, ...).
+
+Files are streamed out element by element with xml.sax.saxutils.XMLGenerator
+into a temporary file, and only written when the digest of their entries
+changed; the digests and the shard of every URL are kept in
+.sitetools-cache/feeds.json.
+
+Usage: python -m sitetools.feeds [--force] [--shard-size N] [--site-url URL]
+"""
+import argparse
+import hashlib
+import json
+import re
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from urllib.parse import quote, urljoin
+from xml.sax.saxutils import XMLGenerator
+
+from sitetools.articles import ArticleCache, article_files
+from sitetools.engine import NEWS_DIR
+from sitetools.fragments import load_content
+from sitetools.manifest import CACHE_DIR
+from sitetools.output import atomic_writer
+
+FEEDS_CACHE_PATH = CACHE_DIR / 'feeds.json'
+CONFIG_JSON = NEWS_DIR.parent / 'admin' / 'data' / 'config.json'
+FEEDS_DIR = 'feeds'
+
+# Bump when the output format changes so every file is written again
+FORMAT_VERSION = 1
+
+DEFAULT_SITE_URL = 'https://fnpulse.com'
+DEFAULT_SITE_NAME = 'FNPulse'
+# The protocol allows 50,000 URLs per sitemap
+SHARD_SIZE = 10000
+FEED_SIZE = 50
+
+# Templates and backups that are not pages of their own
+SITEMAP_EXCLUDED = {'single-article.html', 'press-release.html', 'category.html', 'index-broken-backup.html'}
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+IMAGE_NS = 'http://www.google.com/schemas/sitemap-image/1.1'
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+DC_NS = 'http://purl.org/dc/elements/1.1/'
+
+SLUG_RE = re.compile(r'[^a-z0-9]+')
+
+# One sitemap URL, and one feed item
+PageEntry = namedtuple('PageEntry', 'loc lastmod image')
+FeedItem = namedtuple('FeedItem', 'title link published updated summary category author')
+Output = namedtuple('Output', 'name count written')
+
+
+def _digest(value):
+    data = json.dumps([FORMAT_VERSION, value], sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _parse_date(value):
+    """An aware datetime for an ISO date or date-time (UTC when no offset is given)"""
+    if not value:
+        return None
+    try:
+        date = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def w3c_date(value):
+    """value as a W3C datetime for <lastmod> and Atom dates, or '' if it is not a date"""
+    date = _parse_date(value)
+    if date is None:
+        return ''
+    return date.isoformat(timespec='seconds').replace('+00:00', 'Z')
+
+
+def rfc822_date(value):
+    date = _parse_date(value)
+    return format_datetime(date) if date else ''
+
+
+def slugify(text):
+    return SLUG_RE.sub('-', text.lower()).strip('-')
+
+
+def load_site(path=CONFIG_JSON):
+    """(site URL, name, description) from the admin's config.json"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    return (
+        (config.get('siteUrl') or DEFAULT_SITE_URL).rstrip('/'),
+        config.get('siteName') or DEFAULT_SITE_NAME,
+        config.get('siteDescription') or '',
+    )
+
+
+def absolute_url(site_url, url):
+    """url made absolute against the site root, percent-encoding what needs it"""
+    if not url:
+        return ''
+    return quote(urljoin(site_url + '/', url), safe=":/?#[]@!$&'()*+,;=%~")
+
+
+def page_url(site_url, relative):
+    """The URL a page is served at when it declares no canonical URL"""
+    if relative == 'index.html' or relative.endswith('/index.html'):
+        relative = relative[:-len('index.html')]
+    # The home page is the site root itself
+    return absolute_url(site_url, relative or './')
+
+
+def site_pages(news_dir=NEWS_DIR):
+    """Every page that belongs in the sitemap"""
+    return sorted(
+        p for p in Path(news_dir).rglob('*.html')
+        if p.name not in SITEMAP_EXCLUDED and 'node_modules' not in p.parts
+        and not any(part.startswith('.') for part in p.relative_to(news_dir).parts)
+    )
+
+
+def page_metadata(news_dir=NEWS_DIR, cache=None):
+    """Parsed metadata of every sitemap page, by site-relative path"""
+    news_dir = Path(news_dir)
+    own_cache = cache is None
+    if own_cache:
+        cache = ArticleCache.load()
+
+    pages = {}
+    for path in site_pages(news_dir):
+        relative = path.relative_to(news_dir).as_posix()
+        try:
+            pages[relative] = cache.get(path, relative)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"✗ {relative} - Error: {e}")
+
+    if own_cache:
+        cache.save()
+    return pages
+
+
+def page_entries(pages, site_url):
+    """One PageEntry per distinct URL, in path order"""
+    entries = {}
+    for relative, meta in sorted(pages.items()):
+        loc = absolute_url(site_url, meta['canonicalUrl']) or page_url(site_url, relative)
+        if loc in entries:
+            continue
+        lastmod = w3c_date(meta['modifiedDate']) or w3c_date(meta['publishDate'])
+        image = absolute_url(site_url, meta['ogImage'] or meta['featuredImage'])
+        entries[loc] = PageEntry(loc, lastmod, image)
+    return entries
+
+
+def feed_items(pages, site_url, content, news_dir=NEWS_DIR):
+    """Articles and published press releases, newest first"""
+    articles = {p.relative_to(news_dir).as_posix() for p in article_files(news_dir)}
+    items = []
+    for relative, meta in pages.items():
+        if relative not in articles or not _parse_date(meta['publishDate']):
+            continue
+        items.append(FeedItem(
+            title=meta['headline'] or meta['title'],
+            link=absolute_url(site_url, meta['canonicalUrl']) or page_url(site_url, relative),
+            published=meta['publishDate'],
+            updated=meta['modifiedDate'] or meta['publishDate'],
+            summary=meta['excerpt'] or meta['description'],
+            category=meta['category'] or 'News',
+            author=meta['author'],
+        ))
+
+    for release in content.get('pressReleases', []):
+        filename = release.get('filename')
+        # Same filter as the ticker: published and the page exists
+        if release.get('status') != 'published' or not filename or not (Path(news_dir) / filename).exists():
+            continue
+        if not _parse_date(release.get('releaseDate')):
+            continue
+        items.append(FeedItem(
+            title=release.get('headline', ''),
+            link=page_url(site_url, filename),
+            published=release.get('releaseDate'),
+            updated=release.get('updatedAt') or release.get('releaseDate'),
+            summary=release.get('lead') or release.get('metaDescription', ''),
+            category='Press Release',
+            author=release.get('contactName', ''),
+        ))
+
+    items.sort(key=lambda item: (_parse_date(item.published), item.link), reverse=True)
+    return items
+
+
+class XMLWriter:
+    """Writes an XML document element by element, indented, as it goes"""
+
+    def __init__(self, f):
+        self.out = XMLGenerator(f, encoding='utf-8', short_empty_elements=True)
+        self.depth = 0
+        self.out.startDocument()
+
+    def _indent(self):
+        self.out.ignorableWhitespace('\n' + '  ' * self.depth)
+
+    @contextmanager
+    def element(self, name, attrs=None):
+        if self.depth:
+            self._indent()
+        self.out.startElement(name, attrs or {})
+        self.depth += 1
+        yield self
+        self.depth -= 1
+        self._indent()
+        self.out.endElement(name)
+
+    def leaf(self, name, text='', attrs=None):
+        """A complete element holding text (skipped when there is neither text nor attributes)"""
+        if not text and not attrs:
+            return
+        self._indent()
+        self.out.startElement(name, attrs or {})
+        if text:
+            self.out.characters(text)
+        self.out.endElement(name)
+
+    def close(self):
+        self.out.ignorableWhitespace('\n')
+        self.out.endDocument()
+
+
+@contextmanager
+def xml_file(path):
+    """An XMLWriter streaming into path, which is replaced when the block succeeds"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_writer(path) as f:
+        writer = XMLWriter(f)
+        yield writer
+        writer.close()
+
+
+def write_sitemap(path, entries):
+    with xml_file(path) as xml:
+        attrs = {'xmlns': SITEMAP_NS}
+        if any(e.image for e in entries):
+            attrs['xmlns:image'] = IMAGE_NS
+        with xml.element('urlset', attrs):
+            for entry in entries:
+                with xml.element('url'):
+                    xml.leaf('loc', entry.loc)
+                    xml.leaf('lastmod', entry.lastmod)
+                    if entry.image:
+                        with xml.element('image:image'):
+                            xml.leaf('image:loc', entry.image)
+
+
+def write_sitemap_index(path, shards, site_url):
+    """shards: (file name, lastmod) pairs"""
+    with xml_file(path) as xml:
+        with xml.element('sitemapindex', {'xmlns': SITEMAP_NS}):
+            for name, lastmod in shards:
+                with xml.element('sitemap'):
+                    xml.leaf('loc', f'{site_url}/{name}')
+                    xml.leaf('lastmod', lastmod)
+
+
+def write_rss(path, feed, items):
+    with xml_file(path) as xml:
+        with xml.element('rss', {'version': '2.0', 'xmlns:atom': ATOM_NS, 'xmlns:dc': DC_NS}):
+            with xml.element('channel'):
+                xml.leaf('title', feed['title'])
+                xml.leaf('link', feed['link'])
+                xml.leaf('description', feed['description'] or feed['title'])
+                xml.leaf('atom:link', attrs={'href': feed['url'], 'rel': 'self', 'type': 'application/rss+xml'})
+                if items:
+                    xml.leaf('lastBuildDate', rfc822_date(max(items, key=_updated).updated))
+                for item in items:
+                    with xml.element('item'):
+                        xml.leaf('title', item.title)
+                        xml.leaf('link', item.link)
+                        xml.leaf('guid', item.link, {'isPermaLink': 'true'})
+                        xml.leaf('pubDate', rfc822_date(item.published))
+                        xml.leaf('category', item.category)
+                        xml.leaf('dc:creator', item.author)
+                        xml.leaf('description', item.summary)
+
+
+def write_atom(path, feed, items):
+    with xml_file(path) as xml:
+        with xml.element('feed', {'xmlns': ATOM_NS}):
+            xml.leaf('title', feed['title'])
+            xml.leaf('id', feed['url'])
+            xml.leaf('link', attrs={'rel': 'self', 'href': feed['url']})
+            xml.leaf('link', attrs={'href': feed['link']})
+            xml.leaf('updated', w3c_date(max(items, key=_updated).updated) if items else '')
+            with xml.element('author'):
+                xml.leaf('name', feed['site_name'])
+            for item in items:
+                with xml.element('entry'):
+                    xml.leaf('title', item.title)
+                    xml.leaf('id', item.link)
+                    xml.leaf('link', attrs={'href': item.link})
+                    xml.leaf('published', w3c_date(item.published))
+                    xml.leaf('updated', w3c_date(item.updated))
+                    if item.author:
+                        with xml.element('author'):
+                            xml.leaf('name', item.author)
+                    xml.leaf('category', attrs={'term': item.category})
+                    xml.leaf('summary', item.summary)
+
+
+def _updated(item):
+    return _parse_date(item.updated) or _parse_date(item.published)
+
+
+class FeedState:
+    """The shard of every sitemap URL and the digest of every generated file"""
+
+    def __init__(self, path=FEEDS_CACHE_PATH):
+        self.path = Path(path)
+        self.shards = {}
+        self.outputs = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=FEEDS_CACHE_PATH):
+        state = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FORMAT_VERSION:
+                state.shards = data.get('shards', {})
+                state.outputs = data.get('outputs', {})
+        except (OSError, ValueError):
+            # Missing or unreadable state: shards are assigned again and every file is written
+            pass
+        return state
+
+    def assign(self, locs, shard_size):
+        """Shard number of every URL in locs; known URLs keep theirs, new ones fill the first gaps"""
+        shards = {}
+        counts = defaultdict(int)
+        # URLs beyond shard_size (after a smaller --shard-size) move like new ones
+        for loc in sorted((loc for loc in locs if loc in self.shards), key=lambda loc: (self.shards[loc], loc)):
+            if counts[self.shards[loc]] < shard_size:
+                shards[loc] = self.shards[loc]
+                counts[shards[loc]] += 1
+        shard = 0
+        for loc in sorted(set(locs) - set(shards)):
+            while counts[shard] >= shard_size:
+                shard += 1
+            shards[loc] = shard
+            counts[shard] += 1
+        if shards != self.shards:
+            self.shards = shards
+            self.dirty = True
+        return shards
+
+    def write(self, news_dir, name, digest, writer, force=False):
+        """Run writer(path) unless name was last written with digest and still exists"""
+        path = Path(news_dir) / name
+        if not force and self.outputs.get(name) == digest and path.exists():
+            return False
+        writer(path)
+        self.outputs[name] = digest
+        self.dirty = True
+        return True
+
+    def retain(self, news_dir, names):
+        """Delete the files generated before that are no longer produced; returns their names"""
+        removed = sorted(set(self.outputs) - set(names))
+        for name in removed:
+            (Path(news_dir) / name).unlink(missing_ok=True)
+            del self.outputs[name]
+            self.dirty = True
+        return removed
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'version': FORMAT_VERSION, 'shards': self.shards, 'outputs': self.outputs}
+        with atomic_writer(self.path) as f:
+            f.write(json.dumps(data, indent=1, sort_keys=True).encode('utf-8'))
+        self.dirty = False
+
+
+def generate(news_dir=NEWS_DIR, site=None, shard_size=SHARD_SIZE, force=False, state=None):
+    """Bring the sitemaps and feeds up to date; returns an Output per file, and the deleted names"""
+    news_dir = Path(news_dir)
+    site_url, site_name, description = site or load_site()
+    state = state if state is not None else FeedState.load()
+    pages = page_metadata(news_dir)
+    outputs = []
+
+    entries = page_entries(pages, site_url)
+    shards = defaultdict(list)
+    for loc, shard in state.assign(list(entries), shard_size).items():
+        shards[shard].append(entries[loc])
+    index = []
+    for shard in sorted(shards):
+        shard_entries = sorted(shards[shard])
+        name = f'sitemap-{shard + 1}.xml'
+        written = state.write(news_dir, name, _digest(shard_entries),
+                              lambda path: write_sitemap(path, shard_entries), force)
+        outputs.append(Output(name, len(shard_entries), written))
+        index.append((name, max((e.lastmod for e in shard_entries if e.lastmod), key=_parse_date, default='')))
+    written = state.write(news_dir, 'sitemap.xml', _digest([site_url, index]),
+                          lambda path: write_sitemap_index(path, index, site_url), force)
+    outputs.append(Output('sitemap.xml', len(index), written))
+
+    items = feed_items(pages, site_url, load_content(news_dir / 'data' / 'content.json'), news_dir)
+    feeds = {'all': (site_name, items[:FEED_SIZE])}
+    by_category = defaultdict(list)
+    for item in items:
+        by_category[slugify(item.category) or 'news'].append(item)
+    for slug, category_items in sorted(by_category.items()):
+        feeds[slug] = (f'{site_name} - {category_items[0].category}', category_items[:FEED_SIZE])
+
+    for slug, (title, feed_items_) in feeds.items():
+        for suffix, writer in (('rss', write_rss), ('atom', write_atom)):
+            name = f'{FEEDS_DIR}/{slug}.{suffix}'
+            feed = {'title': title, 'link': f'{site_url}/', 'url': f'{site_url}/{name}',
+                    'description': description, 'site_name': site_name}
+            written = state.write(news_dir, name, _digest([feed, feed_items_]),
+                                  lambda path, w=writer, f=feed, i=feed_items_: w(path, f, i), force)
+            outputs.append(Output(name, len(feed_items_), written))
+
+    removed = state.retain(news_dir, [o.name for o in outputs])
+    state.save()
+    return outputs, removed
+
+
+def report(outputs, removed):
+    for output in outputs:
+        if output.written:
+            unit = 'sitemaps' if output.name == 'sitemap.xml' else 'URLs' if output.name.startswith('sitemap') else 'items'
+            print(f"✓ {output.name} - {output.count} {unit}")
+    for name in removed:
+        print(f"✓ {name} - no longer needed, deleted")
+    written = sum(1 for o in outputs if o.written)
+    print(f"\nSitemaps and feeds: {written} written, {len(outputs) - written} unchanged, {len(removed)} deleted")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='rewrite every file, even when unchanged')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE,
+                        help=f'URLs per sitemap file (default: {SHARD_SIZE}, at most 50000)')
+    parser.add_argument('--site-url', help='absolute site URL (default: siteUrl in admin/data/config.json)')
+    args = parser.parse_args(argv)
+    if not 0 < args.shard_size <= 50000:
+        parser.error('--shard-size must be between 1 and 50000')
+
+    site = load_site()
+    if args.site_url:
+        site = (args.site_url.rstrip('/'),) + site[1:]
+    report(*generate(site=site, shard_size=args.shard_size, force=args.force))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Shared page fragments rendered from News/data/content.json and the articles
+
+The ticker headlines and the footer's "Recent Post" list are rendered once
+per run from the latest articles and published press releases, with the
+footer selection taken from content.json (footerPosts) like the admin does.
+The header navigation, its mobile menu and the bottom nav are rendered from
+News/data/navigation.json.
+Each fragment is memoised by a hash of its inputs, and that hash is
+embedded in the rendered element (data-fragment="ticker:<hash>") so pages
+already carrying the current fragment can be skipped.
+"""
+import hashlib
+import html
+import json
+import re
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from sitetools.articles import load_articles
+from sitetools.engine import NEWS_DIR
+
+CONTENT_JSON = NEWS_DIR / 'data' / 'content.json'
+NAVIGATION_JSON = NEWS_DIR / 'data' / 'navigation.json'
+
+TICKER_COUNT = 6
+RECENT_POST_COUNT = 3
+HEADLINE_LIMIT = 80
+DEFAULT_THUMB = '/img/news-350x223-1.jpg'
+
+FRAGMENT_ATTR_RE = re.compile(r'\sdata-fragment="([^"]*)"')
+
+Fragment = namedtuple('Fragment', 'name html hash')
+
+TICKER_ITEM = '''
+      <div class="ticker-item">
+        <span class="ticker-category">{category}</span>
+        <span class="ticker-date">{date}</span>
+        <span class="ticker-headline">{headline}</span>
+        <span class="ticker-dot">•</span>
+      </div>'''
+
+RECENT_POST_ITEM = '''
+            <article class="f-post-item"><img src="{image}" alt="thumb">
+              <div><a href="{href}">{title}</a> <span class="f-date">{date}</span></div>
+            </article>'''
+
+NAV_LINK = '<a href="{href}"{attrs}>{label}</a>'
+NAV_DROPDOWN = '<div class="nav-dropdown">{link}{menu}</div>'
+MEGA_MENU = '<div class="mega-menu"><div class="mega-menu-content">{columns}</div></div>'
+MEGA_MENU_COLUMN = ('<div class="mega-menu-column"><div class="mega-menu-title">{title}</div>'
+                    '<div class="mega-menu-links">{links}</div></div>')
+DROPDOWN_MENU = '<div class="dropdown-menu">{links}</div>'
+
+# Rendered fragments by (name, input hash, base path), kept for the whole process
+_memo = {}
+_current = None
+
+
+def _hash(value):
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def display_date(value, default='Recently'):
+    """Format a date like the admin does: 'Feb 2, 2026'"""
+    date = _parse_date(value)
+    return f'{date:%b} {date.day}, {date.year}' if date else default
+
+
+def _sort_key(article):
+    date = _parse_date(article.get('publishDate'))
+    return date.timestamp() if date else float('-inf')
+
+
+def _asset_url(path):
+    if not path:
+        return ''
+    if path.startswith(('/', 'http://', 'https://')):
+        return path
+    return '/' + path
+
+
+def load_content(path=CONTENT_JSON):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def press_release_entries(content, news_dir=NEWS_DIR):
+    """Published press releases from content.json whose page exists"""
+    entries = []
+    for release in content.get('pressReleases', []):
+        filename = release.get('filename')
+        if release.get('status') != 'published' or not filename:
+            continue
+        if not (Path(news_dir) / filename).exists():
+            continue
+        entries.append({
+            'filename': filename,
+            'title': release.get('headline', ''),
+            'category': 'Press Release',
+            'publishDate': release.get('releaseDate', ''),
+            'featuredImage': _asset_url(release.get('image', '')),
+        })
+    return entries
+
+
+def fragment_inputs(news_dir=NEWS_DIR, content_path=CONTENT_JSON, navigation_path=NAVIGATION_JSON,
+                    article_cache=None):
+    """Everything the fragments are rendered from, as plain JSON-able data
+
+    The articles are read through article_cache when given, otherwise
+    through the on-disk cache (see sitetools.articles.load_articles).
+    """
+    content = load_content(content_path)
+    navigation = load_content(navigation_path)
+    candidates = [
+        {
+            'filename': a['filename'],
+            'title': a['title'],
+            'category': a['category'] or 'News',
+            'publishDate': a['publishDate'],
+            'featuredImage': _asset_url(a['featuredImage'] or a['ogImage']),
+        }
+        for a in load_articles(news_dir, article_cache)
+    ]
+    candidates.extend(press_release_entries(content, news_dir))
+    latest = sorted(candidates, key=_sort_key, reverse=True)
+
+    by_filename = {c['filename']: c for c in candidates}
+    selected = [by_filename[f] for f in content.get('footerPosts', []) if f in by_filename]
+
+    inputs = {
+        'ticker': [
+            {'category': c['category'], 'date': display_date(c['publishDate']), 'headline': c['title']}
+            for c in latest[:TICKER_COUNT]
+        ],
+        'recent-posts': [
+            {
+                'filename': c['filename'],
+                'title': c['title'],
+                'date': display_date(c['publishDate']),
+                'image': c['featuredImage'] or DEFAULT_THUMB,
+            }
+            for c in (selected or latest)[:RECENT_POST_COUNT]
+        ],
+    }
+    # Without navigation.json the navs are left as they are
+    for name, key in (('nav', 'header'), ('mobile-nav', 'mobile'), ('bottom-nav', 'bottom')):
+        if key in navigation:
+            inputs[name] = navigation[key]
+    return inputs
+
+
+def _headline(title):
+    return title if len(title) <= HEADLINE_LIMIT else title[:HEADLINE_LIMIT - 3] + '...'
+
+
+def render_ticker(items, base_path=''):
+    if not items:
+        # Default static ticker if there are no articles
+        items = [{
+            'category': 'Markets',
+            'date': display_date(datetime.now().isoformat()),
+            'headline': 'FNPulse delivers breaking financial news and real-time market coverage',
+        }]
+    return ''.join(
+        TICKER_ITEM.format(
+            category=html.escape(item['category'], quote=False),
+            date=item['date'],
+            headline=html.escape(_headline(item['headline']), quote=False),
+        )
+        for item in items
+    )
+
+
+def render_recent_posts(items, base_path=''):
+    return ''.join(
+        RECENT_POST_ITEM.format(
+            image=html.escape(item['image']),
+            href=html.escape(base_path + item['filename']),
+            title=html.escape(item['title'], quote=False),
+            date=item['date'],
+        )
+        for item in items
+    )
+
+
+def _nav_link(link, base_path, attrs=''):
+    return NAV_LINK.format(href=html.escape(base_path + link['href']), attrs=attrs,
+                           label=html.escape(link['label'], quote=False))
+
+
+def _nav_items(items, base_path, attrs):
+    """Top-level links, with their mega menu (columns) or dropdown (links) if any"""
+    parts = []
+    for item in items:
+        link = _nav_link(item, base_path, attrs)
+        if 'columns' in item:
+            columns = ''.join(
+                MEGA_MENU_COLUMN.format(
+                    title=html.escape(column['title'], quote=False),
+                    links=' '.join(_nav_link(l, base_path) for l in column['links']),
+                )
+                for column in item['columns']
+            )
+            link = NAV_DROPDOWN.format(link=link, menu=MEGA_MENU.format(columns=columns))
+        elif 'links' in item:
+            links = ' '.join(_nav_link(l, base_path) for l in item['links'])
+            link = NAV_DROPDOWN.format(link=link, menu=DROPDOWN_MENU.format(links=links))
+        parts.append(link)
+    return ''.join(parts)
+
+
+def render_nav(items, base_path=''):
+    return _nav_items(items, base_path, ' class="nav-link"')
+
+
+def render_mobile_nav(items, base_path=''):
+    return _nav_items(items, base_path, '')
+
+
+def render_bottom_nav(items, base_path=''):
+    return ' '.join(_nav_link(item, base_path, ' class="bottom-link"') for item in items)
+
+
+RENDERERS = {
+    'ticker': ('<div class="new-ticker-content"', render_ticker, '\n    </div>'),
+    'recent-posts': ('<div class="f-posts"', render_recent_posts, '\n          </div>'),
+    'nav': ('<nav class="nav-island"', render_nav, '</nav>'),
+    'mobile-nav': ('<div class="mobile-nav-content"', render_mobile_nav, '</div>'),
+    'bottom-nav': ('<nav class="bottom-nav" aria-label="Mobile"', render_bottom_nav, '</nav>'),
+}
+
+
+def render_fragment(name, items, base_path=''):
+    """Render one fragment element, memoised by the hash of its inputs"""
+    digest = _hash(items)
+    key = (name, digest, base_path)
+    if key not in _memo:
+        open_tag, renderer, closing = RENDERERS[name]
+        body = renderer(items, base_path)
+        _memo[key] = Fragment(name, f'{open_tag} data-fragment="{name}:{digest}">{body}{closing}', digest)
+    return _memo[key]
+
+
+class Fragments:
+    """The current shared fragments, rendered once and reused for every page"""
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.digest = _hash(inputs)
+
+    def get(self, name, base_path=''):
+        return render_fragment(name, self.inputs[name], base_path)
+
+    def hashes(self):
+        """The input hash of every fragment, by name"""
+        return {name: _hash(items) for name, items in self.inputs.items()}
+
+    def names(self):
+        return list(self.inputs)
+
+
+def current(news_dir=NEWS_DIR):
+    """The fragments for this run, computed on first use"""
+    global _current
+    if _current is None:
+        _current = Fragments(fragment_inputs(news_dir))
+    return _current
+
+
+def reset():
+    """Forget the current fragments so the next call to current() re-reads the inputs"""
+    global _current
+    _current = None
+
+
+def embedded_hash(html_text, start=0):
+    """The hash embedded in the opening tag of the fragment element at start, if any"""
+    open_tag = html_text[start:html_text.find('>', start) + 1]
+    match = FRAGMENT_ATTR_RE.search(open_tag)
+    if not match:
+        return None
+    _, _, digest = match.group(1).partition(':')
+    return digest
+
+
+def base_path_for(path, news_dir=NEWS_DIR):
+    """Relative prefix from a page back to the site root ('' or '../')"""
+    try:
+        depth = len(Path(path).resolve().relative_to(Path(news_dir).resolve()).parts) - 1
+    except ValueError:
+        depth = 0
+    return '../' * depth
@@ -0,0 +1,512 @@
+"""
+Responsive image derivatives for the site's photos
+
+Every photo in Images/ and News/img is encoded to WebP, and to AVIF when
+the installed Pillow supports it, at each width in WIDTHS up to the photo's
+own, in parallel. Copies of the same art are one image: names are compared
+without their extension and without a '.format-<ext>' rendition suffix, so
+credit-bubble-2026.width-1200.format-webp.png in Images/ and the .webp copy
+in News/img share their derivatives, which are made from the best copy
+(PNG first, then JPEG, then WebP).
+
+Derivatives are content-addressed: their names carry a hash of the source
+content and the encoding parameters
+(/img/responsive/deepinder-goal-640.3f2a9c1e0b.webp), so one that exists is
+never encoded again. What was built for each image is kept in
+.sitetools-cache/images.json, and sources whose size and mtime are
+unchanged are not even read. Derivatives bigger than the copy in News/img
+the pages already serve are left out of the index (--prune deletes them),
+and that copy takes their place in the srcset.
+
+The 'images' rule then gives every <img> showing one of these photos a
+srcset of its WebP derivatives, sizes, and its width and height, wrapped in
+a <picture> with an AVIF <source>. The <picture> carries the image's hash
+(data-image="deepinder-goal:<hash>"), so pages are only rewritten when the
+derivatives change. Pages also record the photos they show that have no
+derivatives yet, so building them later brings those pages up to date.
+
+Requires Pillow (pip install pillow) to encode; the rule itself only reads
+the index.
+
+Usage: python -m sitetools.images [--jobs N] [--force] [--prune]
+"""
+import argparse
+import hashlib
+import io
+import json
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+from urllib.parse import quote
+
+from sitetools import engine
+from sitetools.engine import NEWS_DIR, chunk_size, resolve_jobs
+from sitetools.links import resolve
+from sitetools.manifest import CACHE_DIR, content_hash
+from sitetools.output import atomic_write, format_bytes, format_saving
+from sitetools.regions import Span, iter_tags
+
+try:
+    from PIL import Image, features
+except ImportError:  # optional: pip install pillow
+    Image = None
+
+SOURCE_DIR = NEWS_DIR.parent / 'Images'
+IMAGE_DIR = NEWS_DIR / 'img'
+DERIVATIVE_DIR = IMAGE_DIR / 'responsive'
+IMAGES_CACHE_PATH = CACHE_DIR / 'images.json'
+
+# Bump when the encoding changes in a way the options below do not capture
+ENCODER_VERSION = 1
+HASH_LENGTH = 10
+
+WIDTHS = (320, 640, 960, 1280, 1920)
+ENCODINGS = {
+    'avif': {'quality': 60, 'speed': 6},
+    'webp': {'quality': 80, 'method': 6},
+}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+# Source formats, best first
+SOURCE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp')
+RENDITION_RE = re.compile(r'\.format-[a-z0-9]+$', re.IGNORECASE)
+
+# Used when the <img> has no width attribute of its own
+DEFAULT_SIZES = '100vw'
+
+DATA_IMAGE_RE = re.compile(r'\sdata-image="([^"]*)"')
+SRCSET_ATTR_RE = re.compile(r'''\s+srcset\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)''', re.IGNORECASE)
+SRC_ATTR_RE = re.compile(r'''\ssrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+WIDTH_ATTR_RE = re.compile(r'''\swidth\s*=\s*["']?(\d+)''', re.IGNORECASE)
+HAS_ATTR_RES = {name: re.compile(rf'\s{name}\s*=', re.IGNORECASE) for name in ('sizes', 'width', 'height')}
+
+Derivative = namedtuple('Derivative', 'path format width height options')
+BuildResult = namedtuple('BuildResult', 'key entry encoded error', defaults=(None,))
+
+_current = None
+
+
+def image_key(name):
+    """The name copies of the same art share: no extension, no .format-<ext> suffix"""
+    return RENDITION_RE.sub('', PurePosixPath(name).stem)
+
+
+def encodings():
+    """The available output formats and their encoder options, AVIF first"""
+    if Image is None:
+        return {}
+    return {fmt: options for fmt, options in ENCODINGS.items() if features.check(fmt)}
+
+
+def find_sources(source_dir=SOURCE_DIR, image_dir=IMAGE_DIR):
+    """The best copy of every photo, by key"""
+    candidates = {}
+    # Images/ before News/img, so the master copy wins a tie
+    for rank, directory in enumerate((Path(source_dir), Path(image_dir))):
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            suffix = path.suffix.lower()
+            if suffix in SOURCE_SUFFIXES and path.is_file() and not path.name.startswith('.'):
+                order = (SOURCE_SUFFIXES.index(suffix), rank, path.name)
+                candidates.setdefault(image_key(path.name), []).append((order, path))
+    return {key: min(paths)[1] for key, paths in sorted(candidates.items())}
+
+
+def derivative_widths(width):
+    """The widths to encode a photo width pixels wide at, narrowest first"""
+    widths = [w for w in WIDTHS if w < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return widths
+
+
+def plan_derivatives(key, digest, size, available, derivative_dir=DERIVATIVE_DIR):
+    """The derivatives of a source with content hash digest and pixel size (width, height)"""
+    width, height = size
+    derivatives = []
+    for fmt, options in available.items():
+        for w in derivative_widths(width):
+            params = json.dumps([ENCODER_VERSION, fmt, w, options], sort_keys=True)
+            name_hash = hashlib.sha256(f'{digest}:{params}'.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+            path = Path(derivative_dir) / f'{key}-{w}.{name_hash}.{fmt}'
+            derivatives.append(Derivative(path, fmt, w, max(1, round(height * w / width)), options))
+    return derivatives
+
+
+def encode(source, derivative):
+    """Encode one derivative of source; returns its size in bytes"""
+    with Image.open(source) as im:
+        im.load()
+        mode = 'RGBA' if im.mode in ('RGBA', 'LA', 'PA') or 'transparency' in im.info else 'RGB'
+        im = im.convert(mode)
+        if im.width != derivative.width:
+            im = im.resize((derivative.width, derivative.height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buffer = io.BytesIO()
+        im.save(buffer, derivative.format.upper(), **derivative.options)
+    data = buffer.getvalue()
+    derivative.path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(derivative.path, data)
+    return len(data)
+
+
+def _encode_task(task):
+    source, derivative = task
+    try:
+        return encode(source, derivative), None
+    except Exception as e:
+        return None, str(e)
+
+
+def derivative_url(path, news_dir=NEWS_DIR):
+    return '/' + quote(Path(path).relative_to(news_dir).as_posix())
+
+
+class ImageIndex:
+    """What was built for each photo, by key, kept in .sitetools-cache/images.json"""
+
+    def __init__(self, path=IMAGES_CACHE_PATH):
+        self.path = Path(path)
+        self.images = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=IMAGES_CACHE_PATH):
+        index = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == ENCODER_VERSION:
+                index.images = data.get('images', {})
+        except (OSError, ValueError):
+            # Missing or unreadable index: every source is hashed again
+            pass
+        return index
+
+    def __bool__(self):
+        return bool(self.images)
+
+    def get(self, key):
+        return self.images.get(key)
+
+    def hashes(self):
+        """The hash of every image with derivatives, by key"""
+        return {key: entry['hash'] for key, entry in self.images.items() if entry['derivatives']}
+
+    def lookup(self, src, base=''):
+        """(key, entry) of the photo an <img src> shows, or None for other images
+
+        entry is None while the photo has no derivatives.
+        """
+        target = resolve(src, base)
+        if not target or not target.startswith('img/') or target.startswith('img/responsive/'):
+            return None
+        if PurePosixPath(target).suffix.lower() not in SOURCE_SUFFIXES:
+            return None
+        key = image_key(target)
+        entry = self.images.get(key)
+        return key, entry if entry and entry['derivatives'] else None
+
+    def record(self, key, entry):
+        if self.images.get(key) != entry:
+            self.images[key] = entry
+            self.dirty = True
+
+    def retain(self, keys):
+        """Forget images whose sources are gone"""
+        for key in set(self.images) - set(keys):
+            del self.images[key]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'version': ENCODER_VERSION, 'images': self.images}
+        atomic_write(self.path, json.dumps(data, indent=1, sort_keys=True).encode('utf-8'))
+        self.dirty = False
+
+
+def current():
+    """The image index for this run, loaded on first use"""
+    global _current
+    if _current is None:
+        _current = ImageIndex.load()
+    return _current
+
+
+def reset():
+    """Forget the loaded index so the next call to current() reads it again"""
+    global _current
+    _current = None
+
+
+def _entry_current(entry, path, available):
+    if entry is None or entry['source'] != path.relative_to(NEWS_DIR.parent).as_posix():
+        return False
+    stat = path.stat()
+    if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+        return False
+    return sorted({d['format'] for d in entry['derivatives']}) == sorted(available)
+
+
+def served_copies(image_dir=IMAGE_DIR, news_dir=NEWS_DIR):
+    """The smallest copy of each photo in News/img, the one pages serve without a srcset, by key
+
+    Each is a dict of its url, width, height and bytes.
+    """
+    paths = {}
+    directory = Path(image_dir)
+    if directory.is_dir():
+        for path in directory.iterdir():
+            if path.suffix.lower() in SOURCE_SUFFIXES and path.is_file():
+                key = image_key(path.name)
+                if key not in paths or path.stat().st_size < paths[key].stat().st_size:
+                    paths[key] = path
+
+    copies = {}
+    for key, path in sorted(paths.items()):
+        with Image.open(path) as im:
+            width, height = im.size
+        copies[key] = {'url': derivative_url(path, news_dir), 'width': width, 'height': height,
+                       'bytes': path.stat().st_size}
+    return copies
+
+
+def _served_derivatives(entry, items, served):
+    """entry with the derivatives in items smaller than the served copy, and their hash"""
+    if served is not None:
+        # Listing a derivative bigger than the served copy would only cost bytes
+        items = [d for d in items if d['bytes'] < served['bytes']]
+    digest = hashlib.sha256(json.dumps([items, served], sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return dict(entry, derivatives=items, served=served, hash=digest)
+
+
+def build(jobs=0, force=False, index=None):
+    """Encode the missing derivatives of every photo and update the index
+
+    Returns a BuildResult per photo, in key order.
+    """
+    available = encodings()
+    if not available:
+        raise RuntimeError('Pillow with WebP support is required to encode images (pip install pillow)')
+    index = index if index is not None else ImageIndex() if force else ImageIndex.load()
+    sources = find_sources()
+    served = served_copies()
+
+    planned = {}
+    tasks = []
+    for key, path in sources.items():
+        entry = index.get(key)
+        if not force and _entry_current(entry, path, available) and all(
+                (NEWS_DIR / d['url'].lstrip('/')).exists() for d in entry['derivatives']):
+            continue
+        stat = path.stat()
+        data = path.read_bytes()
+        digest = content_hash(data)
+        with Image.open(io.BytesIO(data)) as im:
+            size = im.size
+        derivatives = plan_derivatives(key, digest, size, available)
+        planned[key] = (path, stat, size, digest, derivatives)
+        tasks.extend((path, d) for d in derivatives if force or not d.path.exists())
+
+    workers = resolve_jobs(jobs)
+    if workers == 1 or len(tasks) < 2:
+        encoded = [_encode_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            encoded = list(pool.map(_encode_task, tasks, chunksize=chunk_size(len(tasks), workers)))
+    outcome = {task[1].path: result for task, result in zip(tasks, encoded)}
+
+    results = []
+    for key, path in sources.items():
+        if key not in planned:
+            entry = index.get(key)
+            index.record(key, _served_derivatives(entry, entry['derivatives'], served.get(key)))
+            results.append(BuildResult(key, index.get(key), 0))
+            continue
+        path, stat, size, digest, derivatives = planned[key]
+        errors = [outcome[d.path][1] for d in derivatives if d.path in outcome and outcome[d.path][1]]
+        if errors:
+            results.append(BuildResult(key, index.get(key), 0, errors[0]))
+            continue
+        items = [{
+            'url': derivative_url(d.path), 'format': d.format, 'width': d.width, 'height': d.height,
+            'bytes': d.path.stat().st_size,
+        } for d in derivatives]
+        entry = _served_derivatives({
+            'source': path.relative_to(NEWS_DIR.parent).as_posix(),
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest,
+            'width': size[0], 'height': size[1],
+        }, items, served.get(key))
+        index.record(key, entry)
+        results.append(BuildResult(key, entry, sum(1 for d in derivatives if d.path in outcome)))
+
+    index.retain(sources)
+    index.save()
+    reset()
+    return results
+
+
+def stale_files(index, derivative_dir=DERIVATIVE_DIR):
+    """Derivatives in derivative_dir that no image in the index uses any more"""
+    current_urls = {d['url'] for entry in index.images.values() for d in entry['derivatives']}
+    directory = Path(derivative_dir)
+    if not directory.is_dir():
+        return []
+    return sorted(p for p in directory.iterdir() if p.is_file() and derivative_url(p) not in current_urls)
+
+
+def page_dir(path, news_dir=NEWS_DIR):
+    """Site-relative directory of a page ('' at the root), to resolve its relative URLs"""
+    try:
+        directory = Path(path).resolve().parent.relative_to(Path(news_dir).resolve()).as_posix()
+    except ValueError:
+        return ''
+    return '' if directory == '.' else directory
+
+
+def srcset(entry, fmt):
+    """The srcset of entry's derivatives in fmt, ending with the served copy where it is wider"""
+    items = [d for d in entry['derivatives'] if d['format'] == fmt]
+    served = entry.get('served')
+    if served and served['width'] > max(d['width'] for d in items):
+        # Its own derivative at this width was bigger, so the copy itself is the best candidate
+        items.append(served)
+    return ', '.join(f"{d['url']} {d['width']}w" for d in items)
+
+
+def render_picture(img_tag, key, entry):
+    """The <picture> showing entry for an <img> tag, keeping the tag's own attributes"""
+    formats = sorted({d['format'] for d in entry['derivatives']}, key=list(ENCODINGS).index)
+    # Every browser showing <picture> reads WebP; without WebP derivatives
+    # (all bigger than the served copy) the <img> keeps just its src
+    fallback = 'webp' if 'webp' in formats else None
+    width = WIDTH_ATTR_RE.search(img_tag)
+    sizes = f"(max-width: {width.group(1)}px) 100vw, {width.group(1)}px" if width else DEFAULT_SIZES
+
+    added = []
+    if fallback is not None:
+        added.append(f'srcset="{srcset(entry, fallback)}"')
+        if not HAS_ATTR_RES['sizes'].search(img_tag):
+            added.append(f'sizes="{sizes}"')
+    if not (HAS_ATTR_RES['width'].search(img_tag) or HAS_ATTR_RES['height'].search(img_tag)):
+        added.append(f'width="{entry["width"]}" height="{entry["height"]}"')
+    tag = SRCSET_ATTR_RE.sub('', img_tag) if fallback is not None else img_tag
+    if added:
+        end = len(tag) - 2 if tag.endswith('/>') else len(tag) - 1
+        tag = f"{tag[:end].rstrip()} {' '.join(added)}{tag[end:]}"
+
+    sources = ''.join(f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset(entry, fmt)}" sizes="{sizes}">'
+                      for fmt in formats if fmt != fallback)
+    return f'<picture data-image="{key}:{entry["hash"]}">{sources}{tag}</picture>'
+
+
+def _img_src(tag):
+    match = SRC_ATTR_RE.search(tag)
+    return match and next(g for g in match.groups() if g is not None)
+
+
+def responsive_images(content, index, base=''):
+    """Yield (span, html, key, hash) for every <img> of a photo in News/img
+
+    html is None when the image is already in an up to date <picture>, and
+    both html and hash are None for a photo without derivatives yet.
+    <picture> elements the rule did not write are left alone.
+    """
+    picture = None
+    img = None
+    for closing, name, start, end in iter_tags(content):
+        if name == 'picture':
+            if not closing:
+                marker = DATA_IMAGE_RE.search(content, start, end)
+                picture = (start, marker.group(1) if marker else None)
+                img = None
+            elif picture is not None:
+                start_at, marker = picture
+                picture = None
+                if marker is None or img is None:
+                    continue
+                found = index.lookup(_img_src(img) or '', base)
+                if found is None:
+                    continue
+                key, entry = found
+                if entry is None:
+                    yield Span(start_at, end), None, key, None
+                    continue
+                html = None if marker == f"{key}:{entry['hash']}" else render_picture(img, key, entry)
+                yield Span(start_at, end), html, key, entry['hash']
+        elif name == 'img' and not closing:
+            tag = content[start:end]
+            if picture is not None:
+                img = tag
+                continue
+            found = index.lookup(_img_src(tag) or '', base)
+            if found is not None:
+                key, entry = found
+                html = None if entry is None else render_picture(tag, key, entry)
+                yield Span(start, end), html, key, entry and entry['hash']
+
+
+def report(results):
+    """Print what was encoded per photo and the bytes its derivatives save over the copy in News/img"""
+    before = after = 0
+    for result in results:
+        if result.error:
+            print(f"✗ {result.key} - Error: {result.error}")
+            continue
+        entry = result.entry
+        state = f"encoded {result.encoded}" if result.encoded else 'up to date'
+        if not entry['derivatives']:
+            print(f"✓ {result.key} - {entry['width']}x{entry['height']} ({state}): "
+                  f"no derivative is smaller than the served copy")
+            continue
+        full = {d['format']: d for d in entry['derivatives'] if d['width'] == max(x['width'] for x in entry['derivatives'])}
+        detail = ', '.join(f"{fmt} {d['width']}w {format_bytes(d['bytes'])}" for fmt, d in full.items())
+        if entry.get('served'):
+            original = entry['served']['bytes']
+            smallest = min(d['bytes'] for d in full.values())
+            before += original
+            after += smallest
+            detail += f"; served copy {format_saving(original, smallest)}"
+        print(f"✓ {result.key} - {entry['width']}x{entry['height']}, {len(entry['derivatives'])} derivatives "
+              f"({state}): {detail}")
+
+    print(f"\nImages: {len(results)} photos, {sum(r.encoded for r in results)} derivatives encoded")
+    if before:
+        print(f"  Full-width photos in News/img: {format_saving(before, after)}, saves {format_bytes(before - after)}")
+    if 'avif' not in encodings():
+        print("  ⚠ this Pillow cannot encode AVIF, only WebP derivatives were written")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (0 = one per CPU, the default)')
+    parser.add_argument('--force', action='store_true', help='re-encode every derivative, ignoring the cache')
+    parser.add_argument('--prune', action='store_true', help='delete derivatives no photo uses any more')
+    parser.add_argument('--no-pages', action='store_true', help='only build the derivatives, leave the pages alone')
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        parser.error('Pillow is required to encode images (pip install pillow)')
+    results = build(args.jobs, args.force)
+    report(results)
+
+    if args.prune:
+        for path in stale_files(current()):
+            print(f"Deleted {path.relative_to(NEWS_DIR)}")
+            path.unlink()
+
+    if not args.no_pages:
+        from sitetools.manifest import Manifest
+        print()
+        results = engine.run(engine.html_files(), ['images'], args.jobs, Manifest.load())
+        for result in results:
+            if result.changed or result.error:
+                engine.print_result(result)
+        print(f"\nPages: {sum(1 for r in results if r.changed)} of {len(results)} updated")
+
+
+if __name__ == '__main__':
+    main()
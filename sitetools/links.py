@@ -0,0 +1,353 @@
+"""
+Link and asset integrity check for the site under News/
+
+Every page, stylesheet and script is parsed once for the URLs it references
+(href, src, srcset, poster and form actions, CSS url() and @import in
+stylesheets, <style> blocks and style attributes, and quoted local paths in
+scripts). Each local URL is resolved against the file tree, and the check
+reports broken links, orphan pages (no other page links to them) and images
+in News/img nothing references. Script literals only count as references:
+they are never reported as broken, since scripts build URLs at run time.
+
+Parsed references are cached per file in .sitetools-cache/links.json and
+reused while the file's size, mtime and content hash are unchanged, and the
+files that did change are parsed in parallel, so a rerun after a small edit
+only reads what was edited.
+
+Usage: python -m sitetools.links [--jobs N] [--force]
+"""
+import argparse
+import json
+import os
+import posixpath
+import re
+import sys
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path, PurePosixPath
+from urllib.parse import unquote, urlsplit
+
+from sitetools.engine import NEWS_DIR, chunk_size, resolve_jobs
+from sitetools.manifest import CACHE_DIR, content_hash, file_key
+from sitetools.output import atomic_write
+
+LINKS_CACHE_PATH = CACHE_DIR / 'links.json'
+
+# Bump when the extracted references change so cached entries are re-parsed
+PARSER_VERSION = 1
+
+SCANNED = ('.html', '.css', '.js')
+IMAGE_DIR = 'img'
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico')
+
+# Pages reached without a link from another page
+ENTRY_PAGES = {'index.html', '404.html'}
+
+URL_ATTRS = {'href', 'src', 'poster', 'action', 'data-src'}
+
+CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3''')
+SCRIPT_PATH_RE = re.compile(
+    r'''["'`]((?:\.{0,2}/)?(?:[\w.-]+/)*[\w.-]+\.(?:html|png|jpe?g|gif|webp|avif|svg|ico|css|js))["'`]''')
+
+Reference = namedtuple('Reference', 'source line kind url')
+LinkResult = namedtuple('LinkResult', 'path entry error', defaults=(None,))
+
+
+def _css_urls(text):
+    """(line offset, url) of every url() and @import in CSS text"""
+    for match in CSS_URL_RE.finditer(text):
+        yield text.count('\n', 0, match.start()), (match.group(2) or match.group(4)).strip()
+
+
+def _script_urls(text):
+    for match in SCRIPT_PATH_RE.finditer(text):
+        yield text.count('\n', 0, match.start()), match.group(1)
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs = []
+        self._raw = None
+
+    def handle_starttag(self, tag, attrs):
+        line = self.getpos()[0]
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in URL_ATTRS:
+                self.refs.append([line, name, value.strip()])
+            elif name in ('srcset', 'imagesrcset'):
+                for candidate in value.split(','):
+                    url = candidate.strip().split(' ')[0]
+                    if url:
+                        self.refs.append([line, 'srcset', url])
+            elif name == 'style':
+                self.refs.extend([line, 'url', url] for _, url in _css_urls(value))
+        attrs = dict(attrs)
+        if tag == 'style' or tag == 'script' and not attrs.get('src') and 'json' not in (attrs.get('type') or ''):
+            self._raw = (tag, line, [])
+
+    def handle_endtag(self, tag):
+        if self._raw is None or tag != self._raw[0]:
+            return
+        kind, line, parts = self._raw
+        text = ''.join(parts)
+        if kind == 'style':
+            self.refs.extend([line + offset, 'url', url] for offset, url in _css_urls(text))
+        else:
+            self.refs.extend([line + offset, 'script', url] for offset, url in _script_urls(text))
+        self._raw = None
+
+    def handle_data(self, data):
+        if self._raw is not None:
+            self._raw[2].append(data)
+
+
+def parse_references(text, suffix):
+    """[line, kind, url] of every URL referenced by a page, stylesheet or script"""
+    if suffix == '.css':
+        return [[1 + offset, 'url', url] for offset, url in _css_urls(text)]
+    if suffix == '.js':
+        return [[1 + offset, 'script', url] for offset, url in _script_urls(text)]
+    parser = _LinkParser()
+    parser.feed(text)
+    parser.close()
+    return parser.refs
+
+
+def resolve(url, base=''):
+    """The site-relative path a local URL points at, or None
+
+    base is the site-relative directory of the referencing file. None is
+    returned for external URLs, in-page fragments, data: and other non-file
+    schemes. Paths leaving the site keep their leading '..' and never exist.
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path or '${' in url or '{{' in url:
+        return None
+    path = unquote(parts.path)
+    target = path.lstrip('/') if path.startswith('/') else f'{base}/{path}' if base else path
+    resolved = []
+    for part in target.split('/'):
+        if part == '..':
+            if resolved and resolved[-1] != '..':
+                resolved.pop()
+            else:
+                resolved.append('..')
+        elif part and part != '.':
+            resolved.append(part)
+    return '/'.join(resolved) + ('/' if path.endswith('/') else '')
+
+
+def target_exists(target, files, directories):
+    """Whether a resolved target is served: the file, a directory index or a pretty .html URL"""
+    target = target.rstrip('/')
+    if target in files:
+        return True
+    if target in directories or not target:
+        return f'{target}/index.html'.lstrip('/') in files
+    return not PurePosixPath(target).suffix and f'{target}.html' in files
+
+
+def site_tree(root=NEWS_DIR):
+    """(files, directories) under root as site-relative POSIX paths"""
+    root = Path(root)
+    files, directories = set(), set()
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = [d for d in subdirs if d != 'node_modules' and not d.startswith('.')]
+        relative = Path(directory).relative_to(root).as_posix()
+        prefix = '' if relative == '.' else relative + '/'
+        if prefix:
+            directories.add(prefix.rstrip('/'))
+        files.update(prefix + name for name in names)
+    return files, directories
+
+
+class LinkCache:
+    """Parsed references per file, reused while the file is unchanged"""
+
+    def __init__(self, path=LINKS_CACHE_PATH):
+        self.path = Path(path)
+        self.files = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=LINKS_CACHE_PATH):
+        cache = cls(path)
+        try:
+            with open(cache.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == PARSER_VERSION:
+                cache.files = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+        return cache
+
+    def get(self, path):
+        return self.files.get(file_key(path))
+
+    def is_current(self, path):
+        entry = self.get(path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+    def record(self, path, entry):
+        self.files[file_key(path)] = entry
+        self.dirty = True
+
+    def prune(self, paths):
+        """Forget files no longer on disk"""
+        keep = {file_key(p) for p in paths}
+        for key in [k for k in self.files if k not in keep]:
+            del self.files[key]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({'version': PARSER_VERSION, 'files': self.files}, sort_keys=True)
+        atomic_write(self.path, data.encode('utf-8'))
+        self.dirty = False
+
+
+def parse_file(path, entry=None):
+    """References of one file; a cached entry with the same content hash is reused"""
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+        if entry is not None and entry['sha256'] == digest:
+            refs = entry['refs']
+        else:
+            refs = parse_references(data.decode('utf-8', errors='replace'), Path(path).suffix)
+        return LinkResult(str(path), {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                      'sha256': digest, 'refs': refs})
+    except Exception as e:
+        return LinkResult(str(path), None, str(e))
+
+
+def scanned_files(root=NEWS_DIR, files=None):
+    if files is None:
+        files, _ = site_tree(root)
+    return sorted(Path(root) / name for name in files if name.endswith(SCANNED))
+
+
+def collect(paths, jobs=1, cache=None):
+    """{path: refs} for every path, parsing only files changed since the cache
+
+    Returns (references, parsed, errors).
+    """
+    pending, references = [], {}
+    for path in paths:
+        if cache is not None and cache.is_current(path):
+            references[str(path)] = cache.get(path)['refs']
+        else:
+            pending.append((path, cache.get(path) if cache is not None else None))
+
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(pending) < 2:
+        results = [parse_file(path, entry) for path, entry in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            results = list(pool.map(parse_file, *zip(*pending), chunksize=chunk_size(len(pending), jobs)))
+
+    errors = []
+    for result in results:
+        if result.error:
+            errors.append(result)
+            continue
+        references[result.path] = result.entry['refs']
+        if cache is not None:
+            cache.record(result.path, result.entry)
+    if cache is not None:
+        cache.prune(paths)
+        cache.save()
+    return references, len(results), errors
+
+
+def check(references, files, directories, root=NEWS_DIR):
+    """Broken references, orphan pages and unreferenced images
+
+    Returns (broken, orphans, unused_images): broken is a list of
+    References, the others sorted site-relative paths.
+    """
+    root = Path(root)
+    broken = set()
+    inbound = defaultdict(set)
+    for path, refs in references.items():
+        source = Path(path).relative_to(root).as_posix()
+        base = posixpath.dirname(source)
+        for line, kind, url in refs:
+            target = resolve(url, base)
+            if target is None:
+                continue
+            if target_exists(target, files, directories):
+                target = target.rstrip('/')
+                if target in directories or not target:
+                    target = f'{target}/index.html'.lstrip('/')
+                elif target not in files:
+                    target += '.html'
+                inbound[target].add(source)
+            elif kind != 'script':
+                broken.add(Reference(source, line, kind, url))
+
+    pages = {name for name in files if name.endswith('.html')}
+    orphans = sorted(
+        page for page in pages
+        if PurePosixPath(page).name not in ENTRY_PAGES and not inbound[page] - {page}
+    )
+    unused_images = sorted(
+        name for name in files
+        if name.startswith(IMAGE_DIR + '/') and name.lower().endswith(IMAGE_SUFFIXES) and not inbound[name]
+    )
+    return sorted(broken), orphans, unused_images
+
+
+def check_site(jobs=0, force=False, root=NEWS_DIR):
+    """Check every page under root and print the report; returns the broken references"""
+    files, directories = site_tree(root)
+    paths = scanned_files(root, files)
+    cache = LinkCache() if force else LinkCache.load()
+    references, parsed, errors = collect(paths, jobs, cache)
+    broken, orphans, unused_images = check(references, files, directories, root)
+
+    for ref in broken:
+        print(f"✗ {ref.source}:{ref.line} - broken {ref.kind}: {ref.url}")
+    for result in errors:
+        print(f"✗ {os.path.basename(result.path)} - Error: {result.error}")
+    if orphans:
+        print("\nOrphan pages (no links from other pages):")
+        for page in orphans:
+            print(f"  • {page}")
+    if unused_images:
+        print(f"\nUnreferenced images in {IMAGE_DIR}/:")
+        for image in unused_images:
+            print(f"  • {image}")
+
+    total = sum(len(refs) for refs in references.values())
+    print(f"\nChecked {len(paths)} files ({parsed} parsed, {len(paths) - parsed} cached): {total} references, "
+          f"{len(broken)} broken, {len(orphans)} orphan pages, {len(unused_images)} unreferenced images")
+    return broken
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (0 = one per CPU, the default)')
+    parser.add_argument('--force', action='store_true', help='reparse every file, ignoring the cache')
+    args = parser.parse_args(argv)
+    if check_site(args.jobs, args.force):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
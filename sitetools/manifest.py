@@ -0,0 +1,138 @@
+"""
+Persistent manifest of processed pages
+
+For every file the manifest records its size, mtime, content hash, the
+version of each rule already applied and the shared data (fragments) each
+rule built into it. A rerun can then stat a page and skip it without
+opening it when nothing it depends on changed since the last run.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from sitetools.output import atomic_write
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / '.sitetools-cache'
+MANIFEST_PATH = CACHE_DIR / 'manifest.json'
+
+FORMAT_VERSION = 2
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_key(path):
+    return str(Path(path).resolve())
+
+
+class Manifest:
+    """Size/mtime/hash and applied rule versions for each processed file"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = Path(path)
+        self.files = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        manifest = cls(path)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FORMAT_VERSION:
+                manifest.files = data.get('files', {})
+        except (OSError, ValueError):
+            # Missing or unreadable manifest: every file is processed again
+            pass
+        return manifest
+
+    def get(self, path):
+        return self.files.get(file_key(path))
+
+    def outdated_rules(self, entry, rules, inputs=None):
+        """The rules that have to run again for a recorded file
+
+        Returns (outdated, stale_deps). A rule is outdated when it was not
+        applied at its current version, or when a piece of shared data the
+        page recorded for it no longer has the hash given in inputs
+        ({rule name: {key: hash}}). stale_deps maps the rules outdated only
+        for the latter reason to the keys that moved.
+        """
+        if inputs is None:
+            inputs = {r.name: r.current_inputs() for r in rules if r.inputs is not None}
+        applied = entry.get('rules', {})
+        recorded = entry.get('deps', {})
+
+        outdated, stale_deps = [], {}
+        for r in rules:
+            if applied.get(r.name) != r.state():
+                outdated.append(r)
+            elif r.name in inputs:
+                current = inputs[r.name]
+                stale = {key for key, digest in recorded.get(r.name, {}).items() if current.get(key) != digest}
+                if stale:
+                    outdated.append(r)
+                    stale_deps[r.name] = stale
+        return outdated, stale_deps
+
+    def stat_matches(self, entry, path, stat=None):
+        """True when the file still has the recorded size and mtime"""
+        if stat is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+        return entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+
+    def is_current(self, path, rules, stat=None):
+        """True when the file is unchanged since it was last processed by these rules"""
+        entry = self.get(path)
+        if entry is None:
+            return False
+        return self.stat_matches(entry, path, stat) and not self.outdated_rules(entry, rules)[0]
+
+    def record(self, path, size, mtime_ns, digest, rules, changed, deps=None, keep_rules=False):
+        """Store the state of a file after a run of the given rules
+
+        deps maps rule names to the {key: hash} of shared data the run built
+        into the page; None means the rules did not run (content unchanged).
+        keep_rules keeps the other rules' versions even though the content
+        changed, for runs that reran every rule after those (a dependency refresh).
+        """
+        key = file_key(path)
+        previous = self.files.get(key, {})
+
+        # Earlier rule versions only still hold if the content was left alone
+        unchanged = not changed and previous.get('sha256') == digest
+        keep = unchanged or keep_rules
+        applied = dict(previous.get('rules', {})) if keep else {}
+        applied.update({r.name: r.state() for r in rules})
+
+        recorded = {name: d for name, d in previous.get('deps', {}).items() if name in applied} if keep else {}
+        if deps is not None:
+            for r in rules:
+                recorded.pop(r.name, None)
+            recorded.update({name: d for name, d in deps.items() if d})
+
+        self.files[key] = {
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'sha256': digest,
+            'rules': applied,
+            'deps': recorded,
+        }
+        self.dirty = True
+
+    def forget(self, path):
+        if self.files.pop(file_key(path), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({'version': FORMAT_VERSION, 'files': self.files}, indent=1, sort_keys=True)
+        atomic_write(self.path, data.encode('utf-8'))
+        self.dirty = False
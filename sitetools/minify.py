@@ -0,0 +1,329 @@
+"""
+Streaming HTML minifier
+
+A small tokenizer reads the document in chunks, drops comments and
+collapses runs of whitespace in text to one space, removing it entirely
+next to block-level tags. Tags are copied as they are, and the contents of
+<pre>, <textarea>, <script> (JSON-LD included) and <style> pass through
+byte for byte. Tags, comments and verbatim blocks are copied or dropped
+as they stream, and only a few characters are carried over from one chunk
+to the next, so memory stays constant per file however long a page or a
+single tag (say, one with an inline data: URI) is.
+Conditional comments (<!--[if ...]>) and comments starting with <!--! are
+kept.
+
+The 'minify' rule runs it as the last step of the engine's write pass; this
+module can also minify files on its own, streaming each one to disk.
+
+Usage: python -m sitetools.minify [--jobs N] [--dry-run] [FILE ...]
+"""
+import argparse
+import hashlib
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sitetools.engine import chunk_size, html_files, resolve_jobs
+from sitetools.output import atomic_writer, format_bytes, format_saving
+
+CHUNK_SIZE = 64 * 1024
+
+# Content copied verbatim up to the closing tag
+VERBATIM_TAGS = ('pre', 'textarea', 'script', 'style')
+VERBATIM_END_RES = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in VERBATIM_TAGS}
+# Longest closing tag kept back when a verbatim block spans chunks
+VERBATIM_TAIL = 64
+
+# Whitespace next to these tags is not rendered and can be dropped
+BLOCK_TAGS = frozenset('''
+address article aside base blockquote body br dd details dialog div dl dt fieldset figcaption figure
+footer form h1 h2 h3 h4 h5 h6 head header hr html li link main meta nav noscript ol optgroup option
+p pre script section style summary table tbody td tfoot th thead title tr ul
+'''.split())
+
+KEPT_COMMENT_PREFIXES = ('<!--[if', '<!--!', '<!--<![endif]')
+COMMENT_PREFIX_LENGTH = max(map(len, KEPT_COMMENT_PREFIXES))
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r\f]+')
+TAG_NAME_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)')
+# The rest of a tag up to its '>', skipping '>' inside quoted attribute values
+TAG_REST_RE = re.compile(r'''[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>''')
+TAG_SPECIAL_RE = re.compile(r'''[>"']''')
+
+MinifyResult = namedtuple('MinifyResult', 'path changed size old_size error', defaults=(None,))
+
+
+class Minifier:
+    """Incremental minifier: feed() chunks of a document, then close()"""
+
+    def __init__(self):
+        self.buffer = ''
+        # Name of the verbatim element being copied
+        self.verbatim = None
+        # 'keep' or 'drop' while inside a comment
+        self.comment = None
+        # [name of the opening tag being copied (None when closing), open quote]
+        self.tag = None
+        # Whitespace seen but not yet written, and whether the last thing
+        # written was a block-level tag (or nothing at all)
+        self.space = False
+        self.after_block = True
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        out = []
+        self._run(out, final=False)
+        return ''.join(out)
+
+    def close(self):
+        out = []
+        self._run(out, final=True)
+        if self.space and not self.after_block:
+            out.append(' ')
+        self.space = False
+        return ''.join(out)
+
+    def _text(self, out, text):
+        collapsed = WHITESPACE_RE.sub(' ', text)
+        if not collapsed:
+            return
+        if collapsed[0] == ' ':
+            self.space = True
+            collapsed = collapsed[1:]
+        if not collapsed:
+            return
+        if self.space and not self.after_block:
+            out.append(' ')
+        self.space = collapsed[-1] == ' '
+        out.append(collapsed[:-1] if self.space else collapsed)
+        self.after_block = False
+
+    def _tag(self, out, text, block):
+        if self.space and not (block or self.after_block):
+            out.append(' ')
+        out.append(text)
+        self.space = False
+        self.after_block = block
+
+    def _run(self, out, final):
+        buf = self.buffer
+        pos = 0
+        length = len(buf)
+        while pos < length:
+            if self.comment is not None:
+                end = buf.find('-->', pos)
+                if end == -1:
+                    # Keep back a possible start of '-->'
+                    cut = length if final else max(pos, length - 2)
+                    if self.comment == 'keep':
+                        out.append(buf[pos:cut])
+                    pos = cut
+                    break
+                if self.comment == 'keep':
+                    out.append(buf[pos:end + 3])
+                pos = end + 3
+                self.comment = None
+                continue
+
+            if self.tag is not None:
+                # Inside a tag: copy up to its '>', skipping quoted values
+                quote = self.tag[1]
+                if quote:
+                    end = buf.find(quote, pos)
+                    if end == -1:
+                        out.append(buf[pos:])
+                        pos = length
+                        break
+                    out.append(buf[pos:end + 1])
+                    pos = end + 1
+                    self.tag[1] = None
+                    continue
+                special = TAG_SPECIAL_RE.search(buf, pos)
+                if special is None:
+                    out.append(buf[pos:])
+                    pos = length
+                    break
+                out.append(buf[pos:special.end()])
+                pos = special.end()
+                if special.group() != '>':
+                    self.tag[1] = special.group()
+                    continue
+                name = self.tag[0]
+                self.tag = None
+                if name in VERBATIM_TAGS:
+                    self.verbatim = name
+                continue
+
+            if self.verbatim is not None:
+                end = VERBATIM_END_RES[self.verbatim].search(buf, pos)
+                if end is not None:
+                    out.append(buf[pos:end.end()])
+                    pos = end.end()
+                    self.after_block = self.verbatim in BLOCK_TAGS
+                    self.verbatim = None
+                    continue
+                # Keep back a possible start of the closing tag
+                hold = buf.rfind('<', pos)
+                cut = hold if hold != -1 and length - hold < VERBATIM_TAIL and not final else length
+                out.append(buf[pos:cut])
+                pos = cut
+                break
+
+            lt = buf.find('<', pos)
+            if lt == -1:
+                self._text(out, buf[pos:])
+                pos = length
+                break
+            if lt > pos:
+                self._text(out, buf[pos:lt])
+                pos = lt
+            if length - lt < 4 and not final:
+                break
+
+            if buf.startswith('<!--', lt):
+                if length - lt < COMMENT_PREFIX_LENGTH and not final:
+                    break
+                keep = buf.startswith(KEPT_COMMENT_PREFIXES, lt)
+                if keep:
+                    self._tag(out, '', False)
+                self.comment = 'keep' if keep else 'drop'
+                continue
+
+            if buf.startswith(('<!', '<?'), lt):
+                end = buf.find('>', lt)
+                if end == -1 and not final:
+                    break
+                end = length - 1 if end == -1 else end
+                self._tag(out, buf[lt:end + 1], True)
+                pos = end + 1
+                continue
+
+            name = TAG_NAME_RE.match(buf, lt)
+            if name is None:
+                self._text(out, '<')
+                pos = lt + 1
+                continue
+            if name.end() == length and not final:
+                # The name may go on in the next chunk
+                break
+
+            tag = name.group(2).lower()
+            opening = None if name.group(1) else tag
+            rest = TAG_REST_RE.match(buf, name.end())
+            if rest is None:
+                # Runs past the end of the chunk: copy it as it streams
+                self._tag(out, buf[lt:name.end()], tag in BLOCK_TAGS)
+                self.tag = [opening, None]
+                pos = name.end()
+                continue
+            self._tag(out, buf[lt:rest.end()], tag in BLOCK_TAGS)
+            pos = rest.end()
+            if opening in VERBATIM_TAGS:
+                self.verbatim = opening
+
+        self.buffer = buf[pos:]
+
+
+def minify_chunks(chunks):
+    """Minify an iterable of text chunks, yielding output chunks"""
+    minifier = Minifier()
+    for chunk in chunks:
+        out = minifier.feed(chunk)
+        if out:
+            yield out
+    out = minifier.close()
+    if out:
+        yield out
+
+
+def minify(html):
+    """Minify a whole document held in memory"""
+    return ''.join(minify_chunks([html]))
+
+
+class _Unchanged(Exception):
+    """Raised inside atomic_writer to leave an already minified file alone"""
+
+
+def minify_file(path, dry_run=False):
+    """Minify one file in place, streaming it through in CHUNK_SIZE pieces
+
+    The output goes to a temporary file that only replaces the page when it
+    differs from the input; a dry run just measures it.
+    """
+    try:
+        old_size = os.path.getsize(path)
+        source, result = hashlib.sha256(), hashlib.sha256()
+        size = 0
+
+        def chunks(f):
+            for chunk in iter(partial(f.read, CHUNK_SIZE), ''):
+                source.update(chunk.encode('utf-8'))
+                yield chunk
+
+        if dry_run:
+            with open(path, 'r', encoding='utf-8', newline='') as src:
+                size = sum(len(out.encode('utf-8')) for out in minify_chunks(chunks(src)))
+            return MinifyResult(str(path), size != old_size, size, old_size)
+
+        try:
+            with atomic_writer(path) as dst:
+                with open(path, 'r', encoding='utf-8', newline='') as src:
+                    for out in minify_chunks(chunks(src)):
+                        data = out.encode('utf-8')
+                        size += len(data)
+                        result.update(data)
+                        dst.write(data)
+                if result.digest() == source.digest():
+                    raise _Unchanged
+        except _Unchanged:
+            return MinifyResult(str(path), False, size, old_size)
+        return MinifyResult(str(path), True, size, old_size)
+    except Exception as e:
+        return MinifyResult(str(path), False, None, None, str(e))
+
+
+def run(paths, jobs=1, dry_run=False):
+    """Minify every path, across a process pool when jobs > 1"""
+    paths = sorted(paths, key=str)
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(paths) < 2:
+        return [minify_file(path, dry_run) for path in paths]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        return list(pool.map(minify_file, paths, [dry_run] * len(paths),
+                             chunksize=chunk_size(len(paths), jobs)))
+
+
+def report(results, dry_run=False):
+    """Print the byte savings of every page, then the totals"""
+    for result in results:
+        name = os.path.basename(result.path)
+        if result.error:
+            print(f"✗ {name} - Error: {result.error}")
+        elif result.changed:
+            verb = 'would minify' if dry_run else 'minified'
+            print(f"✓ {name} - {verb} {format_saving(result.old_size, result.size)}")
+        else:
+            print(f"✓ {name} - already minified, skipping")
+
+    done = [r for r in results if r.changed and not r.error]
+    before = sum(r.old_size for r in done)
+    after = sum(r.size for r in done)
+    print(f"\n{'Would minify' if dry_run else 'Minified'} {len(done)} of {len(results)} files: "
+          f"{format_saving(before, after)}, saves {format_bytes(before - after)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help='HTML files to minify (default: News/*.html)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (0 = one per CPU, default: 1)')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='report the savings without writing files')
+    args = parser.parse_args(argv)
+    report(run(args.files or html_files(), args.jobs, args.dry_run), args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Shared output layer for the maintenance scripts
+
+Pages are only written when their content actually changed, and always
+through a temporary file and os.replace so a crash never leaves a
+half-written page behind. A dry run produces unified diffs instead.
+"""
+import difflib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _default_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_writer(path):
+    """Yield a binary file that replaces path in one step when the block succeeds
+
+    The original file mode is kept. If the block raises, path is left as it was.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, _default_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write(path, data):
+    """Replace path with data in one step, keeping the original file mode"""
+    with atomic_writer(path) as f:
+        f.write(data)
+
+
+def write_if_changed(path, old_data, new_data, dry_run=False):
+    """Write new_data unless it equals old_data; returns True if the page changed"""
+    if new_data == old_data:
+        return False
+    if not dry_run:
+        atomic_write(path, new_data)
+    return True
+
+
+def unified_diff(path, old_text, new_text):
+    name = Path(path).name
+    return ''.join(difflib.unified_diff(
+        old_text.splitlines(keepends=True),
+        new_text.splitlines(keepends=True),
+        fromfile=f'a/{name}',
+        tofile=f'b/{name}',
+    ))
+
+
+def format_bytes(count):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(count) < 1024:
+            return f'{count:.0f} {unit}' if unit == 'B' else f'{count:.1f} {unit}'
+        count /= 1024
+    return f'{count:.1f} GB'
+
+
+def format_saving(old_size, size):
+    """'48.2 KB -> 39.1 KB (-19%)'"""
+    change = f" ({(size - old_size) / old_size:+.0%})" if old_size else ''
+    return f"{format_bytes(old_size)} -> {format_bytes(size)}{change}"
@@ -0,0 +1,148 @@
+"""
+Per-rule profiling and I/O instrumentation for maintenance runs
+
+With profiling on, every processed file carries a plain dict recording the
+time spent reading, searching, substituting and writing, the bytes read and
+written and the match count of each rule. This module aggregates those
+dicts into a table and writes them out as a JSON or CSV trace.
+"""
+import csv
+import json
+import os
+from time import perf_counter
+
+from sitetools.output import format_bytes
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = _NullPhase()
+
+
+class PhaseTimer:
+    """Add the time spent inside the block to stats[key]"""
+
+    def __init__(self, stats, key):
+        self.stats = stats
+        self.key = key
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats[self.key] += perf_counter() - self.start
+        return False
+
+
+def new_file_profile():
+    return {'read': 0.0, 'write': 0.0, 'bytes_read': 0, 'bytes_written': 0, 'rules': {}}
+
+
+def new_rule_stats():
+    return {'search': 0.0, 'sub': 0.0, 'total': 0.0, 'matches': 0}
+
+
+def file_total(profile):
+    return profile['read'] + profile['write'] + sum(r['total'] for r in profile['rules'].values())
+
+
+def profiled(results):
+    return [r for r in results if r.profile is not None]
+
+
+def slowest_files(results, count=10):
+    """The count slowest profiled results, slowest first"""
+    ranked = sorted(profiled(results), key=lambda r: file_total(r.profile), reverse=True)
+    return ranked[:count]
+
+
+def aggregate(results):
+    """Sum the per-file profiles into per-rule totals and I/O totals"""
+    rules = {}
+    io = {'files': 0, 'read': 0.0, 'write': 0.0, 'bytes_read': 0, 'bytes_written': 0}
+    for result in profiled(results):
+        profile = result.profile
+        io['files'] += 1
+        for key in ('read', 'write', 'bytes_read', 'bytes_written'):
+            io[key] += profile[key]
+        for name, stats in profile['rules'].items():
+            total = rules.setdefault(name, dict(new_rule_stats(), files=0, changed=0))
+            total['files'] += 1
+            total['changed'] += name in result.applied
+            for key in ('search', 'sub', 'total', 'matches'):
+                total[key] += stats[key]
+    return rules, io
+
+
+def print_profile(results, slowest=10):
+    rules, io = aggregate(results)
+    skipped = len(results) - io['files']
+
+    print(f"\nProfile: {io['files']} files read ({skipped} skipped without reading), "
+          f"{format_bytes(io['bytes_read'])} read, {format_bytes(io['bytes_written'])} written")
+    print(f"{'Rule':<16}{'Files':>7}{'Changed':>9}{'Matches':>9}{'Search ms':>11}{'Sub ms':>9}{'Total ms':>10}")
+    print('-' * 71)
+    for name, stats in rules.items():
+        print(f"{name:<16}{stats['files']:>7}{stats['changed']:>9}{stats['matches']:>9}"
+              f"{stats['search'] * 1000:>11.2f}{stats['sub'] * 1000:>9.2f}{stats['total'] * 1000:>10.2f}")
+    print(f"{'read':<16}{io['files']:>7}{'':>9}{'':>9}{'':>11}{'':>9}{io['read'] * 1000:>10.2f}")
+    print(f"{'write':<16}{'':>7}{'':>9}{'':>9}{'':>11}{'':>9}{io['write'] * 1000:>10.2f}")
+
+    ranked = slowest_files(results, slowest)
+    if ranked:
+        print(f"\nSlowest {len(ranked)} files:")
+        for rank, result in enumerate(ranked, 1):
+            profile = result.profile
+            heaviest = max(profile['rules'].items(), key=lambda item: item[1]['total'], default=None)
+            detail = f", slowest rule {heaviest[0]} {heaviest[1]['total'] * 1000:.2f} ms" if heaviest else ''
+            print(f"  {rank:>2}. ⚠ {os.path.basename(result.path)} - {file_total(profile) * 1000:.2f} ms "
+                  f"(read {profile['read'] * 1000:.2f} ms, write {profile['write'] * 1000:.2f} ms{detail})")
+
+
+def write_trace(results, path, slowest=10):
+    """Write the per-file, per-rule trace as JSON or CSV (chosen by extension)"""
+    ranks = {r.path: rank for rank, r in enumerate(slowest_files(results, slowest), 1)}
+
+    if str(path).lower().endswith('.csv'):
+        fields = ['path', 'rule', 'slowest_rank', 'total_s', 'read_s', 'search_s', 'sub_s', 'write_s',
+                  'bytes_read', 'bytes_written', 'matches', 'changed']
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for result in profiled(results):
+                profile = result.profile
+                writer.writerow({
+                    'path': result.path, 'rule': '', 'slowest_rank': ranks.get(result.path, ''),
+                    'total_s': f'{file_total(profile):.6f}', 'read_s': f"{profile['read']:.6f}",
+                    'write_s': f"{profile['write']:.6f}", 'bytes_read': profile['bytes_read'],
+                    'bytes_written': profile['bytes_written'], 'changed': int(result.changed),
+                })
+                for name, stats in profile['rules'].items():
+                    writer.writerow({
+                        'path': result.path, 'rule': name, 'slowest_rank': ranks.get(result.path, ''),
+                        'total_s': f"{stats['total']:.6f}", 'search_s': f"{stats['search']:.6f}",
+                        'sub_s': f"{stats['sub']:.6f}", 'matches': stats['matches'],
+                        'changed': int(name in result.applied),
+                    })
+        return
+
+    rules, io = aggregate(results)
+    trace = {
+        'io': io,
+        'rules': rules,
+        'slowest': [r.path for r in slowest_files(results, slowest)],
+        'files': [
+            dict(result.profile, path=result.path, total=file_total(result.profile),
+                 changed=result.changed, slowest_rank=ranks.get(result.path))
+            for result in profiled(results)
+        ],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, indent=1)
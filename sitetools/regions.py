@@ -0,0 +1,175 @@
+"""
+Linear-time locator for the named regions of a page
+
+A small hand-written scanner walks the document tag by tag, skipping
+comments and raw-text elements, and records where the body, skip-link,
+main, footer and bottom nav start and end, along with the elements that
+hold shared fragments (the ticker, the footer's recent posts, the header
+nav and the mobile menu). Each character is looked at a bounded number of
+times, so the cost stays linear in the page size even on malformed pages
+without a <main>, where the old DOTALL patterns backtracked.
+"""
+import re
+from collections import namedtuple
+
+Span = namedtuple('Span', 'start end')
+
+TAG_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)')
+CLASS_RE = re.compile(r'''\sclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+# Elements located by tag and class, holding the shared fragments
+ELEMENT_REGIONS = {
+    ('div', 'new-ticker-content'): 'ticker',
+    ('div', 'f-posts'): 'recent-posts',
+    ('nav', 'nav-island'): 'nav',
+    ('div', 'mobile-nav-content'): 'mobile-nav',
+}
+ELEMENT_TAGS = frozenset(tag for tag, _ in ELEMENT_REGIONS)
+
+RAW_TEXT_TAGS = ('script', 'style', 'textarea', 'title')
+RAW_TEXT_END_RES = {
+    tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in RAW_TEXT_TAGS
+}
+
+
+class Regions(dict):
+    """Mapping of region name to Span offsets into the scanned document
+
+    body and main cover their opening tags; skip-link, footer, bottom-nav,
+    ticker, recent-posts, nav and mobile-nav cover the whole element
+    including its closing tag.
+    """
+
+    def __getattr__(self, name):
+        return self.get(name.replace('_', '-'))
+
+
+def _classes(tag_text):
+    match = CLASS_RE.search(tag_text)
+    if not match:
+        return ()
+    return (match.group(1) or match.group(2) or match.group(3) or '').split()
+
+
+def iter_tags(html, start=0):
+    """Yield (closing, name, start, end) for every tag, skipping comments and raw text"""
+    pos = start
+    length = len(html)
+    while pos < length:
+        lt = html.find('<', pos)
+        if lt == -1:
+            return
+
+        if html.startswith('<!--', lt):
+            end = html.find('-->', lt + 4)
+            pos = length if end == -1 else end + 3
+            continue
+
+        match = TAG_RE.match(html, lt)
+        if not match:
+            pos = lt + 1
+            continue
+
+        # A '>' inside a quoted attribute value ends the tag early. Our
+        # templates never do that, and it keeps every lookup a plain find.
+        gt = html.find('>', match.end())
+        gt = length if gt == -1 else gt + 1
+
+        closing = match.group(1) == '/'
+        name = match.group(2).lower()
+        yield closing, name, lt, gt
+        pos = gt
+
+        if not closing and name in RAW_TEXT_TAGS:
+            raw_end = RAW_TEXT_END_RES[name].search(html, gt)
+            if raw_end is None:
+                return
+            yield True, name, raw_end.start(), raw_end.end()
+            pos = raw_end.end()
+
+
+def locate_regions(html):
+    """Find the named regions of a page in one linear pass"""
+    regions = Regions()
+
+    awaiting_first = False
+    skip_link_start = None
+    footer_depth = 0
+    footer_start = footer_classes = None
+    footers = []
+    nav_depth = 0
+    nav_start = None
+    # region name -> [tag, start, depth] for fragment elements still open
+    open_elements = {}
+
+    for closing, name, start, end in iter_tags(html):
+        for region, state in list(open_elements.items()):
+            if state[0] != name:
+                continue
+            state[2] += -1 if closing else 1
+            if state[2] == 0:
+                regions[region] = Span(state[1], end)
+                del open_elements[region]
+
+        if not closing:
+            for cls in _classes(html[start:end]) if name in ELEMENT_TAGS else ():
+                region = ELEMENT_REGIONS.get((name, cls))
+                if region and region not in regions and region not in open_elements:
+                    open_elements[region] = [name, start, 1]
+
+            if name == 'body' and 'body' not in regions:
+                regions['body'] = Span(start, end)
+                awaiting_first = True
+                continue
+
+            if awaiting_first:
+                # The skip link has to be the first element inside <body>
+                awaiting_first = False
+                if (name == 'a' and 'skip-link' in _classes(html[start:end])
+                        and not html[regions['body'].end:start].strip()):
+                    skip_link_start = start
+
+            if name == 'main' and 'main' not in regions:
+                regions['main'] = Span(start, end)
+            elif name == 'footer':
+                if footer_depth == 0:
+                    footer_start, footer_classes = start, _classes(html[start:end])
+                footer_depth += 1
+            elif name == 'nav':
+                if nav_depth:
+                    nav_depth += 1
+                elif 'bottom-nav' not in regions and 'bottom-nav' in _classes(html[start:end]):
+                    nav_start, nav_depth = start, 1
+            continue
+
+        if name == 'a' and skip_link_start is not None and 'skip-link' not in regions:
+            regions['skip-link'] = Span(skip_link_start, end)
+        elif name == 'footer' and footer_depth:
+            footer_depth -= 1
+            if footer_depth == 0:
+                footers.append((Span(footer_start, end), footer_classes))
+        elif name == 'nav' and nav_depth:
+            nav_depth -= 1
+            if nav_depth == 0:
+                regions['bottom-nav'] = Span(nav_start, end)
+
+    if footers:
+        # Prefer the site footer over footers nested in articles or cards
+        site = [span for span, classes in footers if 'site-footer' in classes]
+        regions['footer'] = site[0] if site else footers[-1][0]
+
+    return regions
+
+
+def splice(html, replacements):
+    """Replace non-overlapping (Span, text) pairs in one pass"""
+    parts = []
+    pos = 0
+    for span, text in sorted(replacements, key=lambda item: item[0].start):
+        if span.start < pos:
+            raise ValueError(f'Overlapping regions at offset {span.start}')
+        parts.append(html[pos:span.start])
+        parts.append(text)
+        pos = span.end
+    parts.append(html[pos:])
+    return ''.join(parts)
@@ -0,0 +1,409 @@
+"""
+Transforms used by the site maintenance scripts, registered with the engine
+
+Rules run in order: main-tag repair, stylesheet links, header/footer
+standardisation, shared fragment refresh, theme-script injection,
+fingerprinting of shared assets, responsive images, then (opt-in, as it
+drops the comment markers replace_section.py splices at) minification.
+"""
+import re
+
+from sitetools import assets, fragments, images, minify
+from sitetools.engine import rule
+from sitetools.regions import Span, locate_regions, splice
+
+# Pages that already carry the reference header and footer
+REFERENCE_PAGES = ('index.html', 'index-broken-backup.html')
+
+# The theme toggle script to add
+THEME_SCRIPT = '''<script>document.addEventListener("DOMContentLoaded", () => { const e = document.getElementById("theme-toggle"), t = document.body, l = document.querySelector(".header-logo img"); function updateHeaderLogo() { l && (l.src = t.classList.contains("dark-mode") ? "/img/logo-footer.svg" : "/img/logo.png") } "dark" === localStorage.getItem("theme") && (t.classList.add("dark-mode"), updateHeaderLogo()), e && e.addEventListener("click", () => { t.classList.toggle("dark-mode"); const e = t.classList.contains("dark-mode"); localStorage.setItem("theme", e ? "dark" : "light"), updateHeaderLogo() }); const n = document.getElementById("mobile-menu-btn"), o = document.getElementById("mobile-menu-overlay"); n && o && (n.addEventListener("click", () => { o.classList.toggle("active"), n.textContent = o.classList.contains("active") ? "✕" : "☰" }), o.querySelectorAll("a").forEach(e => { e.addEventListener("click", () => { o.classList.remove("active"), n.textContent = "☰" }) })) })</script>'''
+
+# Define the standardized header HTML from index.html
+STANDARD_HEADER = '''  <!-- TICKER ADDED BACK -->
+  <div class="new-ticker-wrap">
+    <span class="ticker-label-fixed">NEWS</span>
+    <div class="new-ticker-content">
+      <div class="ticker-item">
+        <span class="ticker-category">Cryptocurrency</span>
+        <span class="ticker-date">June 8, 2026</span>
+        <span class="ticker-headline">Bitcoin Surges Past $125,000 as Institutions Double Down</span>
+        <span class="ticker-dot">•</span>
+      </div>
+      <div class="ticker-item">
+        <span class="ticker-category">Markets</span>
+        <span class="ticker-date">June 8, 2026</span>
+        <span class="ticker-headline">S&P 500 Closes at Record High on Tech Rally</span>
+        <span class="ticker-dot">•</span>
+      </div>
+      <div class="ticker-item">
+        <span class="ticker-category">Commodities</span>
+        <span class="ticker-date">June 8, 2026</span>
+        <span class="ticker-headline">Gold Hits All-Time High Amid Economic Uncertainty</span>
+        <span class="ticker-dot">•</span>
+      </div>
+      <div class="ticker-item">
+        <span class="ticker-category">Economy</span>
+        <span class="ticker-date">June 8, 2026</span>
+        <span class="ticker-headline">Federal Reserve Signals Potential Rate Cuts This Year</span>
+        <span class="ticker-dot">•</span>
+      </div>
+    </div>
+  </div>
+
+  <!-- HEADER REDESIGN -->
+  <header class="site-header container">
+    <div class="header-logo"><a href="index.html"><img src="/img/logo.png" alt="FNPulse"></a></div>
+    <nav class="nav-island"><a href="index.html" class="nav-link">Home</a> <a href="markets.html"
+        class="nav-link">Markets</a> <a href="economy.html" class="nav-link">Economy</a> <a href="technology.html"
+        class="nav-link">Technology</a> <a href="stocks-indices.html" class="nav-link">Stocks</a> <a
+        href="commodities.html" class="nav-link">Commodities</a> <a href="forex.html" class="nav-link">Forex</a> <a
+        href="crypto.html" class="nav-link">Crypto</a> <a href="about.html" class="nav-link">About</a> <a
+        href="editorial-standards.html" class="nav-link">Editorial</a> <a href="contact.html" class="nav-link">Contact</a></nav>
+    <div class="header-actions">
+      <div id="theme-toggle" class="toggle-switch" title="Dark Mode">
+        <div class="toggle-thumb"></div>
+      </div><button id="mobile-menu-btn" class="icon-btn primary" aria-label="Menu">☰</button>
+    </div>
+  </header>
+
+  <!-- Mobile Menu Overlay -->
+  <div id="mobile-menu-overlay" class="mobile-menu-overlay">
+    <div class="mobile-nav-content">
+      <a href="index.html">Home</a>
+      <a href="markets.html">Markets</a>
+      <a href="economy.html">Economy</a>
+      <a href="technology.html">Technology</a>
+      <a href="stocks-indices.html">Stocks</a>
+      <a href="commodities.html">Commodities</a>
+      <a href="forex.html">Forex</a>
+      <a href="crypto.html">Crypto</a>
+      <a href="about.html">About</a>
+      <a href="editorial-standards.html">Editorial</a>
+      <a href="contact.html">Contact</a>
+    </div>
+  </div>'''
+
+STANDARD_FOOTER = '''  <footer class="site-footer dark-footer">
+    <div class="container" style="padding-top:180px">
+      <div class="footer-top-grid">
+        <div class="footer-branding">
+          <div class="f-logo"><img src="/img/logo-footer.svg" alt="FNPulse" class="logo-white-filter"> <span
+              class="logo-text">FNPulse</span></div>
+          <p class="f-desc">FNPulse delivers breaking financial news and real-time market coverage—fast, verified, and
+            actionable.</p>
+          <div class="f-socials"><a href="#">Fb</a><a href="#">In</a><a href="#">X</a><a href="#">Ln</a></div>
+          <div class="f-apps"><button class="app-store-btn">Google Play</button> <button class="app-store-btn">App
+              Store</button></div>
+        </div>
+        <div class="footer-widget">
+          <h4>Top Categories</h4>
+          <ul class="f-links">
+            <li><a href="markets.html">Markets</a></li>
+            <li><a href="economy.html">Economy</a></li>
+            <li><a href="technology.html">Technology</a></li>
+            <li><a href="stocks-indices.html">Stocks & Indices</a></li>
+            <li><a href="commodities.html">Commodities</a></li>
+            <li><a href="economic-policy.html">Economic Policy</a></li>
+            <li><a href="global-business.html">Global Business</a></li>
+            <li><a href="about.html">About Us</a></li>
+            <li><a href="advertisement.html">Advertise</a></li>
+            <li><a href="contact.html">Contact</a></li>
+          </ul>
+        </div>
+        <div class="footer-widget">
+          <h4>Recent Post</h4>
+          <div class="f-posts">
+            <article class="f-post-item"><img src="/img/news-350x223-4.jpg" alt="thumb">
+              <div><a href="news/the-pyramid-being-built-but-are-in-ruins-already-xddd.html">test the edits - The
+                  pyramid being built but are in ruins already? XDDD</a> <span class="f-date">Jan 24, 2026</span></div>
+            </article>
+            <article class="f-post-item"><img src="/img/news-350x223-3.jpg" alt="thumb">
+              <div><a href="article-sp500-record.html">S&P 500 Closes at Record High on Tech Rally</a> <span
+                  class="f-date">Jan 21, 2026</span></div>
+            </article>
+            <article class="f-post-item"><img src="/img/news-350x223-1.jpg" alt="thumb">
+              <div><a href="article-bitcoin-125k.html">Bitcoin Surges Past $125,000 as Institutions Double Down</a>
+                <span class="f-date">Jan 21, 2026</span>
+              </div>
+            </article>
+          </div>
+        </div>
+        <div class="footer-widget">
+          <h4>Tags</h4>
+          <div class="tag-cloud dark-tags"><a href="forex.html">Forex</a> <a href="crypto.html">Crypto</a> <a
+              href="stocks-indices.html">Stocks</a> <a href="economy.html">Economy</a> <a
+              href="markets.html">Trading</a> <a href="markets.html">Investing</a> <a href="markets.html">Finance</a> <a
+              href="markets.html">Analysis</a></div>
+        </div>
+      </div>
+      <div class="footer-bar"><span><a href="terms.html">Terms & Agreements</a></span> <span>Copyright © 2026 FNPulse.
+          Designed by RSTheme.</span> <span><a href="privacy.html">Privacy policy</a></span></div>
+    </div>
+  </footer>
+  <nav class="bottom-nav" aria-label="Mobile"><a href="index.html" class="bottom-link">Home</a> <a
+      href="markets.html" class="bottom-link">Markets</a> <a href="economy.html" class="bottom-link">Economy</a> <a
+      href="about.html" class="bottom-link">About</a></nav>'''
+
+# Broken archive markup left behind by an old template bug
+BROKEN_MAIN_RE = re.compile(
+    r'</div></div>\s*id="main-archive" class="container article-container"&gt;'
+)
+FIXED_MAIN = '</div></div><main id="main-archive" class="container article-container">'
+ARCHIVE_SECTION = '<section class="container" style="position:relative;z-index:10;margin-bottom:50px;margin-top:50px">'
+
+MAIN_STYLESHEET = '<link rel="stylesheet" href="/css/fnpulse.min.css">'
+HERO_STYLESHEET = '<link rel="stylesheet" href="/css/hero-redesign.css">'
+
+MAIN_SCRIPT = '<script src="/js/main.min.js"></script>'
+THEME_MARKER = 'document.getElementById("theme-toggle")'
+
+# The same tags once their URLs are fingerprinted
+MAIN_STYLESHEET_RE = re.compile(
+    '<link rel="stylesheet" href="' + assets.versions_pattern('/css/fnpulse.min.css') + '">'
+)
+HERO_STYLESHEET_RE = assets.reference_re('/css/hero-redesign.css')
+MAIN_SCRIPT_RE = re.compile('<script src="' + assets.versions_pattern('/js/main.min.js') + '"></script>')
+
+# The theme script is served as its own fingerprinted file
+THEME_JS_URL = '/js/theme.js'
+assets.register_inline(THEME_JS_URL, THEME_SCRIPT[len('<script>'):-len('</script>')])
+THEME_JS_RE = assets.reference_re(THEME_JS_URL)
+
+
+# Standard header/footer with the current fragments (ticker, recent posts and
+# the navs from navigation.json) spliced in, by fragment hashes
+_standard_cache = {}
+
+
+def _with_fragments(kind, template, names, base_path):
+    current = fragments.current()
+    parts = [current.get(name, base_path) for name in names if name in current.names()]
+    key = (kind, base_path) + tuple(f.hash for f in parts)
+    if key not in _standard_cache:
+        regions = locate_regions(template)
+        _standard_cache[key] = splice(template, [(regions[f.name], f.html) for f in parts])
+    return _standard_cache[key]
+
+
+def standard_header(base_path=''):
+    return _with_fragments('header', STANDARD_HEADER, ['ticker', 'nav', 'mobile-nav'], base_path)
+
+
+def standard_footer(base_path=''):
+    return _with_fragments('footer', STANDARD_FOOTER, ['recent-posts', 'bottom-nav'], base_path)
+
+
+def fragment_hashes():
+    return fragments.current().hashes()
+
+
+def asset_hashes():
+    return assets.current().hashes()
+
+
+def image_hashes():
+    return images.current().hashes()
+
+
+def publish_assets(dry_run):
+    for url in assets.current().publish(dry_run):
+        print(f"{'Would publish' if dry_run else 'Published'} {url}")
+
+
+def script_spans(content, script):
+    """Spans of every copy of exactly this inline <script> element"""
+    spans = []
+    at = content.find(script)
+    while at != -1:
+        spans.append(Span(at, at + len(script)))
+        at = content.find(script, at + len(script))
+    return spans
+
+
+@rule('main-tags', order=10)
+def fix_main_tags(content, ctx):
+    """Restore the <main> tag of archive pages and close it before the footer section"""
+    with ctx.phase('search'):
+        match = BROKEN_MAIN_RE.search(content)
+    if not match:
+        ctx.note('no broken main tag')
+        return content
+
+    with ctx.phase('sub'):
+        content, count = BROKEN_MAIN_RE.subn(FIXED_MAIN, content)
+    ctx.matched(count)
+
+    # The main tag should close before the section that precedes the footer
+    with ctx.phase('search'):
+        close_at = content.find(ARCHIVE_SECTION, match.start())
+        needs_close = close_at != -1 and '</main>' not in content[match.start():close_at]
+    if needs_close:
+        with ctx.phase('sub'):
+            content = content[:close_at] + '</main>' + content[close_at:]
+        ctx.matched()
+    return content
+
+
+@rule('stylesheets', order=20, exclude=REFERENCE_PAGES)
+def add_stylesheets(content, ctx):
+    """Add hero-redesign.css to the head after the main stylesheet"""
+    with ctx.phase('search'):
+        needed = MAIN_STYLESHEET_RE.search(content) and not HERO_STYLESHEET_RE.search(content)
+    if not needed:
+        return content
+
+    with ctx.phase('sub'):
+        content = MAIN_STYLESHEET_RE.sub(lambda m: f'{m.group(0)}\n  {HERO_STYLESHEET}', content)
+    ctx.matched()
+    return content
+
+
+@rule('header-footer', order=30, version=4, exclude=REFERENCE_PAGES)
+def standardise_header_footer(content, ctx):
+    """Replace the page header and footer with the standard ones from index.html"""
+    # Check if file already uses the new design (has the new ticker)
+    with ctx.phase('search'):
+        current = 'new-ticker-wrap' in content and 'site-header container' in content
+    if current:
+        ctx.note('already using new design')
+        return content
+
+    with ctx.phase('search'):
+        regions = locate_regions(content)
+    replacements = []
+    base_path = fragments.base_path_for(ctx.path)
+
+    # Replace everything from after the skip-link (or body start) to before <main
+    header_start = regions.skip_link or regions.body
+    if header_start and regions.main and header_start.end <= regions.main.start:
+        replacements.append((
+            Span(header_start.end, regions.main.start),
+            f'\n{standard_header(base_path)}\n\n  ',
+        ))
+
+    # Replace the footer, and the bottom nav that directly follows it
+    footer = regions.footer
+    if footer and not (replacements and footer.start < regions.main.start):
+        bottom_nav = regions.bottom_nav
+        if bottom_nav and bottom_nav.start >= footer.end and not content[footer.end:bottom_nav.start].strip():
+            footer = Span(footer.start, bottom_nav.end)
+        replacements.append((footer, standard_footer(base_path)))
+
+    with ctx.phase('sub'):
+        content = splice(content, replacements)
+    ctx.matched(len(replacements))
+    return content
+
+
+@rule('fragments', order=35, inputs=fragment_hashes)
+def refresh_fragments(content, ctx):
+    """Splice the current ticker, recent posts and navs into pages using the new design"""
+    current = fragments.current()
+    with ctx.phase('search'):
+        regions = locate_regions(content)
+    base_path = fragments.base_path_for(ctx.path)
+
+    replacements = []
+    for name in current.names():
+        span = regions.get(name)
+        if span is None:
+            continue
+        fragment = current.get(name, base_path)
+        ctx.depends(name, fragment.hash)
+        with ctx.phase('search'):
+            up_to_date = fragments.embedded_hash(content, span.start) == fragment.hash
+        if not up_to_date:
+            replacements.append((span, fragment.html))
+
+    if not replacements:
+        ctx.note('fragments up to date')
+        return content
+
+    with ctx.phase('sub'):
+        content = splice(content, replacements)
+    ctx.matched(len(replacements))
+    return content
+
+
+@rule('theme-script', order=40)
+def add_theme_script(content, ctx):
+    """Add the theme toggle and mobile menu script after main.min.js"""
+    with ctx.phase('search'):
+        present = THEME_MARKER in content or THEME_JS_RE.search(content)
+        has_main_script = MAIN_SCRIPT_RE.search(content)
+    if present:
+        ctx.note('already has script')
+        return content
+
+    # main.min.js should be in all pages
+    if not has_main_script:
+        ctx.note('⚠ no main.min.js found')
+        return content
+
+    with ctx.phase('sub'):
+        content, count = MAIN_SCRIPT_RE.subn(lambda m: f'{m.group(0)}\n  {THEME_SCRIPT}', content)
+    ctx.matched(count)
+    return content
+
+
+@rule('assets', order=50, inputs=asset_hashes, prepare=publish_assets)
+def fingerprint_assets(content, ctx):
+    """Move the inline theme script to its own file and point shared asset URLs at fingerprinted names"""
+    current = assets.current()
+    # Only the script the theme-script rule adds is extracted; pages with
+    # their own inline variant keep it
+    with ctx.phase('search'):
+        copies = script_spans(content, THEME_SCRIPT)
+        linked = THEME_JS_RE.search(content)
+    if copies:
+        tag = f'<script src="{current.get(THEME_JS_URL).fingerprinted}"></script>'
+        # One tag in place of the first copy; further copies are dropped
+        replacements = [(span, '') for span in copies]
+        if not linked:
+            replacements[0] = (copies[0], tag)
+        with ctx.phase('sub'):
+            content = splice(content, replacements)
+        ctx.matched(len(copies))
+
+    for asset in current:
+        with ctx.phase('sub'):
+            content, count = current.pattern(asset.url).subn(asset.fingerprinted, content)
+        if count:
+            ctx.depends(asset.url, asset.hash)
+            ctx.matched(count)
+    return content
+
+
+@rule('images', order=60, inputs=image_hashes)
+def responsive_images(content, ctx):
+    """Give <img> tags of photos with derivatives a srcset, sizes and dimensions in a <picture>"""
+    current = images.current()
+    replacements = []
+    with ctx.phase('search'):
+        for span, html, key, digest in images.responsive_images(content, current, images.page_dir(ctx.path)):
+            # Photos without derivatives are recorded too (digest None), so
+            # the page is revisited once they are built
+            ctx.depends(key, digest)
+            if html is not None:
+                replacements.append((span, html))
+    if not replacements:
+        if not current:
+            ctx.note('no image derivatives, run python -m sitetools.images')
+        return content
+
+    with ctx.phase('sub'):
+        content = splice(content, replacements)
+    ctx.matched(len(replacements))
+    return content
+
+
+@rule('minify', order=90, default=False)
+def minify_page(content, ctx):
+    """Drop comments and collapse whitespace, leaving pre, textarea, script and style as they are"""
+    with ctx.phase('sub'):
+        minified = minify.minify(content)
+    if minified == content:
+        ctx.note('already minified')
+        return content
+    ctx.matched()
+    return minified
@@ -0,0 +1,411 @@
+"""
+Sharded inverted search index for News/search.html
+
+Articles (title, category, author, lead and body, as parsed by
+sitetools.articles) and the published press releases from content.json are
+tokenised into per-field weighted term frequencies. Postings are sharded by
+the first PREFIX_LENGTH characters of each term, and oversized shards by a
+longer prefix, so the browser downloads only the shards its query terms fall
+in, plus the document shards of the hits it shows. Each posting carries a precomputed BM25 term-frequency
+score; the client multiplies it by the term's IDF (from the posting count
+and the document count in index.json).
+
+Reindexing is incremental: documents are only tokenised again when their
+content hash changes, document ids are stable, and only the shards holding
+terms of changed documents are read back, patched and written under a new
+content-hashed name.
+
+Usage: python -m sitetools.search [--force] [--output DIR]
+"""
+import argparse
+import hashlib
+import html
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import accumulate
+from operator import sub
+from pathlib import Path
+
+from sitetools.articles import load_articles
+from sitetools.engine import NEWS_DIR
+from sitetools.fragments import CONTENT_JSON, load_content
+from sitetools.manifest import CACHE_DIR
+from sitetools.output import atomic_write, format_bytes
+
+SEARCH_DIR = NEWS_DIR / 'search'
+SEARCH_CACHE_PATH = CACHE_DIR / 'search.json'
+
+# Bump when tokenising or scoring changes so every document is reindexed
+INDEX_VERSION = 1
+
+PREFIX_LENGTH = 2
+# Shards with more postings than this are split by a longer prefix
+MAX_SHARD_POSTINGS = 20000
+MAX_PREFIX_LENGTH = 6
+DOCS_PER_SHARD = 500
+HASH_LENGTH = 10
+EXCERPT_LENGTH = 160
+
+# BM25F-style field weights and parameters
+FIELD_WEIGHTS = {'title': 3.0, 'category': 2.0, 'author': 1.5, 'excerpt': 1.5, 'body': 1.0}
+K1 = 1.2
+B = 0.75
+
+# The average document length scores are normalised against is only moved
+# when the real average drifts this far, so one new article does not change
+# every shard
+PIVOT_DRIFT = 0.1
+
+# Score fixed-point scale: postings store round(score * SCORE_SCALE)
+SCORE_SCALE = 100
+
+DOC_FIELDS = ['url', 'title', 'date', 'category', 'excerpt']
+
+STOPWORDS = frozenset('''
+a an and are as at be but by for from has have he her his i in is it its of on or our she
+that the their them they this to was we were what when which who will with you your
+'''.split())
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def tokenize(text):
+    """Lowercase ASCII terms of text, accents folded, stopwords dropped"""
+    folded = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return [t for t in TOKEN_RE.findall(folded) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _hash(value):
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def _excerpt(text):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= EXCERPT_LENGTH else text[:EXCERPT_LENGTH - 3].rstrip() + '...'
+
+
+def documents(news_dir=NEWS_DIR, content_path=CONTENT_JSON):
+    """Searchable documents: every article page and published press release"""
+    docs = []
+    for article in load_articles(news_dir):
+        docs.append({
+            'key': article['filename'],
+            'url': article['filename'],
+            'title': article['headline'] or article['title'],
+            'date': (article['publishDate'] or '')[:10],
+            'category': article['category'],
+            'author': article['author'],
+            'excerpt': article['excerpt'],
+            'body': article['body'],
+        })
+
+    for release in load_content(content_path).get('pressReleases', []):
+        filename = release.get('filename')
+        if release.get('status') != 'published' or not filename or not (Path(news_dir) / filename).exists():
+            continue
+        docs.append({
+            'key': filename,
+            'url': filename,
+            'title': release.get('headline', ''),
+            'date': (release.get('releaseDate') or '')[:10],
+            'category': 'Press Release',
+            'author': '',
+            'excerpt': release.get('lead') or release.get('subheadline', ''),
+            'body': html.unescape(TAG_RE.sub(' ', release.get('body', ''))),
+        })
+    return docs
+
+
+def index_document(doc):
+    """Weighted term frequencies, weighted length and display fields of one document"""
+    terms = defaultdict(float)
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(doc.get(field)):
+            terms[term] += weight
+            length += weight
+    display = [doc['url'], doc['title'], doc['date'], doc['category'], _excerpt(doc['excerpt'] or doc['body'])]
+    return {'terms': dict(terms), 'length': length, 'display': display}
+
+
+def bm25_tf(weight, length, pivot):
+    return weight * (K1 + 1) / (weight + K1 * (1 - B + B * length / pivot))
+
+
+def _score(entry, term, pivot):
+    return round(bm25_tf(entry['terms'][term], entry['length'], pivot) * SCORE_SCALE)
+
+
+def _shard_name(kind, key, data):
+    return f'{kind}-{key}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}.json'
+
+
+def _dump(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def _encode(postings):
+    """{term: {doc id: score}} as the shard format, doc ids delta-encoded"""
+    shard = {}
+    for term, hits in postings.items():
+        ids = sorted(hits)
+        shard[term] = [list(map(sub, ids, [0] + ids)), [hits[doc_id] for doc_id in ids]]
+    return _dump({'terms': shard})
+
+
+def _decode(data):
+    return {term: dict(zip(accumulate(gaps), scores))
+            for term, (gaps, scores) in json.loads(data)['terms'].items()}
+
+
+def _split(key, postings):
+    """Split an oversized shard by one more prefix character, recursively
+
+    Terms no longer than the key stay in it. Returns {key: postings}.
+    """
+    size = sum(len(hits) for hits in postings.values())
+    if size <= MAX_SHARD_POSTINGS or len(key) >= MAX_PREFIX_LENGTH:
+        return {key: postings}
+    groups = defaultdict(dict)
+    for term, hits in postings.items():
+        groups[term[:len(key) + 1]][term] = hits
+    if len(groups) == 1 and key not in groups:
+        (longer, only), = groups.items()
+        return _split(longer, only)
+    shards = {}
+    for prefix, group in groups.items():
+        shards.update({prefix: group} if prefix == key else _split(prefix, group))
+    return shards
+
+
+def shard_key(term, keys):
+    """The key of the shard term belongs in: the longest key it starts with"""
+    for length in range(min(len(term), MAX_PREFIX_LENGTH), PREFIX_LENGTH - 1, -1):
+        if term[:length] in keys:
+            return term[:length]
+    return term[:PREFIX_LENGTH]
+
+
+class SearchIndex:
+    """Indexed documents with stable ids and the shard files written for them"""
+
+    def __init__(self, path=SEARCH_CACHE_PATH):
+        self.path = Path(path)
+        self.ids = {}
+        self.next_id = 0
+        self.docs = {}
+        self.pivot = None
+        # Shard file names by term prefix and by doc page, as last written
+        self.terms = {}
+        self.pages = {}
+        # Terms of the documents changed since the last write, by doc id
+        self.changed = defaultdict(set)
+        self.rescore = True
+
+    @classmethod
+    def load(cls, path=SEARCH_CACHE_PATH):
+        index = cls(path)
+        try:
+            with open(index.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                index.ids = data['ids']
+                index.next_id = data['next_id']
+                index.docs = data['docs']
+                index.pivot = data['pivot']
+                index.terms = data['terms']
+                index.pages = data['pages']
+                index.rescore = False
+        except (OSError, ValueError, KeyError):
+            pass
+        return index
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'version': INDEX_VERSION, 'ids': self.ids, 'next_id': self.next_id, 'docs': self.docs,
+                'pivot': self.pivot, 'terms': self.terms, 'pages': self.pages}
+        atomic_write(self.path, _dump(data))
+
+    def update(self, docs):
+        """Bring the index in line with docs, tokenising only changed documents
+
+        Returns (indexed, reused, removed) counts.
+        """
+        indexed = reused = 0
+        seen = set()
+        for doc in docs:
+            key = doc['key']
+            seen.add(key)
+            digest = _hash(doc)
+            entry = self.docs.get(key)
+            if entry is not None and entry['sha256'] == digest:
+                reused += 1
+                continue
+            if key not in self.ids:
+                self.ids[key] = self.next_id
+                self.next_id += 1
+            new_entry = dict(index_document(doc), sha256=digest)
+            self.changed[self.ids[key]].update(new_entry['terms'], entry['terms'] if entry else ())
+            self.docs[key] = new_entry
+            indexed += 1
+
+        removed = [key for key in self.docs if key not in seen]
+        for key in removed:
+            self.changed[self.ids[key]].update(self.docs.pop(key)['terms'])
+            del self.ids[key]
+
+        if self.docs:
+            average = sum(entry['length'] for entry in self.docs.values()) / len(self.docs)
+            if not self.pivot or abs(average - self.pivot) > PIVOT_DRIFT * self.pivot:
+                # Every score depends on the pivot
+                self.pivot = round(average, 1)
+                self.rescore = True
+        return indexed, reused, len(removed)
+
+    def _all_postings(self):
+        postings = defaultdict(dict)
+        for key, entry in self.docs.items():
+            doc_id = self.ids[key]
+            for term in entry['terms']:
+                postings[term][doc_id] = _score(entry, term, self.pivot)
+        shards = defaultdict(dict)
+        for term, hits in postings.items():
+            shards[term[:PREFIX_LENGTH]][term] = hits
+        return shards
+
+    def _changed_postings(self, output_dir):
+        """The shards holding changed terms, read back and patched; None if one is missing"""
+        by_id = {self.ids[key]: entry for key, entry in self.docs.items()}
+        shards = {}
+        for doc_id, terms in self.changed.items():
+            entry = by_id.get(doc_id)
+            for term in terms:
+                key = shard_key(term, self.terms)
+                if key not in shards:
+                    if key in self.terms:
+                        try:
+                            shards[key] = _decode((output_dir / self.terms[key]).read_bytes())
+                        except (OSError, ValueError):
+                            return None
+                    else:
+                        shards[key] = {}
+                hits = shards[key].setdefault(term, {})
+                if entry is not None and term in entry['terms']:
+                    hits[doc_id] = _score(entry, term, self.pivot)
+                else:
+                    hits.pop(doc_id, None)
+                    if not hits:
+                        del shards[key][term]
+        return shards
+
+    def _doc_pages(self, numbers=None):
+        pages = defaultdict(dict)
+        for key, entry in self.docs.items():
+            number = self.ids[key] // DOCS_PER_SHARD
+            if numbers is None or number in numbers:
+                pages[number][str(self.ids[key])] = entry['display']
+        return pages
+
+    def write(self, output_dir=SEARCH_DIR):
+        """Write the shards of the changed documents and index.json
+
+        Shards without changes keep their files; the first run, or a change
+        of the length pivot, writes every shard. Shard files no longer
+        listed are deleted. Returns (written, total, total_bytes).
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        changed = None if self.rescore else self._changed_postings(output_dir)
+        if changed is None:
+            self.terms, self.pages = {}, {}
+            changed = self._all_postings()
+            pages = self._doc_pages()
+        else:
+            pages = self._doc_pages({doc_id // DOCS_PER_SHARD for doc_id in self.changed})
+
+        files = {}
+        for key, postings in changed.items():
+            self.terms.pop(key, None)
+            for prefix, shard in _split(key, postings).items():
+                if shard:
+                    data = _encode(shard)
+                    self.terms[prefix] = name = _shard_name('terms', prefix, data)
+                    files[name] = data
+        for number in {doc_id // DOCS_PER_SHARD for doc_id in self.changed}:
+            self.pages.pop(str(number), None)
+        for number, docs in pages.items():
+            data = _dump({'docs': docs})
+            self.pages[str(number)] = name = _shard_name('docs', number, data)
+            files[name] = data
+
+        written = 0
+        for name, data in files.items():
+            path = output_dir / name
+            if not path.exists():
+                atomic_write(path, data)
+                written += 1
+
+        manifest = {
+            'version': INDEX_VERSION,
+            'count': len(self.docs),
+            'prefixLength': PREFIX_LENGTH,
+            'docsPerShard': DOCS_PER_SHARD,
+            'scoreScale': SCORE_SCALE,
+            'fields': DOC_FIELDS,
+            'stopwords': sorted(STOPWORDS),
+            'terms': self.terms,
+            'docs': self.pages,
+        }
+        manifest_data = json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8')
+        manifest_path = output_dir / 'index.json'
+        if not manifest_path.exists() or manifest_path.read_bytes() != manifest_data:
+            atomic_write(manifest_path, manifest_data)
+
+        current = set(self.terms.values()) | set(self.pages.values())
+        total_bytes = len(manifest_data)
+        for path in output_dir.glob('*.json'):
+            if path.name == 'index.json':
+                continue
+            if path.name in current:
+                total_bytes += path.stat().st_size
+            else:
+                path.unlink()
+
+        self.changed.clear()
+        self.rescore = False
+        return written, len(current), total_bytes
+
+
+def build(news_dir=NEWS_DIR, output_dir=SEARCH_DIR, force=False, cache_path=SEARCH_CACHE_PATH):
+    """Reindex the site and write the shards; returns a summary dict"""
+    index = SearchIndex(cache_path) if force else SearchIndex.load(cache_path)
+    indexed, reused, removed = index.update(documents(news_dir))
+    written, total, total_bytes = index.write(output_dir)
+    index.save()
+    return {
+        'documents': len(index.docs), 'indexed': indexed, 'reused': reused, 'removed': removed,
+        'shards_written': written, 'shards': total, 'bytes': total_bytes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='reindex every document, ignoring the cache')
+    parser.add_argument('-o', '--output', default=str(SEARCH_DIR),
+                        help='directory to write the index to (default: News/search)')
+    args = parser.parse_args(argv)
+
+    summary = build(output_dir=args.output, force=args.force)
+    print(f"✓ {summary['documents']} documents: {summary['indexed']} indexed, "
+          f"{summary['reused']} unchanged, {summary['removed']} removed")
+    print(f"✓ {summary['shards_written']} of {summary['shards']} shards written, "
+          f"{format_bytes(summary['bytes'])} in total")
+
+
+if __name__ == '__main__':
+    main()
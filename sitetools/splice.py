@@ -0,0 +1,212 @@
+"""
+Memory-mapped, multi-section splicing of generated pages
+
+A section is a start marker, an end marker and the HTML that replaces
+everything from the start marker up to and including the first end marker
+after it. Markers are found by searching a read-only mmap of the file, so
+the page is never decoded or copied into memory, and the new page is
+written as a stream of slices of that mapping around the replacements.
+Both the search and the copy walk the mapping in fixed-size windows and
+drop the pages behind them (madvise, where available), so resident memory
+stays flat however large the page is.
+"""
+import io
+import mmap
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sitetools.engine import FileResult, chunk_size, resolve_jobs
+from sitetools.output import atomic_writer, unified_diff
+
+Section = namedtuple('Section', 'start end html')
+
+# Bytes searched or copied before the pages behind are released
+WINDOW = 8 * 1024 * 1024
+
+_DONTNEED = getattr(mmap, 'MADV_DONTNEED', None)
+
+
+def section(start_marker, end_marker, new_html):
+    """Build a Section from str markers and replacement HTML"""
+    return Section(start_marker.encode('utf-8'), end_marker.encode('utf-8'), new_html.encode('utf-8'))
+
+
+def _label(sec):
+    marker = sec.start.decode('utf-8', 'replace')
+    return marker if len(marker) <= 40 else marker[:37] + '...'
+
+
+def _release(buf, start, end):
+    """Let the kernel drop the mapped pages of buf[start:end]"""
+    if _DONTNEED is None or not isinstance(buf, mmap.mmap):
+        return
+    start -= start % mmap.PAGESIZE
+    if end > start:
+        buf.madvise(_DONTNEED, start, end - start)
+
+
+def _find(buf, needle, start=0):
+    """buf.find(needle, start), searching one window at a time"""
+    overlap = len(needle) - 1
+    size = len(buf)
+    while start < size:
+        stop = min(start + WINDOW + overlap, size)
+        found = buf.find(needle, start, stop)
+        _release(buf, start, stop)
+        if found != -1:
+            return found
+        start += WINDOW
+    return -1
+
+
+def _search(buf, pattern, longest, start=0):
+    """pattern.search(buf, start) for matches up to longest bytes, one window at a time"""
+    overlap = longest - 1
+    size = len(buf)
+    while start < size:
+        stop = min(start + WINDOW + overlap, size)
+        match = pattern.search(buf, start, stop)
+        _release(buf, start, stop)
+        if match is not None:
+            return match
+        start += WINDOW
+    return None
+
+
+def _any_of(markers):
+    """A pattern matching any of the markers, the longest first where one is a prefix of another"""
+    markers = sorted(markers, key=len, reverse=True)
+    return re.compile(b'|'.join(re.escape(marker) for marker in markers)), len(markers[0])
+
+
+def find_sections(buf, sections):
+    """Locate every section in buf (bytes, mmap, ...) in one pass
+
+    All start markers are searched for at once, in a single left-to-right
+    scan that only continues past each match, so the cost does not grow
+    with the number of sections.
+
+    Returns (spans, missing): spans are (start, end, section) tuples sorted by
+    position; missing lists the labels of sections whose start marker was
+    not found. A start marker without its end marker, or two sections that
+    overlap, raise ValueError.
+    """
+    remaining = {}
+    for sec in sections:
+        remaining.setdefault(sec.start, []).append(sec)
+
+    spans = []
+    position = 0
+    while remaining:
+        pattern, longest = _any_of(remaining)
+        match = _search(buf, pattern, longest, position)
+        if match is None:
+            break
+        for sec in remaining.pop(match.group()):
+            end = _find(buf, sec.end, match.end())
+            if end == -1:
+                raise ValueError(f"End marker not found for {_label(sec)!r}")
+            spans.append((match.start(), end + len(sec.end), sec))
+        position = match.end()
+
+    missing = [_label(sec) for sec in sections if sec.start in remaining]
+    for previous, following in zip(spans, spans[1:]):
+        if following[0] < previous[1]:
+            raise ValueError(f"Sections {_label(previous[2])!r} and {_label(following[2])!r} overlap")
+    return spans, missing
+
+
+def _copy(out, buf, view, start, end):
+    written = 0
+    while start < end:
+        stop = min(start + WINDOW, end)
+        written += out.write(view[start:stop])
+        _release(buf, start, stop)
+        start = stop
+    return written
+
+
+def write_spliced(out, buf, spans):
+    """Write buf with spans replaced, as a stream of slices; returns the bytes written"""
+    view = memoryview(buf)
+    try:
+        written = 0
+        position = 0
+        for start, end, sec in spans:
+            written += _copy(out, buf, view, position, start)
+            written += out.write(sec.html)
+            position = end
+        return written + _copy(out, buf, view, position, len(buf))
+    finally:
+        view.release()
+
+
+def _mapped(f):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _holds(buf, span):
+    """True when the span already holds its section's HTML"""
+    start, end, sec = span
+    return end - start == len(sec.html) and buf[start:end] == sec.html
+
+
+def _diff(path, buf, spans):
+    """Unified diff of buf against buf with spans replaced (dry runs only: both are decoded whole)"""
+    new = io.BytesIO()
+    write_spliced(new, buf, spans)
+    return unified_diff(path, buf[:].decode('utf-8', 'replace'), new.getvalue().decode('utf-8', 'replace'))
+
+
+def splice_file(path, sections, dry_run=False):
+    """Apply every section to one file, writing it only if a section's HTML differs
+
+    A dry run writes nothing and carries a unified diff instead.
+    """
+    try:
+        old_size = os.stat(path).st_size
+        if old_size == 0:
+            return FileResult(str(path), False, [], ['empty file'], None, None, 0, None, 0)
+
+        with open(path, 'rb') as f, _mapped(f) as mm:
+            spans, missing = find_sections(mm, sections)
+            stale = [span for span in spans if not _holds(mm, span)]
+            diff = _diff(path, mm, stale) if dry_run and stale else None
+        notes = [f'{label} not found' for label in missing]
+        if not stale:
+            if spans:
+                notes.append('sections up to date')
+            return FileResult(str(path), False, [], notes, None, None, old_size, None, old_size)
+
+        applied = [_label(sec) for _, _, sec in stale]
+        size = old_size + sum(len(sec.html) - (end - start) for start, end, sec in stale)
+        if not dry_run:
+            # The mapping is closed before atomic_writer replaces the file
+            with atomic_writer(path) as out:
+                with open(path, 'rb') as f, _mapped(f) as mm:
+                    size = write_spliced(out, mm, stale)
+
+        stat = os.stat(path)
+        return FileResult(str(path), True, applied, notes, None, None, size, stat.st_mtime_ns, old_size, diff)
+
+    except Exception as e:
+        return FileResult(str(path), False, [], [], str(e))
+
+
+def splice_files(paths, sections, jobs=1, dry_run=False):
+    """Apply the sections to every path, returning results in sorted path order"""
+    paths = sorted(paths, key=str)
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(paths) < 2:
+        return [splice_file(path, sections, dry_run) for path in paths]
+
+    worker = partial(_splice_in_worker, sections, dry_run)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        return list(pool.map(worker, paths, chunksize=chunk_size(len(paths), jobs)))
+
+
+def _splice_in_worker(sections, dry_run, path):
+    return splice_file(path, sections, dry_run)
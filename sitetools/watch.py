@@ -0,0 +1,381 @@
+"""
+Watch News/ and apply the rules to pages as soon as they change
+
+A long-running process that keeps the rules, the rendered fragments and the
+asset fingerprints in memory and runs only the pages that were written
+since the last batch through the engine. Changes are picked up with inotify
+on Linux (through libc, no extra package) or by polling file stats
+elsewhere, and bursts of writes are debounced into one batch.
+
+The process's own writes do not trigger it again: a page whose size and
+mtime match what the manifest recorded after the last run is ignored.
+When the data behind the shared fragments (content.json, navigation.json,
+the article pages) or a shared asset changes, or sitetools.images rebuilt
+the image index, the fragments, fingerprints or index are reloaded and
+every page is planned, so only pages embedding stale data are opened.
+
+Each processed page is logged with its latency (from the first change
+seen to the page written) and the queue depth; --metrics-port serves the
+same figures as JSON.
+
+Usage: python -m sitetools.watch [--rules ...] [--minify] [--poll] [--debounce MS] [--metrics-port PORT]
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from sitetools import assets, cli, engine, fragments, images
+from sitetools.articles import article_files
+from sitetools.manifest import Manifest
+
+DEBOUNCE = 0.03
+# A batch is processed after this long even while writes keep coming
+MAX_DELAY = 0.25
+POLL_INTERVAL = 0.05
+LATENCY_SAMPLES = 1000
+
+IGNORED_DIRS = ('node_modules',)
+# Variants and temporary files the tooling writes next to the pages
+IGNORED_SUFFIXES = ('.tmp', '.gz', '.br')
+
+# inotify(7)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _ignored(path):
+    name = os.path.basename(path)
+    return name.startswith('.') or name.endswith(IGNORED_SUFFIXES)
+
+
+def _directories(root):
+    for directory, subdirs, _ in os.walk(root):
+        subdirs[:] = [d for d in subdirs if d not in IGNORED_DIRS and not d.startswith('.')]
+        yield directory
+
+
+class InotifyWatcher:
+    """Changed paths under root, from inotify"""
+
+    def __init__(self, root):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.root = Path(root)
+        self.directories = {}
+        for directory in _directories(root):
+            self._watch(directory)
+
+    def _watch(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self.directories[wd] = directory
+
+    def changes(self, timeout):
+        """Paths changed within timeout seconds (None waits for the first change)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: report every file so nothing is missed
+                changed.update(str(p) for p in self.root.rglob('*') if p.is_file())
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch(path)
+                continue
+            if not _ignored(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Changed paths under root, by comparing the size and mtime of every file"""
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        stats = {}
+        for directory in _directories(self.root):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and not _ignored(entry.path):
+                        stat = entry.stat()
+                        stats[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def changes(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {p for p, s in snapshot.items() if self.snapshot.get(p) != s}
+            changed.update(p for p in self.snapshot if p not in snapshot)
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return set()
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def create_watcher(root, poll=False):
+    """An inotify watcher where available, else a polling one"""
+    if not poll:
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError, TypeError):
+            # Not Linux, or no libc inotify
+            pass
+    return PollingWatcher(root)
+
+
+class Metrics:
+    """Counters and recent per-file latencies, safe to read from another thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.batches = 0
+        self.processed = 0
+        self.written = 0
+        self.ignored = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            data = {
+                'queue_depth': self.queue_depth, 'batches': self.batches, 'processed': self.processed,
+                'written': self.written, 'ignored_own_writes': self.ignored, 'errors': self.errors,
+            }
+        if latencies:
+            data['latency_ms'] = {
+                'last': round(self.latencies[-1] * 1000, 1),
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1),
+            }
+        return data
+
+
+def serve_metrics(metrics, port):
+    """Serve the metrics as JSON on http://127.0.0.1:port/metrics from a daemon thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/metrics'):
+                self.send_error(404)
+                return
+            body = json.dumps(metrics.snapshot()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Watcher:
+    """Debounces changes under news_dir and runs the changed pages through the engine"""
+
+    def __init__(self, news_dir=engine.NEWS_DIR, rule_names=None, poll=False, debounce=DEBOUNCE, log=print):
+        self.news_dir = Path(news_dir)
+        self.rule_names = rule_names
+        self.debounce = debounce
+        self.log = log
+        self.metrics = Metrics()
+        self.manifest = Manifest.load()
+        # Warm everything kept for the whole session
+        engine.select_rules(rule_names)
+        self.fragment_hashes = fragments.current().hashes()
+        self.asset_hashes = assets.current().hashes()
+        self.image_hashes = images.current().hashes()
+        self.image_index_mtime = self._image_index_mtime()
+        self.watcher = create_watcher(self.news_dir, poll)
+
+    def is_page(self, path):
+        path = Path(path)
+        return path.suffix == '.html' and path.parent == self.news_dir
+
+    def own_write(self, path):
+        """True when path is exactly as the last run left it"""
+        entry = self.manifest.get(path)
+        return entry is not None and self.manifest.stat_matches(entry, path)
+
+    @staticmethod
+    def _image_index_mtime():
+        try:
+            return os.stat(images.IMAGES_CACHE_PATH).st_mtime_ns
+        except OSError:
+            return None
+
+    def _shared_inputs_changed(self, paths):
+        """Recompute fragments/fingerprints when their sources changed; True if any hash moved"""
+        changed = False
+        sources = {str(p) for p in article_files(self.news_dir)}
+        sources |= {str(fragments.CONTENT_JSON), str(fragments.NAVIGATION_JSON)}
+        if any(p in sources for p in paths):
+            fragments.reset()
+            hashes = fragments.current().hashes()
+            changed |= hashes != self.fragment_hashes
+            self.fragment_hashes = hashes
+        shared = {str(assets._local_path(url, self.news_dir)) for url in assets.SHARED_FILES}
+        if any(p in shared for p in paths):
+            assets.reset()
+            hashes = assets.current().hashes()
+            changed |= hashes != self.asset_hashes
+            self.asset_hashes = hashes
+        # The index is written outside News/ by sitetools.images
+        mtime = self._image_index_mtime()
+        if mtime != self.image_index_mtime:
+            self.image_index_mtime = mtime
+            images.reset()
+            hashes = images.current().hashes()
+            changed |= hashes != self.image_hashes
+            self.image_hashes = hashes
+        return changed
+
+    def process(self, pending):
+        """Run one debounced batch: {path: time first seen}"""
+        paths = [p for p in pending if os.path.exists(p)]
+        ignored = [p for p in paths if self.is_page(p) and self.own_write(p)]
+        paths = [p for p in paths if p not in ignored]
+
+        if self._shared_inputs_changed(paths):
+            pages = engine.html_files(self.news_dir)
+            self.log(f"{time.strftime('%H:%M:%S')} shared data changed, planning all {len(pages)} pages")
+        else:
+            pages = sorted(Path(p) for p in paths if self.is_page(p))
+
+        results = engine.run(pages, self.rule_names, manifest=self.manifest) if pages else []
+        started = min(pending.values(), default=time.monotonic())
+        finished = time.monotonic()
+        with self.metrics.lock:
+            self.metrics.batches += 1
+            self.metrics.processed += len(results)
+            self.metrics.ignored += len(ignored)
+            self.metrics.queue_depth = 0
+        written = [r for r in results if r.changed or r.error]
+        for n, result in enumerate(written):
+            latency = finished - pending.get(str(result.path), started)
+            with self.metrics.lock:
+                self.metrics.written += bool(result.changed)
+                self.metrics.errors += bool(result.error)
+                self.metrics.latencies.append(latency)
+            name = os.path.basename(result.path)
+            if result.error:
+                self.log(f"{time.strftime('%H:%M:%S')} ✗ {name} - Error: {result.error}")
+            else:
+                self.log(f"{time.strftime('%H:%M:%S')} ✓ {name} - applied {', '.join(result.applied)} "
+                         f"({latency * 1000:.0f} ms, queue {len(written) - n - 1})")
+        return results
+
+    def run(self, stop=None):
+        """Watch until interrupted (or until the stop event is set)"""
+        pending = {}
+        first = last = None
+        try:
+            while stop is None or not stop.is_set():
+                if pending:
+                    timeout = max(0.0, min(last + self.debounce, first + MAX_DELAY) - time.monotonic())
+                else:
+                    timeout = None if stop is None else 0.1
+                now = time.monotonic()
+                for path in self.watcher.changes(timeout):
+                    if path not in pending:
+                        pending[path] = now
+                        first = first or now
+                    last = now
+                with self.metrics.lock:
+                    self.metrics.queue_depth = len(pending)
+
+                now = time.monotonic()
+                if pending and (now - last >= self.debounce or now - first >= MAX_DELAY):
+                    batch, pending, first = pending, {}, None
+                    self.process({str(p): t for p, t in batch.items()})
+        finally:
+            self.watcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    cli.add_rule_options(parser)
+    parser.add_argument('--poll', action='store_true', help='poll file stats instead of using inotify')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE * 1000, metavar='MS',
+                        help=f'quiet time before a burst of writes is processed (default: {DEBOUNCE * 1000:.0f})')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve queue depth and latencies as JSON on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--no-initial', action='store_true',
+                        help='do not bring every page up to date before watching')
+    args = parser.parse_args(argv)
+
+    rule_names = cli.rule_names(args)
+    watcher = Watcher(rule_names=rule_names, poll=args.poll, debounce=args.debounce / 1000)
+    if not args.no_initial:
+        results = engine.run(engine.html_files(), rule_names, manifest=watcher.manifest)
+        print(f"✓ {sum(1 for r in results if r.changed)} of {len(results)} pages brought up to date")
+    if args.metrics_port:
+        serve_metrics(watcher.metrics, args.metrics_port)
+        print(f"Metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    kind = 'inotify' if isinstance(watcher.watcher, InotifyWatcher) else 'polling'
+    print(f"Watching {watcher.news_dir} ({kind}), Ctrl+C to stop")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == '__main__':
+    main()
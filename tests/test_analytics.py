@@ -0,0 +1,92 @@
+"""The banner analytics event log, its import from analytics.json and its exported rollup"""
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from sitetools import analytics  # noqa: E402
+
+
+def impression(timestamp, banner='b1', **fields):
+    return dict(fields, bannerId=banner, placementId='p1', timestamp=timestamp)
+
+
+@pytest.fixture
+def log(tmp_path):
+    return analytics.EventLog(tmp_path / 'events')
+
+
+@pytest.fixture
+def analytics_json(tmp_path):
+    return tmp_path / 'analytics.json'
+
+
+def test_rollup_by_day_and_banner(log):
+    with log:
+        log.append('impression', impression('2026-03-01T10:00:00.000Z'))
+        log.append('impression', impression('2026-03-01T11:00:00.000Z', banner='b2'))
+        log.append('click', impression('2026-03-01T12:00:00.000Z'))
+        log.append('impression', impression('2026-03-02T09:00:00.000Z'))
+
+    rows = list(analytics.rollup_rows(log.events().rollup(('day', 'banner'))))
+    assert rows == [
+        {'day': '2026-03-01', 'banner': 'b1', 'impressions': 1, 'clicks': 1, 'ctr': '100.00'},
+        {'day': '2026-03-01', 'banner': 'b2', 'impressions': 1, 'clicks': 0, 'ctr': '0.00'},
+        {'day': '2026-03-02', 'banner': 'b1', 'impressions': 1, 'clicks': 0, 'ctr': '0.00'},
+    ]
+
+
+def test_export_leaves_analytics_json_to_the_admin(log, analytics_json, tmp_path):
+    admin = {'impressions': [], 'clicks': [], 'lastCleanup': '2026-01-01T00:00:00.000Z',
+             'dailyStats': {'2026-02-27': {'impressions': 7, 'clicks': 2, 'banners': {}, 'placements': {},
+                                           'clients': {}}}}
+    analytics_json.write_text(json.dumps(admin), encoding='utf-8')
+    with log:
+        log.append('impression', impression('2026-03-01T10:00:00.000Z'))
+        log.append('click', impression('2026-03-02T10:00:00.000Z'))
+
+    rollup_json = tmp_path / 'analytics-rollup.json'
+    data = analytics.export_analytics(log.events(), rollup_json)
+    assert list(data['dailyStats']) == ['2026-03-01', '2026-03-02']
+    assert data['dailyStats']['2026-03-01']['banners'] == {'b1': {'impressions': 1, 'clicks': 0}}
+    assert data['dailyStats']['2026-03-02']['clicks'] == 1
+    assert data['generatedAt'].endswith('Z')
+    assert json.loads(rollup_json.read_text(encoding='utf-8')) == data
+    assert json.loads(analytics_json.read_text(encoding='utf-8')) == admin
+
+
+def admin_json(path, impressions, clicks=()):
+    """analytics.json as the admin writes it: raw events newest first"""
+    path.write_text(json.dumps({
+        'impressions': list(reversed(impressions)), 'clicks': list(reversed(clicks)), 'dailyStats': {},
+    }), encoding='utf-8')
+
+
+def test_import_twice_adds_nothing(log, analytics_json):
+    admin_json(analytics_json, [
+        impression('2026-03-01T10:00:00.000Z', id='imp_1772359200000_0a1b2c3d'),
+        impression('2026-03-01T11:00:00.000Z', id='imp_1772362800000_4e5f6a7b'),
+    ], [impression('2026-03-01T12:00:00.000Z', id='clk_1772366400000_8c9d0e1f')])
+
+    assert analytics.import_analytics(log, analytics_json) == ({'impression': 2, 'click': 1},
+                                                               {'impression': 0, 'click': 0})
+    assert analytics.import_analytics(log, analytics_json) == ({'impression': 0, 'click': 0},
+                                                               {'impression': 2, 'click': 1})
+    events = log.events()
+    assert len(events) == 3
+    assert sorted(events.id.tolist()) == [b'clk_1772366400000_8c9d0e1f', b'imp_1772359200000_0a1b2c3d',
+                                          b'imp_1772362800000_4e5f6a7b']
+
+
+def test_segments_without_ids_still_load(log):
+    with log:
+        log.append('impression', impression('2026-03-01T10:00:00.000Z'))
+    # A segment written before event ids were kept
+    (log.directory / log.segments[0]['name'] / 'id.npy').unlink()
+    with log:
+        log.append('impression', impression('2026-03-01T11:00:00.000Z', id='imp_1_00000000'))
+
+    assert log.events().id.tolist() == [b'', b'imp_1_00000000']
+    log.compact()
+    assert log.events().id.tolist() == [b'', b'imp_1_00000000']
@@ -0,0 +1,61 @@
+"""The 'assets' rule: the extracted theme script and fingerprinted URLs"""
+import pytest
+
+from sitetools import assets, engine
+from sitetools.rules import THEME_MARKER, THEME_SCRIPT
+
+MAIN_JS = b'console.log("main");'
+HEAD = '<script src="/js/main.min.js"></script>\n  '
+# An inline variant that does more than the theme toggle
+OWN_SCRIPT = f'<script>{THEME_MARKER}; highlightActiveLink();</script>'
+
+
+@pytest.fixture
+def news(tmp_path, monkeypatch):
+    news = tmp_path / 'News'
+    (news / 'js').mkdir(parents=True)
+    (news / 'js' / 'main.min.js').write_bytes(MAIN_JS)
+    monkeypatch.setattr(assets, '_current', assets.Assets(news))
+    return news
+
+
+def page(news, name, body):
+    path = news / name
+    path.write_text(f'<body>{body}</body>', encoding='utf-8')
+    return path
+
+
+def run_twice(path):
+    """Apply the rule, then again to its own output; returns both texts"""
+    engine.run([path], ['assets'])
+    once = path.read_text(encoding='utf-8')
+    [result] = engine.run([path], ['assets'])
+    assert not result.changed
+    return once, path.read_text(encoding='utf-8')
+
+
+def test_theme_script_is_extracted(news):
+    current = assets.current()
+    path = page(news, 'index.html', HEAD + THEME_SCRIPT)
+    once, twice = run_twice(path)
+    main_js, theme_js = current.get('/js/main.min.js'), current.get('/js/theme.js')
+    assert once == (f'<body><script src="{main_js.fingerprinted}"></script>\n  '
+                    f'<script src="{theme_js.fingerprinted}"></script></body>')
+    assert twice == once
+    assert (news / theme_js.fingerprinted.lstrip('/')).read_bytes() == theme_js.data
+
+
+def test_duplicate_theme_scripts_leave_one_tag(news):
+    path = page(news, 'press-release.html', HEAD + THEME_SCRIPT + '\n' + THEME_SCRIPT)
+    once, twice = run_twice(path)
+    assert once.count('/js/theme.') == 1 and THEME_MARKER not in once
+    assert twice == once
+
+
+def test_other_inline_scripts_are_left_alone(news):
+    path = page(news, 'about.html', HEAD + OWN_SCRIPT)
+    once, twice = run_twice(path)
+    assert once == f'<body><script src="{assets.current().get("/js/main.min.js").fingerprinted}"></script>\n  ' \
+                  f'{OWN_SCRIPT}</body>'
+    assert '/js/theme.' not in once
+    assert twice == once
@@ -0,0 +1,44 @@
+"""The synthetic corpus and the transform benchmark's isolation from News/"""
+import pytest
+
+from benchmarks import bench_transforms
+from benchmarks.corpus import generate_corpus, parse_mix, parse_size_range
+from sitetools import assets, engine, fragments, images
+
+
+def test_parse_options():
+    assert parse_size_range('20-66') == (20 * 1024, 66 * 1024)
+    assert parse_size_range('4') == (4096, 4096)
+    assert parse_mix('archive=1,legacy=3') == {'archive': 0.25, 'legacy': 0.75}
+    with pytest.raises(ValueError, match='Unknown page kind'):
+        parse_mix('blog=1')
+
+
+def test_corpus_is_reproducible(tmp_path):
+    info = generate_corpus(tmp_path / 'a', files=12, page_kb='2-4', seed=7)
+    generate_corpus(tmp_path / 'b', files=12, page_kb='2-4', seed=7)
+    pages = sorted(p.name for p in (tmp_path / 'a').iterdir())
+    assert len(pages) == sum(info['kinds'].values()) == 12
+    assert pages == sorted(p.name for p in (tmp_path / 'b').iterdir())
+    assert all((tmp_path / 'a' / name).read_bytes() == (tmp_path / 'b' / name).read_bytes() for name in pages)
+    assert info['bytes'] == sum((tmp_path / 'a' / name).stat().st_size for name in pages)
+    assert all(p.stat().st_size > 2048 for p in (tmp_path / 'a').iterdir())
+
+
+def test_cases_stay_in_their_own_directories(tmp_path, monkeypatch):
+    # run_case swaps these for the case's own; restore them after the test
+    for module in (assets, fragments, images):
+        monkeypatch.setattr(module, '_current', None)
+    corpus, cache = tmp_path / 'corpus', tmp_path / 'cache'
+    generate_corpus(corpus, files=6, page_kb='2-4', mix=parse_mix('article=1,archive=1'))
+    (corpus / 'js').mkdir()
+    (corpus / 'js' / 'main.min.js').write_bytes(b'console.log(1);')
+
+    result = bench_transforms.run_case('all', corpus, cache, 1)
+    assert (result['files'], result['errors']) == (6, 0) and result['changed'] == 6
+    assert assets.current().news_dir == corpus
+    assert list((corpus / 'js').glob('main.min.*.js')) and (corpus / '_headers').exists()
+    assert not (engine.NEWS_DIR / '_headers').exists()
+    # The fragments are rendered from the corpus's own articles
+    assert fragments.current().inputs['recent-posts'][0]['filename'].startswith('article-')
+    assert images.current().path == cache / 'images.json'
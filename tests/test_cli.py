@@ -0,0 +1,36 @@
+"""The run/report/profile/compress helper shared by the maintenance scripts"""
+import pytest
+
+from sitetools import cli, compress, engine
+from sitetools import rules  # noqa: F401  (registers the site rules before the registry is swapped)
+
+
+@pytest.fixture
+def page(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, 'RULES', [])
+    engine.rule('todo', order=10)(lambda content, ctx: content.replace('TODO', 'DONE'))
+    path = tmp_path / 'page.html'
+    path.write_text('<p>TODO</p>' * 40, encoding='utf-8')
+    return path
+
+
+def test_every_shared_option_reaches_the_run(page, tmp_path, capsys):
+    trace = tmp_path / 'trace.csv'
+    args = cli.build_parser(__doc__).parse_args(['--force', '-n', '--profile', '--trace', str(trace),
+                                                 '--slowest', '1', '-z'])
+    [result] = cli.run_rules(args, [page], ['todo'])
+    assert result.changed and result.diff and result.profile
+    assert page.read_text(encoding='utf-8') == '<p>TODO</p>' * 40
+    out = capsys.readouterr().out
+    assert 'Would write: 1 files' in out
+    assert 'Slowest 1 files:' in out and trace.exists()
+    assert 'Dry run: precompressed variants not updated' in out
+
+
+def test_compress_reports_the_pages_written(page, monkeypatch, capsys):
+    monkeypatch.setattr(compress, 'record_written', lambda results: None)
+    args = cli.build_parser(__doc__).parse_args(['--force', '-z'])
+    [result] = cli.run_rules(args, [page], ['todo'])
+    assert result.compressed.variants['.gz'][1]
+    assert (page.parent / 'page.html.gz').exists()
+    assert 'Compressed: 1 files written' in capsys.readouterr().out
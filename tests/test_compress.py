@@ -0,0 +1,86 @@
+"""Precompressed variants: incremental runs and pruning"""
+import gzip
+
+import pytest
+
+from sitetools import compress, engine
+from sitetools import rules  # noqa: F401  (registers the site rules before the registry is swapped)
+
+BODY = b'<p>' + b'compressible text ' * 64 + b'</p>'
+
+
+@pytest.fixture
+def site(tmp_path):
+    news = tmp_path / 'News'
+    (news / 'css').mkdir(parents=True)
+    (news / 'index.html').write_bytes(BODY)
+    (news / 'css' / 'site.css').write_bytes(b'a { color: red } ' * 32)
+    (news / 'tiny.html').write_bytes(b'<p>x</p>')
+    (news / 'archive.tar.gz').write_bytes(b'not a variant')
+    return news
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return compress.CompressionCache(tmp_path / 'compressed.json')
+
+
+def compress_all(site, cache):
+    results, up_to_date = compress.run(compress.site_files(site), cache=cache)
+    removed = compress.prune([r.path for r in results + up_to_date], site, cache)
+    return results, up_to_date, removed
+
+
+def test_variants_are_written_once(site, cache):
+    results, up_to_date, _ = compress_all(site, cache)
+    assert sorted(r.path for r in results) == [str(site / 'css' / 'site.css'), str(site / 'index.html')]
+    assert gzip.decompress((site / 'index.html.gz').read_bytes()) == BODY
+    assert not (site / 'tiny.html.gz').exists()
+
+    results, up_to_date, _ = compress_all(site, compress.CompressionCache.load(cache.path))
+    assert results == [] and len(up_to_date) == 2
+
+
+def test_variants_of_deleted_files_are_pruned(site, cache):
+    compress_all(site, cache)
+    (site / 'index.html').unlink()
+
+    _, _, removed = compress_all(site, cache)
+    assert [p.name for p in removed if p.suffix == '.gz'] == ['index.html.gz']
+    assert not list(site.glob('index.html.*'))
+    assert (site / 'css' / 'site.css.gz').exists()
+    assert (site / 'archive.tar.gz').exists()
+    assert cache.get(site / 'index.html') is None
+    assert compress.CompressionCache.load(cache.path).get(site / 'index.html') is None
+
+
+def test_variants_of_shrunk_files_are_pruned(site, cache):
+    compress_all(site, cache)
+    (site / 'index.html').write_bytes(b'<p>short</p>')
+
+    _, _, removed = compress_all(site, cache)
+    assert site / 'index.html.gz' in removed
+    assert cache.get(site / 'index.html') is None
+
+
+def test_pages_are_compressed_as_they_are_written(site, cache, monkeypatch):
+    record_written = compress.record_written
+    monkeypatch.setattr(compress, 'record_written', lambda results: record_written(results, cache))
+    monkeypatch.setattr(engine, 'RULES', [])
+    engine.rule('shorten', order=10)(lambda content, ctx: content.replace('compressible', 'short'))
+
+    pages = [site / 'index.html', site / 'tiny.html']
+    results = engine.run(pages, precompress=True)
+    assert [r.changed for r in results] == [True, False]
+    assert results[1].compressed is None
+    assert gzip.decompress((site / 'index.html.gz').read_bytes()) == (site / 'index.html').read_bytes()
+    assert not (site / 'css' / 'site.css.gz').exists()
+    # The standalone pass finds the page's variants current
+    assert cache.is_current(site / 'index.html', list(compress.encoders()))
+
+    # A page rewritten below MIN_SIZE loses its variants
+    engine.rule('empty', order=20)(lambda content, ctx: '<p></p>')
+    [result] = engine.run([site / 'index.html'], precompress=True)
+    assert result.compressed.entry is None
+    assert not (site / 'index.html.gz').exists()
+    assert cache.get(site / 'index.html') is None
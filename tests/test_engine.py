@@ -0,0 +1,215 @@
+"""plan() and run() against a manifest, with a small registry of test rules"""
+import os
+
+import argparse
+
+import pytest
+
+from sitetools import cli, engine
+from sitetools import rules  # noqa: F401  (registers the site rules before the registry is swapped)
+from sitetools.manifest import Manifest
+
+TICKER_START = '<div class="ticker">'
+TICKER_END = '</div>'
+
+
+@pytest.fixture
+def shared():
+    """The shared data the 'ticker' rule renders, by key"""
+    return {'ticker': ('v1', 'first headline')}
+
+
+@pytest.fixture
+def registry(monkeypatch, shared):
+    """Replace the site rules with three test rules for the duration of a test"""
+    monkeypatch.setattr(engine, 'RULES', [])
+
+    @engine.rule('todo', order=10)
+    def finish_todos(content, ctx):
+        return content.replace('TODO', 'DONE')
+
+    @engine.rule('ticker', order=20, inputs=lambda: {'ticker': shared['ticker'][0]})
+    def refresh_ticker(content, ctx):
+        start = content.find(TICKER_START)
+        if start == -1:
+            return content
+        start += len(TICKER_START)
+        end = content.find(TICKER_END, start)
+        digest, text = shared['ticker']
+        ctx.depends('ticker', digest)
+        return content[:start] + text + content[end:]
+
+    @engine.rule('squash', order=90)
+    def squash_spaces(content, ctx):
+        return ' '.join(content.split())
+
+    return engine.RULES
+
+
+@pytest.fixture
+def page(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text(f'<p>TODO</p>{TICKER_START}old{TICKER_END}', encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest(tmp_path / 'manifest.json')
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_new_page_gets_every_rule(registry, page, manifest):
+    [job] = engine.plan([page], manifest=manifest)
+    assert job.reason == 'new'
+    assert job.rules == ['todo', 'ticker', 'squash']
+
+    [result] = engine.run([page], manifest=manifest)
+    assert result.changed
+    assert result.applied == ['todo', 'ticker']
+    assert page.read_text(encoding='utf-8') == f'<p>DONE</p>{TICKER_START}first headline{TICKER_END}'
+
+    entry = manifest.get(page)
+    assert entry['rules'] == {'todo': 1, 'ticker': 1, 'squash': 1}
+    assert entry['deps'] == {'ticker': {'ticker': 'v1'}}
+    assert Manifest.load(manifest.path).get(page) == entry
+
+
+def test_opt_in_rules_run_only_when_named(registry, page):
+    engine.rule('shout', order=95, default=False)(lambda content, ctx: content.upper())
+    assert [r.name for r in engine.select_rules()] == ['todo', 'ticker', 'squash']
+    assert [r.name for r in engine.select_rules(['shout', 'todo'])] == ['todo', 'shout']
+
+    [result] = engine.run([page])
+    assert result.applied == ['todo', 'ticker']
+    assert cli.rule_names(argparse.Namespace(rules=None, minify=True)) == ['todo', 'ticker', 'squash', 'minify']
+    assert cli.rule_names(argparse.Namespace(rules='todo', minify=False)) == ['todo']
+
+
+def test_processed_page_is_up_to_date(registry, page, manifest):
+    engine.run([page], manifest=manifest)
+    mtime = os.stat(page).st_mtime_ns
+
+    [job] = engine.plan([page], manifest=manifest)
+    assert (job.rules, job.reason) == ([], 'up to date')
+    [result] = engine.run([page], manifest=manifest)
+    assert not result.changed
+    assert result.notes == ['up to date']
+    assert os.stat(page).st_mtime_ns == mtime
+
+
+def test_touched_page_is_hashed_not_rewritten(registry, page, manifest):
+    engine.run([page], manifest=manifest)
+    touch(page)
+
+    [job] = engine.plan([page], manifest=manifest)
+    assert job.reason == 'touched'
+    assert job.known_digest == manifest.get(page)['sha256']
+    [result] = engine.run([page], manifest=manifest)
+    assert not result.changed
+    assert result.notes == ['unchanged since last run']
+    assert manifest.get(page)['mtime_ns'] == os.stat(page).st_mtime_ns
+    assert engine.plan([page], manifest=manifest)[0].reason == 'up to date'
+
+
+def test_edited_page_gets_every_rule(registry, page, manifest):
+    engine.run([page], manifest=manifest)
+    page.write_text('<p>TODO again</p>', encoding='utf-8')
+
+    # Without opening it an edit looks like a touch; the hash tells them apart
+    [job] = engine.plan([page], manifest=manifest)
+    assert (job.rules, job.reason) == (['todo', 'ticker', 'squash'], 'touched')
+    [result] = engine.run([page], manifest=manifest)
+    assert result.applied == ['todo']
+    assert page.read_text(encoding='utf-8') == '<p>DONE again</p>'
+    # The ticker is gone, so the page no longer depends on it
+    assert manifest.get(page)['deps'] == {}
+
+
+def test_new_rule_version_reruns_the_page(registry, page, manifest):
+    engine.run([page], manifest=manifest)
+    engine.get_rule('todo').version = 2
+
+    [job] = engine.plan([page], manifest=manifest)
+    assert job.reason == 'changed'
+    engine.run([page], manifest=manifest)
+    assert manifest.get(page)['rules']['todo'] == 2
+
+
+def test_dependency_refresh_skips_the_earlier_rules(registry, shared, page, manifest):
+    engine.run([page], manifest=manifest)
+    shared['ticker'] = ('v2', 'second headline')
+
+    [job] = engine.plan([page], manifest=manifest)
+    assert job.reason == 'depends on ticker'
+    assert job.rules == ['ticker', 'squash']
+
+    [result] = engine.run([page], manifest=manifest)
+    assert result.changed
+    assert page.read_text(encoding='utf-8') == f'<p>DONE</p>{TICKER_START}second headline{TICKER_END}'
+    # keep_rules: the rules that did not run still hold for the new content
+    entry = manifest.get(page)
+    assert entry['rules'] == {'todo': 1, 'ticker': 1, 'squash': 1}
+    assert entry['deps'] == {'ticker': {'ticker': 'v2'}}
+    assert engine.plan([page], manifest=manifest)[0].reason == 'up to date'
+
+
+def test_dependency_refresh_reruns_the_later_rules(registry, shared, page, manifest):
+    engine.run([page], manifest=manifest)
+    shared['ticker'] = ('v2', 'second   headline')
+
+    [result] = engine.run([page], manifest=manifest)
+    assert result.applied == ['ticker', 'squash']
+    assert page.read_text(encoding='utf-8') == f'<p>DONE</p>{TICKER_START}second headline{TICKER_END}'
+    assert manifest.get(page)['rules'] == {'todo': 1, 'ticker': 1, 'squash': 1}
+
+
+def test_pages_without_the_data_are_not_refreshed(registry, shared, tmp_path, manifest):
+    plain = tmp_path / 'plain.html'
+    plain.write_text('<p>no ticker here</p>', encoding='utf-8')
+    engine.run([plain], manifest=manifest)
+    shared['ticker'] = ('v2', 'second headline')
+
+    assert engine.plan([plain], manifest=manifest)[0].reason == 'up to date'
+
+
+def test_dry_run_leaves_page_and_manifest_alone(registry, page, manifest):
+    before = page.read_bytes()
+
+    [result] = engine.run([page], manifest=manifest, dry_run=True)
+    assert result.changed
+    assert '-<p>TODO</p>' in result.diff and '+<p>DONE</p>' in result.diff
+    assert page.read_bytes() == before
+    assert manifest.get(page) is None
+    assert not manifest.path.exists()
+
+
+def test_resolve_jobs_and_chunk_size():
+    assert engine.resolve_jobs(3) == 3
+    assert engine.resolve_jobs(0) == engine.resolve_jobs(-1) == (os.cpu_count() or 1)
+    assert engine.chunk_size(100, 4) == 6
+    assert engine.chunk_size(3, 4) == 1
+
+
+def test_parallel_run_matches_serial(registry, tmp_path):
+    trees = {}
+    for name in ('serial', 'parallel'):
+        (tmp_path / name).mkdir()
+        trees[name] = []
+        for i in range(9):
+            path = tmp_path / name / f'page-{i}.html'
+            ticker = f'{TICKER_START}old{TICKER_END}' if i % 3 else ''
+            path.write_text(f'<p>TODO {i}</p>   {ticker}', encoding='utf-8')
+            trees[name].append(path)
+
+    serial = engine.run(trees['serial'][::-1])
+    parallel = engine.run(trees['parallel'][::-1], jobs=3)
+    # Results come back in sorted path order either way
+    assert [r.path for r in parallel] == sorted(str(p) for p in trees['parallel'])
+    assert [(r.changed, r.applied, r.deps) for r in parallel] == [(r.changed, r.applied, r.deps) for r in serial]
+    for a, b in zip(trees['serial'], trees['parallel']):
+        assert a.read_bytes() == b.read_bytes()
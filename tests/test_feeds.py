@@ -0,0 +1,98 @@
+"""Sitemap shards and category feeds, and what a rerun rewrites"""
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from sitetools import feeds
+from sitetools.articles import ArticleCache
+
+SITE = ('https://example.com', 'FNPulse', 'Financial news')
+NS = {'s': feeds.SITEMAP_NS, 'a': feeds.ATOM_NS}
+
+
+def article(title, category, published):
+    return f'''<html><head><title>{title} — FNPulse</title><meta property="og:image" content="/img/{category}.jpg">
+<script type="application/ld+json">{json.dumps({"@type": "Article", "headline": title, "datePublished": published,
+                                                "articleSection": category, "author": {"name": "Jane Doe"}})}</script>
+</head><body><p>{title}</p></body></html>'''
+
+
+@pytest.fixture
+def news(tmp_path, monkeypatch):
+    monkeypatch.setattr(ArticleCache, 'load', classmethod(lambda cls: cls(tmp_path / 'articles.json')))
+    news = tmp_path / 'News'
+    (news / 'data').mkdir(parents=True)
+    pages = {
+        'index.html': '<html><head><title>Home</title></head></html>',
+        'about.html': '<html><head><link rel="canonical" href="https://example.com/about"></head></html>',
+        'single-article.html': article('Template', 'Markets', '2026-01-01T00:00:00Z'),
+        'article-oil.html': article('Oil rallies', 'Markets', '2026-01-02T09:00:00Z'),
+        'article-rates.html': article('Rates hold', 'Economy', '2026-01-03T09:00:00Z'),
+        'press-one.html': '<html></html>',
+    }
+    for name, text in pages.items():
+        (news / name).write_text(text, encoding='utf-8')
+    (news / 'data' / 'content.json').write_text(json.dumps({'pressReleases': [
+        {'filename': 'press-one.html', 'status': 'published', 'headline': 'Acme results',
+         'releaseDate': '2026-01-04T08:00:00Z'},
+        {'filename': 'press-two.html', 'status': 'draft', 'headline': 'Not yet', 'releaseDate': '2026-01-05'},
+    ]}), encoding='utf-8')
+    return news
+
+
+def generate(news, tmp_path):
+    outputs, removed = feeds.generate(news, SITE, shard_size=2, state=feeds.FeedState.load(tmp_path / 'feeds.json'))
+    return {o.name for o in outputs if o.written}, removed
+
+
+def sitemap_locs(path):
+    return [loc.text for loc in ET.parse(path).getroot().iterfind('s:url/s:loc', NS)]
+
+
+def test_sitemaps_and_feeds(news, tmp_path):
+    written, removed = generate(news, tmp_path)
+    assert removed == []
+    assert written == {'sitemap.xml', 'sitemap-1.xml', 'sitemap-2.xml', 'sitemap-3.xml',
+                       *(f'feeds/{slug}.{suffix}' for slug in ('all', 'markets', 'economy', 'press-release')
+                         for suffix in ('rss', 'atom'))}
+
+    locs = [loc for n in (1, 2, 3) for loc in sitemap_locs(news / f'sitemap-{n}.xml')]
+    assert sorted(locs) == ['https://example.com/', 'https://example.com/about', 'https://example.com/article-oil.html',
+                            'https://example.com/article-rates.html', 'https://example.com/press-one.html']
+    index = ET.parse(news / 'sitemap.xml').getroot()
+    assert [loc.text for loc in index.iterfind('s:sitemap/s:loc', NS)] == [
+        f'https://example.com/sitemap-{n}.xml' for n in (1, 2, 3)]
+
+    rss = ET.parse(news / 'feeds' / 'all.rss').getroot()
+    assert [t.text for t in rss.iterfind('channel/item/title')] == ['Acme results', 'Rates hold', 'Oil rallies']
+    atom = ET.parse(news / 'feeds' / 'markets.atom').getroot()
+    assert [e.find('a:id', NS).text for e in atom.iterfind('a:entry', NS)] == ['https://example.com/article-oil.html']
+    assert atom.find('a:updated', NS).text == '2026-01-02T09:00:00Z'
+
+
+def test_rerun_writes_only_what_changed(news, tmp_path):
+    generate(news, tmp_path)
+    shard_of = json.loads((tmp_path / 'feeds.json').read_text(encoding='utf-8'))['shards']
+    assert generate(news, tmp_path) == (set(), [])
+
+    (news / 'article-gold.html').write_text(article('Gold climbs', 'Markets', '2026-01-06T09:00:00Z'),
+                                            encoding='utf-8')
+    (news / 'article-rates.html').unlink()
+    written, removed = generate(news, tmp_path)
+    # Known URLs keep their shard; the new one fills the gap the removed one left
+    shards = json.loads((tmp_path / 'feeds.json').read_text(encoding='utf-8'))['shards']
+    assert {loc: shard for loc, shard in shards.items() if loc in shard_of} == \
+           {loc: shard for loc, shard in shard_of.items() if loc in shards}
+    assert shards['https://example.com/article-gold.html'] == shard_of['https://example.com/article-rates.html']
+    assert written == {f'sitemap-{shards["https://example.com/article-gold.html"] + 1}.xml', 'sitemap.xml',
+                       'feeds/all.rss', 'feeds/all.atom', 'feeds/markets.rss', 'feeds/markets.atom'}
+    assert removed == ['feeds/economy.atom', 'feeds/economy.rss']
+    assert not (news / 'feeds' / 'economy.rss').exists()
+
+
+def test_assign_moves_urls_beyond_a_smaller_shard_size(tmp_path):
+    state = feeds.FeedState(tmp_path / 'feeds.json')
+    state.shards = {'a': 0, 'b': 0, 'c': 0, 'd': 1}
+    assert state.assign(['a', 'b', 'c', 'd', 'e'], 2) == {'a': 0, 'b': 0, 'c': 1, 'd': 1, 'e': 2}
+    assert state.dirty
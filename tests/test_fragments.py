@@ -0,0 +1,118 @@
+"""Shared fragments: rendering, memoising and splicing them into pages"""
+import pytest
+
+from sitetools import engine, fragments
+from sitetools import rules  # noqa: F401  (registers the site rules)
+from sitetools.articles import ArticleCache
+from sitetools.manifest import Manifest
+
+NAVIGATION = {
+    'header': [
+        {'label': 'Home', 'href': 'index.html'},
+        {'label': 'Markets', 'href': 'markets.html', 'columns': [
+            {'title': 'Equity', 'links': [{'label': 'Stocks & Indices', 'href': 'stocks.html'},
+                                          {'label': 'Bonds', 'href': 'bonds.html'}]},
+        ]},
+        {'label': 'About', 'href': 'about.html', 'links': [{'label': 'Contact', 'href': 'contact.html'}]},
+    ],
+    'mobile': [{'label': 'Home', 'href': 'index.html'}],
+    'bottom': [{'label': 'Home', 'href': 'index.html'}, {'label': 'About', 'href': 'about.html'}],
+}
+
+PAGE = '''<body><header><nav class="nav-island"><a href="old.html" class="nav-link">Old</a></nav></header>
+<div id="mobile-menu-overlay"><div class="mobile-nav-content"><a href="old.html">Old</a></div></div>
+<main></main><nav class="bottom-nav" aria-label="Mobile"><a href="old.html" class="bottom-link">Old</a></nav></body>'''
+
+
+def inputs(navigation=NAVIGATION):
+    return {'nav': navigation['header'], 'mobile-nav': navigation['mobile'], 'bottom-nav': navigation['bottom']}
+
+
+@pytest.fixture
+def current(monkeypatch):
+    current = fragments.Fragments(inputs())
+    monkeypatch.setattr(fragments, '_current', current)
+    return current
+
+
+def test_render_nav():
+    assert fragments.render_nav(NAVIGATION['header'], '../') == (
+        '<a href="../index.html" class="nav-link">Home</a>'
+        '<div class="nav-dropdown"><a href="../markets.html" class="nav-link">Markets</a>'
+        '<div class="mega-menu"><div class="mega-menu-content"><div class="mega-menu-column">'
+        '<div class="mega-menu-title">Equity</div><div class="mega-menu-links">'
+        '<a href="../stocks.html">Stocks &amp; Indices</a> <a href="../bonds.html">Bonds</a></div></div>'
+        '</div></div></div>'
+        '<div class="nav-dropdown"><a href="../about.html" class="nav-link">About</a>'
+        '<div class="dropdown-menu"><a href="../contact.html">Contact</a></div></div>'
+    )
+    assert fragments.render_mobile_nav(NAVIGATION['mobile']) == '<a href="index.html">Home</a>'
+    assert fragments.render_bottom_nav(NAVIGATION['bottom']) == (
+        '<a href="index.html" class="bottom-link">Home</a> <a href="about.html" class="bottom-link">About</a>'
+    )
+
+
+def test_fragments_are_memoised_by_their_inputs(current):
+    nav = current.get('nav')
+    assert nav.html.startswith(f'<nav class="nav-island" data-fragment="nav:{nav.hash}">')
+    assert current.get('nav') is nav
+    assert current.get('nav', '../') is not nav
+    assert current.get('nav', '../').hash == nav.hash
+
+
+def test_navigation_is_optional(tmp_path):
+    inputs = fragments.fragment_inputs(tmp_path, tmp_path / 'content.json', tmp_path / 'navigation.json',
+                                       ArticleCache(tmp_path / 'articles.json'))
+    assert 'nav' not in inputs and 'ticker' in inputs
+
+
+def test_navs_are_spliced_and_refreshed(current, tmp_path, monkeypatch):
+    page = tmp_path / 'page.html'
+    page.write_text(PAGE, encoding='utf-8')
+    manifest = Manifest(tmp_path / 'manifest.json')
+
+    [result] = engine.run([page], ['fragments'], manifest=manifest)
+    assert result.changed
+    html = page.read_text(encoding='utf-8')
+    assert 'old.html' not in html
+    assert current.get('nav').html in html and current.get('bottom-nav').html in html
+    assert manifest.get(page)['deps']['fragments'] == current.hashes()
+
+    # Only the moved nav makes the page stale
+    navigation = dict(NAVIGATION, bottom=[{'label': 'Markets', 'href': 'markets.html'}])
+    monkeypatch.setattr(fragments, '_current', fragments.Fragments(inputs(navigation)))
+    [job] = engine.plan([page], ['fragments'], manifest)
+    assert job.reason == 'depends on bottom-nav'
+    engine.run([page], ['fragments'], manifest=manifest)
+    assert '<a href="markets.html" class="bottom-link">Markets</a></nav>' in page.read_text(encoding='utf-8')
+
+
+def test_publishing_an_article_replans_only_the_pages_showing_it(tmp_path, monkeypatch):
+    news = tmp_path / 'News'
+    (news / 'data').mkdir(parents=True)
+    (news / 'data' / 'content.json').write_text('{}', encoding='utf-8')
+
+    def publish(name, headline, date):
+        (news / name).write_text(
+            f'<html><head><title>{headline}</title><script type="application/ld+json">'
+            f'{{"headline": "{headline}", "datePublished": "{date}"}}</script></head></html>', encoding='utf-8')
+        monkeypatch.setattr(fragments, '_current', fragments.Fragments(fragments.fragment_inputs(
+            news, news / 'data' / 'content.json', news / 'data' / 'navigation.json',
+            ArticleCache(tmp_path / 'articles.json'))))
+
+    pages = {'home': '<div class="new-ticker-content"></div>', 'footer': '<div class="f-posts"></div>',
+             'plain': '<p>No shared data</p>'}
+    for name, body in pages.items():
+        (news / f'{name}.html').write_text(f'<body>{body}</body>', encoding='utf-8')
+    paths = [news / f'{name}.html' for name in pages]
+    manifest = Manifest(tmp_path / 'manifest.json')
+    publish('article-first.html', 'First', '2026-01-01T09:00:00Z')
+    engine.run(paths, ['fragments'], manifest=manifest)
+
+    publish('article-second.html', 'Second', '2026-01-02T09:00:00Z')
+    assert [(job.path.name, job.reason) for job in engine.plan(paths, ['fragments'], manifest)] == [
+        ('footer.html', 'depends on recent-posts'), ('home.html', 'depends on ticker'), ('plain.html', 'up to date'),
+    ]
+    engine.run(paths, ['fragments'], manifest=manifest)
+    assert 'Second' in (news / 'home.html').read_text(encoding='utf-8')
+    assert 'article-second.html' in (news / 'footer.html').read_text(encoding='utf-8')
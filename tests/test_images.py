@@ -0,0 +1,101 @@
+"""The 'images' rule's dependencies and the derivatives it lists"""
+import pytest
+
+from sitetools import engine, images
+from sitetools.manifest import Manifest
+
+PAGE = '<main><img src="/img/photo.webp" alt="Photo"><img src="/img/logo.svg"></main>'
+
+
+def derivative(fmt, width, size):
+    return {'url': f'/img/responsive/photo-{width}.0123456789.{fmt}', 'format': fmt,
+            'width': width, 'height': width // 2, 'bytes': size}
+
+
+def served(size, width=1200):
+    return {'url': '/img/photo.webp', 'width': width, 'height': width // 2, 'bytes': size}
+
+
+def entry(items, copy=None):
+    return images._served_derivatives({'width': 1200, 'height': 600}, items, copy)
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = images.ImageIndex(tmp_path / 'images.json')
+    monkeypatch.setattr(images, '_current', index)
+    return index
+
+
+@pytest.fixture
+def page(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text(PAGE, encoding='utf-8')
+    return path
+
+
+def test_photos_without_derivatives_are_dependencies(index):
+    found = list(images.responsive_images(PAGE, index))
+    assert [(html, key, digest) for _, html, key, digest in found] == [(None, 'photo', None)]
+
+    index.record('photo', entry([derivative('webp', 320, 100)]))
+    [(span, html, key, digest)] = images.responsive_images(PAGE, index)
+    assert html.startswith(f'<picture data-image="photo:{digest}">')
+    assert 'srcset="/img/responsive/photo-320.0123456789.webp 320w"' in html
+
+
+def test_page_goes_stale_when_derivatives_are_built(index, page, tmp_path):
+    manifest = Manifest(tmp_path / 'manifest.json')
+    [result] = engine.run([page], ['images'], manifest=manifest)
+    assert not result.changed
+    assert manifest.get(page)['deps'] == {'images': {'photo': None}}
+    assert engine.plan([page], ['images'], manifest)[0].reason == 'up to date'
+
+    index.record('photo', entry([derivative('webp', 320, 100)]))
+    [job] = engine.plan([page], ['images'], manifest)
+    assert job.reason == 'depends on photo'
+    [result] = engine.run([page], ['images'], manifest=manifest)
+    assert result.changed
+    assert '<picture data-image="photo:' in page.read_text(encoding='utf-8')
+    assert engine.plan([page], ['images'], manifest)[0].reason == 'up to date'
+
+
+def test_derivatives_bigger_than_the_served_copy_are_dropped():
+    items = [derivative('webp', 320, 4000), derivative('webp', 1200, 19500), derivative('avif', 1200, 9000)]
+    kept = entry(items, served(17704))
+    assert [(d['format'], d['width']) for d in kept['derivatives']] == [('webp', 320), ('avif', 1200)]
+    assert kept['hash'] != entry(items)['hash']
+    assert entry(items)['derivatives'] == items
+
+    # The served copy stands in for the dropped full-width WebP
+    assert images.srcset(kept, 'webp') == '/img/responsive/photo-320.0123456789.webp 320w, /img/photo.webp 1200w'
+    assert images.srcset(kept, 'avif') == '/img/responsive/photo-1200.0123456789.avif 1200w'
+
+
+def test_img_keeps_its_src_without_webp_derivatives(index):
+    index.record('photo', entry([derivative('avif', 320, 100), derivative('webp', 320, 900)], served(800, 320)))
+    [(_, html, _, _)] = images.responsive_images(PAGE, index)
+    assert html.count('srcset=') == 1
+    assert '<source type="image/avif" srcset="/img/responsive/photo-320.0123456789.avif 320w"' in html
+    assert '<img src="/img/photo.webp" alt="Photo" width="1200" height="600">' in html
+
+
+def test_photo_with_no_smaller_derivative_is_left_alone(index):
+    index.record('photo', entry([derivative('webp', 1200, 20000)], served(17704)))
+    assert index.hashes() == {}
+    assert index.lookup('/img/photo.webp') == ('photo', None)
+    assert [html for _, html, _, _ in images.responsive_images(PAGE, index)] == [None]
+
+
+def test_served_copies(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    image_dir = tmp_path / 'img'
+    image_dir.mkdir()
+    Image.new('RGB', (40, 20), 'white').save(image_dir / 'photo.webp')
+    Image.effect_noise((40, 20), 64).save(image_dir / 'photo.format-webp.png')
+    (image_dir / 'logo.svg').write_bytes(b'<svg/>')
+
+    copies = images.served_copies(image_dir, tmp_path)
+    assert list(copies) == ['photo']
+    assert copies['photo'] == {'url': '/img/photo.webp', 'width': 40, 'height': 20,
+                               'bytes': (image_dir / 'photo.webp').stat().st_size}
@@ -0,0 +1,82 @@
+"""The link checker: extracted references, resolution and the cached rescan"""
+import pytest
+
+from sitetools import links
+
+INDEX = '''<html><head><link rel="stylesheet" href="/css/site.css"><style>.hero { background: url(img/hero.jpg) }</style>
+<script type="application/ld+json">{"image": "img/missing.jpg"}</script></head>
+<body><a href="about">About</a> <a href="news/">News</a> <a href="gone.html#top">Gone</a>
+<a href="https://example.com/x.html">Out</a> <a href="#main">Skip</a>
+<img src="img/a.jpg" srcset="img/a-480.webp 480w, img/a.jpg 960w" style="border-image: url('img/b.png')">
+<script>load("data/late.html")</script></body></html>
+'''
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / 'News'
+    for name, text in {
+        'index.html': INDEX,
+        'about.html': '<a href="index.html">Home</a>',
+        'orphan.html': '<a href="orphan.html">Me</a>',
+        'news/index.html': '<a href="../about.html">About</a> <a href="../../outside.html">Out</a>',
+        'css/site.css': '@import "base.css";\nbody { background: url("../img/bg.png") }',
+        'css/base.css': '',
+    }.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(text, encoding='utf-8')
+    (root / 'img').mkdir()
+    for name in ('hero.jpg', 'a.jpg', 'a-480.webp', 'b.png', 'bg.png', 'unused.png'):
+        (root / 'img' / name).write_bytes(b'')
+    return root
+
+
+def test_parse_references():
+    refs = links.parse_references(INDEX, '.html')
+    assert [(kind, url) for _, kind, url in refs] == [
+        ('href', '/css/site.css'), ('url', 'img/hero.jpg'), ('href', 'about'), ('href', 'news/'),
+        ('href', 'gone.html#top'), ('href', 'https://example.com/x.html'), ('href', '#main'),
+        ('src', 'img/a.jpg'), ('srcset', 'img/a-480.webp'), ('srcset', 'img/a.jpg'), ('url', 'img/b.png'),
+        ('script', 'data/late.html'),
+    ]
+    assert refs[0][0] == 1 and refs[-1][0] == 6
+
+
+@pytest.mark.parametrize('url, base, expected', [
+    ('/css/site.css', 'news', 'css/site.css'),
+    ('../about.html?x=1', 'news', 'about.html'),
+    ('../../outside.html', 'news', '../outside.html'),
+    ('news/', '', 'news/'),
+    ('my%20file.html', '', 'my file.html'),
+    ('https://example.com/', '', None),
+    ('#top', '', None),
+    ('mailto:a@b.c', '', None),
+])
+def test_resolve(url, base, expected):
+    assert links.resolve(url, base) == expected
+
+
+def test_check(site, tmp_path):
+    files, directories = links.site_tree(site)
+    cache = links.LinkCache(tmp_path / 'links.json')
+    references, parsed, errors = links.collect(links.scanned_files(site, files), cache=cache)
+    assert (parsed, errors) == (6, [])
+
+    broken, orphans, unused_images = links.check(references, files, directories, site)
+    assert [(ref.source, ref.kind, ref.url) for ref in broken] == [
+        ('index.html', 'href', 'gone.html#top'), ('news/index.html', 'href', '../../outside.html'),
+    ]
+    assert orphans == ['orphan.html']
+    assert unused_images == ['img/unused.png']
+
+
+def test_rescan_parses_only_edited_files(site, tmp_path):
+    paths = links.scanned_files(site)
+    links.collect(paths, cache=links.LinkCache(tmp_path / 'links.json'))
+
+    cache = links.LinkCache.load(tmp_path / 'links.json')
+    assert links.collect(paths, cache=cache)[1] == 0
+    (site / 'about.html').write_text('<a href="index.html">Home</a> <a href="new.html">New</a>', encoding='utf-8')
+    references, parsed, _ = links.collect(paths, cache=cache)
+    assert parsed == 1
+    assert references[str(site / 'about.html')][-1] == [1, 'href', 'new.html']
@@ -0,0 +1,54 @@
+"""The streaming minifier, on whole documents, chunks and files"""
+import pytest
+
+from sitetools import minify
+
+DOCUMENT = '''<!DOCTYPE html>
+<html>
+  <head>
+    <!-- dropped -->
+    <!--[if IE]><p>kept</p><![endif]-->
+    <title>  A   title </title>
+    <style>  a  {  color: red }  </style>
+  </head>
+  <body>
+    <p>Some    <b>bold</b>   text</p>
+    <pre>  keep
+      this  </pre>
+    <script type="application/ld+json">  {"a":  "b > c"}  </script>
+    <img alt="a > b"   src="x.png">
+  </body>
+</html>
+'''
+
+
+def test_minify():
+    assert minify.minify(DOCUMENT) == (
+        '<!DOCTYPE html><html><head><!--[if IE]><p>kept</p><![endif]--><title>A title</title>'
+        '<style>  a  {  color: red }  </style></head><body><p>Some <b>bold</b> text</p>'
+        '<pre>  keep\n      this  </pre><script type="application/ld+json">  {"a":  "b > c"}  </script>'
+        '<img alt="a > b"   src="x.png"></body></html>'
+    )
+
+
+def test_minify_is_idempotent():
+    once = minify.minify(DOCUMENT)
+    assert minify.minify(once) == once
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8, 13])
+def test_minify_chunks_match_whole_document(size):
+    chunks = [DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size)]
+    assert ''.join(minify.minify_chunks(chunks)) == minify.minify(DOCUMENT)
+
+
+def test_minify_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(minify, 'CHUNK_SIZE', 16)
+    path = tmp_path / 'page.html'
+    path.write_text(DOCUMENT, encoding='utf-8')
+
+    result = minify.minify_file(path)
+    assert result.changed and result.error is None
+    assert path.read_text(encoding='utf-8') == minify.minify(DOCUMENT)
+    assert result.size == len(minify.minify(DOCUMENT).encode('utf-8'))
+    assert not minify.minify_file(path).changed
@@ -0,0 +1,47 @@
+"""write_if_changed() and the atomic writers"""
+import os
+import stat
+
+import pytest
+
+from sitetools import output
+
+
+@pytest.fixture
+def page(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_bytes(b'old')
+    os.chmod(path, 0o640)
+    return path
+
+
+def test_unchanged_content_is_not_written(page):
+    mtime = os.stat(page).st_mtime_ns
+    assert output.write_if_changed(page, b'old', b'old') is False
+    assert os.stat(page).st_mtime_ns == mtime
+
+
+def test_changed_content_replaces_the_file(page):
+    assert output.write_if_changed(page, b'old', b'new') is True
+    assert page.read_bytes() == b'new'
+    assert stat.S_IMODE(os.stat(page).st_mode) == 0o640
+    assert os.listdir(page.parent) == ['page.html']
+
+
+def test_dry_run_reports_without_writing(page):
+    assert output.write_if_changed(page, b'old', b'new', dry_run=True) is True
+    assert page.read_bytes() == b'old'
+
+
+def test_failed_write_leaves_the_file_alone(page):
+    with pytest.raises(RuntimeError):
+        with output.atomic_writer(page) as f:
+            f.write(b'half')
+            raise RuntimeError
+    assert page.read_bytes() == b'old'
+    assert os.listdir(page.parent) == ['page.html']
+
+
+def test_unified_diff(page):
+    diff = output.unified_diff(page, 'a\nb\n', 'a\nc\n')
+    assert diff.splitlines() == ['--- a/page.html', '+++ b/page.html', '@@ -1,2 +1,2 @@', ' a', '-b', '+c']
@@ -0,0 +1,75 @@
+"""Per-rule profiles of a run, their totals and the written traces"""
+import csv
+import json
+
+import pytest
+
+from sitetools import engine, profiling
+from sitetools import rules  # noqa: F401  (registers the site rules before the registry is swapped)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(engine, 'RULES', [])
+
+    @engine.rule('todo', order=10)
+    def finish_todos(content, ctx):
+        with ctx.phase('search'):
+            count = content.count('TODO')
+        ctx.matched(count)
+        with ctx.phase('sub'):
+            return content.replace('TODO', 'DONE')
+
+    @engine.rule('noop', order=20)
+    def leave_alone(content, ctx):
+        return content
+
+    return engine.RULES
+
+
+@pytest.fixture
+def results(registry, tmp_path):
+    (tmp_path / 'a.html').write_text('<p>TODO TODO</p>', encoding='utf-8')
+    (tmp_path / 'b.html').write_text('<p>done</p>', encoding='utf-8')
+    return engine.run(engine.html_files(tmp_path), profile=True)
+
+
+def test_each_file_carries_its_profile(results):
+    a, b = results
+    assert a.profile['bytes_read'] == len('<p>TODO TODO</p>')
+    assert a.profile['bytes_written'] == a.size and a.profile['write'] > 0
+    assert a.profile['rules']['todo']['matches'] == 2
+    assert a.profile['rules']['todo']['total'] >= a.profile['rules']['todo']['search']
+    # An unchanged file is read but not written
+    assert b.profile['bytes_written'] == 0 and b.profile['rules']['todo']['matches'] == 0
+
+
+def test_aggregate(results):
+    rules, io = profiling.aggregate(results)
+    assert list(rules) == ['todo', 'noop']
+    assert (rules['todo']['files'], rules['todo']['changed'], rules['todo']['matches']) == (2, 1, 2)
+    assert (rules['noop']['files'], rules['noop']['changed']) == (2, 0)
+    assert io['files'] == 2 and io['bytes_read'] == sum(r.profile['bytes_read'] for r in results)
+
+
+def test_unprofiled_results_are_skipped(registry, tmp_path, capsys):
+    (tmp_path / 'a.html').write_text('<p>TODO</p>', encoding='utf-8')
+    results = engine.run([tmp_path / 'a.html'])
+    assert results[0].profile is None
+    profiling.print_profile(results)
+    assert 'Profile: 0 files read (1 skipped without reading)' in capsys.readouterr().out
+
+
+def test_traces(results, tmp_path):
+    profiling.write_trace(results, tmp_path / 'trace.json', slowest=1)
+    trace = json.loads((tmp_path / 'trace.json').read_text(encoding='utf-8'))
+    assert [f['path'] for f in trace['files']] == [r.path for r in results]
+    assert trace['slowest'] == [r.path for r in profiling.slowest_files(results, 1)]
+    assert trace['rules']['todo']['matches'] == 2
+
+    profiling.write_trace(results, tmp_path / 'trace.csv')
+    with open(tmp_path / 'trace.csv', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    # One row per file, then one per rule it ran
+    assert [(row['rule'], row['matches']) for row in rows[:3]] == [('', ''), ('todo', '2'), ('noop', '0')]
+    assert len(rows) == 6
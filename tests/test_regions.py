@@ -0,0 +1,79 @@
+"""locate_regions() and splice() over small pages"""
+import pytest
+
+from sitetools.regions import Span, iter_tags, locate_regions, splice
+
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+  <title>A <main> in the title</title>
+  <script>if (a < b) { document.write("<footer>"); }</script>
+</head>
+<body class="page">
+  <a href="#main" class="skip-link">Skip</a>
+  <!-- <main id="commented-out"> -->
+  <div class="ticker-wrap"><div class="new-ticker-content"><div class="item">one</div><div class="item">two</div></div></div>
+  <main id="content">
+    <article><footer class="card-footer">by someone</footer></article>
+  </main>
+  <footer class="site-footer dark-footer">
+    <div class="f-posts"><div><a href="a.html">A</a></div></div>
+  </footer>
+  <nav class="bottom-nav"><nav class="inner">x</nav></nav>
+</body>
+</html>
+'''
+
+
+def text(span):
+    return PAGE[span.start:span.end]
+
+
+def test_iter_tags_skips_comments_and_raw_text():
+    names = [name for closing, name, _, _ in iter_tags(PAGE) if not closing]
+    assert names.count('main') == 1
+    assert names.count('footer') == 2
+    assert 'script' in names and 'title' in names
+
+
+def test_locate_regions():
+    regions = locate_regions(PAGE)
+
+    assert text(regions.body) == '<body class="page">'
+    assert text(regions.skip_link) == '<a href="#main" class="skip-link">Skip</a>'
+    assert text(regions.main) == '<main id="content">'
+    assert text(regions.footer).startswith('<footer class="site-footer dark-footer">')
+    assert text(regions.footer).endswith('</div></div>\n  </footer>')
+    assert text(regions.bottom_nav) == '<nav class="bottom-nav"><nav class="inner">x</nav></nav>'
+    assert text(regions.ticker) == ('<div class="new-ticker-content"><div class="item">one</div>'
+                                    '<div class="item">two</div></div>')
+    assert text(regions['recent-posts']) == '<div class="f-posts"><div><a href="a.html">A</a></div></div>'
+
+
+def test_skip_link_must_come_first():
+    html = '<body><p>intro</p><a class="skip-link" href="#main">Skip</a><main></main></body>'
+    regions = locate_regions(html)
+    assert regions.skip_link is None
+    assert regions.main is not None
+
+
+def test_page_without_regions():
+    regions = locate_regions('<p>just a fragment</p>')
+    assert dict(regions) == {}
+    assert regions.main is None
+
+
+def test_last_footer_without_site_footer():
+    html = '<body><footer>one</footer><footer>two</footer></body>'
+    assert html[slice(*locate_regions(html).footer)] == '<footer>two</footer>'
+
+
+def test_splice_replaces_in_order():
+    html = '0123456789'
+    assert splice(html, [(Span(6, 8), 'b'), (Span(1, 3), 'a')]) == '0a345b89'
+    assert splice(html, []) == html
+
+
+def test_splice_rejects_overlaps():
+    with pytest.raises(ValueError):
+        splice('0123456789', [(Span(1, 5), 'a'), (Span(4, 6), 'b')])
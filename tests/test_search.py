@@ -0,0 +1,92 @@
+"""The sharded search index: tokens, BM25 postings and incremental rewrites"""
+import json
+
+import pytest
+
+from sitetools import search
+
+
+def doc(key, title, body='', category='Markets', date='2026-01-02'):
+    return {'key': key, 'url': key, 'title': title, 'date': date, 'category': category,
+            'author': 'Jane Doe', 'excerpt': '', 'body': body}
+
+
+DOCS = [
+    doc('oil.html', 'Oil rally lifts energy stocks', 'Crude oil prices rose as supply tightened.'),
+    doc('bonds.html', 'Bond yields fall', 'Treasury yields fell as oil eased.', 'Economy'),
+    doc('crypto.html', 'Bitcoin hits a record', 'Crypto markets rallied.', 'Crypto'),
+]
+
+
+def build(tmp_path, docs, name='search'):
+    index = search.SearchIndex.load(tmp_path / f'{name}.json')
+    counts = index.update(docs)
+    written = index.write(tmp_path / name)
+    index.save()
+    return counts, written
+
+
+def read_index(output_dir):
+    """index.json and every posting, {term: {doc id: score}}"""
+    manifest = json.loads((output_dir / 'index.json').read_text(encoding='utf-8'))
+    postings = {}
+    for name in manifest['terms'].values():
+        postings.update(search._decode((output_dir / name).read_bytes()))
+    docs = {}
+    for name in manifest['docs'].values():
+        docs.update(json.loads((output_dir / name).read_text(encoding='utf-8'))['docs'])
+    return manifest, postings, docs
+
+
+def test_tokenize():
+    assert search.tokenize('The Café’s S&P 500 a rally!') == ['cafes', '500', 'rally']
+
+
+def test_postings_are_scored_and_delta_encoded(tmp_path):
+    (indexed, reused, removed), _ = build(tmp_path, DOCS)
+    assert (indexed, reused, removed) == (3, 0, 0)
+    manifest, postings, docs = read_index(tmp_path / 'search')
+    assert manifest['count'] == 3 and manifest['stopwords'] == sorted(search.STOPWORDS)
+    assert docs['0'] == ['oil.html', 'Oil rally lifts energy stocks', '2026-01-02', 'Markets',
+                         'Crude oil prices rose as supply tightened.']
+    # A term in the title outscores the same term in the body
+    assert set(postings['oil']) == {0, 1}
+    assert postings['oil'][0] > postings['oil'][1]
+    # Categories are indexed, so a category's term lists every doc filed under it
+    assert set(postings['crypto']) == {2}
+
+
+def test_incremental_update_matches_a_rebuild(tmp_path):
+    build(tmp_path, DOCS)
+    changed = [DOCS[0], doc('bonds.html', 'Bond yields fall again', 'Gilts followed.', 'Economy'),
+               doc('gold.html', 'Gold shines', 'Bullion rose.', 'Commodities')]
+    (indexed, reused, removed), (written, total, _) = build(tmp_path, changed)
+    assert (indexed, reused, removed) == (2, 1, 1)
+    assert written < total
+
+    build(tmp_path, changed, name='fresh')
+    manifest, postings, docs = read_index(tmp_path / 'search')
+    _, fresh_postings, fresh_docs = read_index(tmp_path / 'fresh')
+    # Ids are stable: the removed doc's id is not reused
+    assert sorted(docs) == ['0', '1', '3']
+    assert {docs[i][0]: {t for t, hits in postings.items() if int(i) in hits} for i in docs} == \
+           {fresh_docs[i][0]: {t for t, hits in fresh_postings.items() if int(i) in hits} for i in fresh_docs}
+    # Shard files no longer listed are deleted
+    assert sorted(p.name for p in (tmp_path / 'search').iterdir()) == \
+           sorted(['index.json', *manifest['terms'].values(), *manifest['docs'].values()])
+
+
+def test_oversized_shards_split_by_a_longer_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, 'MAX_SHARD_POSTINGS', 5)
+    docs = [doc(f'{i}.html', f'rally rate rare {i}') for i in range(3)]
+    build(tmp_path, docs)
+    manifest, postings, _ = read_index(tmp_path / 'search')
+    assert {'ral', 'rat', 'rar'} <= set(manifest['terms'])
+    assert search.shard_key('rally', manifest['terms']) == 'ral'
+    assert set(postings['rally']) == {0, 1, 2}
+
+
+@pytest.mark.parametrize('term, keys, expected', [('rally', {'ra'}, 'ra'), ('rally', {'ra', 'ral'}, 'ral'),
+                                                  ('oil', set(), 'oi')])
+def test_shard_key(term, keys, expected):
+    assert search.shard_key(term, keys) == expected
@@ -0,0 +1,122 @@
+"""Marker splicing of whole files and replace_section.py"""
+import pytest
+
+import replace_section
+from sitetools import splice
+from sitetools.splice import section
+
+PAGE = '<html><body>\n<!-- A -->old a<!-- /A -->\n<p>keep</p>\n<!-- B -->old b<!-- /B -->\n</body></html>\n'
+
+SECTIONS = [
+    section('<!-- B -->', '<!-- /B -->', '<!-- B -->new b<!-- /B -->'),
+    section('<!-- A -->', '<!-- /A -->', '<!-- A -->new a<!-- /A -->'),
+]
+
+
+@pytest.fixture
+def page(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text(PAGE, encoding='utf-8')
+    return path
+
+
+def test_find_sections_sorts_by_position():
+    spans, missing = splice.find_sections(PAGE.encode('utf-8'), SECTIONS)
+    assert [sec for _, _, sec in spans] == SECTIONS[::-1]
+    assert missing == []
+    start, end, _ = spans[0]
+    assert PAGE.encode('utf-8')[start:end] == b'<!-- A -->old a<!-- /A -->'
+
+
+def test_find_sections_scans_once(monkeypatch):
+    searched = []
+    search = splice._search
+    monkeypatch.setattr(splice, '_search', lambda buf, *args: searched.append(args) or search(buf, *args))
+    data = PAGE.encode('utf-8') * 3
+    sections = SECTIONS + [section('<p>', '</p>', ''), section('<!-- C -->', '<!-- /C -->', '')]
+
+    spans, missing = splice.find_sections(data, sections)
+    assert [sec for _, _, sec in spans] == [SECTIONS[1], sections[2], SECTIONS[0]]
+    assert missing == ['<!-- C -->']
+    # Each search picks up where the previous match ended
+    positions = [position for _, _, position in searched]
+    assert positions == sorted(positions) and len(positions) == 4
+
+
+def test_find_sections_errors():
+    data = PAGE.encode('utf-8')
+    _, missing = splice.find_sections(data, [section('<!-- C -->', '<!-- /C -->', '')])
+    assert missing == ['<!-- C -->']
+    with pytest.raises(ValueError, match='End marker'):
+        splice.find_sections(data, [section('<!-- A -->', '<!-- /C -->', '')])
+    with pytest.raises(ValueError, match='overlap'):
+        splice.find_sections(data, [section('<!-- A -->', '<!-- /B -->', ''),
+                                    section('<p>', '</p>', '')])
+
+
+def test_splice_file_round_trip(page):
+    result = splice.splice_file(page, SECTIONS)
+    assert result.error is None and result.changed
+    assert result.applied == ['<!-- A -->', '<!-- B -->']
+    expected = PAGE.replace('old a', 'new a').replace('old b', 'new b')
+    assert page.read_text(encoding='utf-8') == expected
+    assert result.size == len(expected.encode('utf-8'))
+
+    # Splicing the original back in restores the page byte for byte
+    back = [section('<!-- A -->', '<!-- /A -->', '<!-- A -->old a<!-- /A -->'),
+            section('<!-- B -->', '<!-- /B -->', '<!-- B -->old b<!-- /B -->')]
+    splice.splice_file(page, back)
+    assert page.read_text(encoding='utf-8') == PAGE
+
+
+def test_splice_file_leaves_identical_sections_alone(page):
+    splice.splice_file(page, SECTIONS)
+    mtime = page.stat().st_mtime_ns
+
+    result = splice.splice_file(page, SECTIONS)
+    assert not result.changed
+    assert result.notes == ['sections up to date']
+    assert page.stat().st_mtime_ns == mtime
+
+    # Only the section that differs is reported
+    changed = section('<!-- A -->', '<!-- /A -->', '<!-- A -->x<!-- /A -->')
+    result = splice.splice_file(page, [SECTIONS[0], changed])
+    assert result.applied == ['<!-- A -->']
+
+
+def test_splice_file_dry_run(page):
+    result = splice.splice_file(page, SECTIONS, dry_run=True)
+    assert result.changed
+    assert page.read_text(encoding='utf-8') == PAGE
+    lines = result.diff.splitlines()
+    assert lines[:2] == ['--- a/page.html', '+++ b/page.html']
+    assert '-<!-- A -->old a<!-- /A -->' in lines and '+<!-- A -->new a<!-- /A -->' in lines
+    assert '-<!-- B -->old b<!-- /B -->' in lines and '+<!-- B -->new b<!-- /B -->' in lines
+
+
+def test_splice_file_missing_sections(page):
+    result = splice.splice_file(page, [section('<!-- C -->', '<!-- /C -->', 'x')])
+    assert not result.changed
+    assert result.notes == ['<!-- C --> not found']
+    assert page.read_text(encoding='utf-8') == PAGE
+
+
+def test_splice_across_windows(page, monkeypatch):
+    monkeypatch.setattr(splice, 'WINDOW', 7)
+    splice.splice_file(page, SECTIONS)
+    assert page.read_text(encoding='utf-8') == PAGE.replace('old a', 'new a').replace('old b', 'new b')
+
+
+def test_replace_section_exit_status(page, tmp_path):
+    new_a = tmp_path / 'a.html'
+    new_a.write_text('<!-- A -->new a<!-- /A -->', encoding='utf-8')
+    args = ['-s', '<!-- A -->', '<!-- /A -->', str(new_a), str(page)]
+    replace_section.main(args)
+    # Nothing left to do is not an error
+    replace_section.main(args)
+
+    args[1] = '<!-- C -->'
+    with pytest.raises(SystemExit) as exit_info:
+        replace_section.main(args)
+    assert exit_info.value.code == 1
+
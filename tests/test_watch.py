@@ -0,0 +1,102 @@
+"""The watcher's batches: its own writes, latencies and shared-data replans"""
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from sitetools import assets, engine, fragments, images, watch
+from sitetools import rules  # noqa: F401  (registers the site rules before the registry is swapped)
+from sitetools.manifest import Manifest
+
+TICKER = '<div class="ticker"></div>'
+
+
+@pytest.fixture
+def news(tmp_path, monkeypatch):
+    """A small News/ with a content.json the 'ticker' fragment is rendered from"""
+    news = tmp_path / 'News'
+    (news / 'data').mkdir(parents=True)
+    (news / 'index.html').write_text(f'<p>TODO</p>{TICKER}', encoding='utf-8')
+    (news / 'about.html').write_text('<p>TODO</p>', encoding='utf-8')
+    content_json = news / 'data' / 'content.json'
+    content_json.write_text(json.dumps({'ticker': ['first']}), encoding='utf-8')
+
+    def current():
+        if fragments._current is None:
+            fragments._current = fragments.Fragments(
+                {'ticker': fragments.load_content(content_json)['ticker']})
+        return fragments._current
+
+    monkeypatch.setattr(fragments, 'CONTENT_JSON', content_json)
+    monkeypatch.setattr(fragments, 'current', current)
+    monkeypatch.setattr(fragments, '_current', None)
+    monkeypatch.setattr(assets, 'current', lambda: SimpleNamespace(hashes=dict))
+    monkeypatch.setattr(images, 'current', lambda: SimpleNamespace(hashes=dict))
+    monkeypatch.setattr(images, 'IMAGES_CACHE_PATH', tmp_path / 'images.json')
+    monkeypatch.setattr(Manifest, 'load', classmethod(lambda cls: cls(tmp_path / 'manifest.json')))
+    return news
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(engine, 'RULES', [])
+
+    @engine.rule('todo', order=10)
+    def finish_todos(content, ctx):
+        return content.replace('TODO', 'DONE')
+
+    @engine.rule('ticker', order=20, inputs=lambda: fragments.current().hashes())
+    def refresh_ticker(content, ctx):
+        start = content.find('<div class="ticker">')
+        if start == -1:
+            return content
+        end = content.find('</div>', start)
+        ctx.depends('ticker', fragments.current().hashes()['ticker'])
+        items = fragments.current().inputs['ticker']
+        return content[:start] + '<div class="ticker">' + ' '.join(items) + content[end:]
+
+    return engine.RULES
+
+
+@pytest.fixture
+def watcher(news, registry):
+    logged = []
+    watcher = watch.Watcher(news, poll=True, log=logged.append)
+    watcher.logged = logged
+    yield watcher
+    watcher.watcher.close()
+
+
+def test_own_writes_are_ignored(watcher, news):
+    assert isinstance(watcher.watcher, watch.PollingWatcher)
+    index = news / 'index.html'
+    (news / 'site.css').write_text('a {}', encoding='utf-8')
+    now = time.monotonic()
+    results = watcher.process({str(news / 'site.css'): now - 5, str(index): now})
+    assert [r.path for r in results if r.changed] == [str(index)]
+    assert index.read_text(encoding='utf-8') == '<p>DONE</p><div class="ticker">first</div>'
+    # The latency is measured from when the page itself was first seen
+    assert list(watcher.metrics.latencies)[0] < 5
+
+    # The watcher sees the page it just wrote, and leaves it alone
+    changed = watcher.watcher.changes(1)
+    assert str(index) in changed
+    assert watcher.process({p: time.monotonic() for p in changed}) == []
+    assert watcher.metrics.snapshot()['ignored_own_writes'] == 1
+    assert watcher.metrics.written == 1
+
+
+def test_shared_data_change_replans_every_page(watcher, news):
+    watcher.process({str(news / 'about.html'): time.monotonic(), str(news / 'index.html'): time.monotonic()})
+    watcher.watcher.changes(0)
+
+    (news / 'data' / 'content.json').write_text(json.dumps({'ticker': ['second', 'third']}), encoding='utf-8')
+    changed = watcher.watcher.changes(1)
+    assert changed == {str(news / 'data' / 'content.json')}
+
+    results = watcher.process({p: time.monotonic() for p in changed})
+    assert [(r.path, r.changed) for r in results] == [(str(news / 'about.html'), False),
+                                                      (str(news / 'index.html'), True)]
+    assert 'shared data changed, planning all 2 pages' in watcher.logged[-2]
+    assert (news / 'index.html').read_text(encoding='utf-8') == '<p>DONE</p><div class="ticker">second third</div>'